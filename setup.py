@@ -43,6 +43,10 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     zip_safe=False,
+    extras_require={
+        'parquet': ['pyarrow'],
+        'zstd': ['zstandard'],
+    },
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Environment :: Web Environment',
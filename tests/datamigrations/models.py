@@ -3,6 +3,10 @@
 from __future__ import unicode_literals
 
 from django.db import models
+from django.utils.encoding import python_2_unicode_compatible
+
+from yepes import fields
+from yepes.model_mixins import Logged
 
 
 class BooleanModel(models.Model):
@@ -83,6 +87,22 @@ class AlphabetModel(models.Model):
             unique=True)
 
 
+@python_2_unicode_compatible
+class LoggedAlphabetModel(Logged):
+
+    letter = models.CharField(
+            max_length=1,
+            unique=True)
+    word = models.CharField(
+            max_length=15,
+            unique=True)
+    slug = fields.SlugField(
+            default='')
+
+    def __str__(self):
+        return self.word
+
+
 class AuthorModel(models.Model):
 
     name = models.CharField(
@@ -3,6 +3,7 @@
 from __future__ import unicode_literals
 
 from io import open
+import json
 import os
 
 from django import test
@@ -800,3 +801,60 @@ class QuerySetExportationsTests(TempDirMixin, test.TestCase):
         with self.assertRaises(UnableToImportError):
             migration.import_data('')
 
+    def test_chunked_queryset(self):
+        migration = QuerySetExportation(BlogCategoryModel.objects.all())
+        migration.export_chunk_size = 2
+        with self.assertNumQueries(8):  # Keys and rows of four chunks
+            self.assertJSONEqual(
+                migration.export_data(),
+                """[
+                    {"id": 1, "blog": 1, "name": "Pets", "description": ""},
+                    {"id": 2, "blog": 1, "name": "Toys", "description": ""},
+                    {"id": 3, "blog": 3, "name": "Programming Languages", "description": ""},
+                    {"id": 4, "blog": 3, "name": "Development Tools", "description": ""},
+                    {"id": 5, "blog": 3, "name": "App Reviews", "description": ""},
+                    {"id": 6, "blog": 5, "name": "State Secrets", "description": "Political scandals and things like those."},
+                    {"id": 7, "blog": 5, "name": "Some Nonsense", "description": "This cannot be described."}
+                ]""")
+
+    def test_chunked_multi_valued_paths(self):
+        migration = BlogMigration(BlogModel)
+        migration.export_chunk_size = 2
+        rows = migration._iterate_in_chunks(
+            BlogModel.objects.all(),
+            ['categories__name'],
+        )
+        self.assertEqual(
+            sorted((pk, name or '') for pk, name in rows),
+            [(1, 'Pets'),
+             (1, 'Toys'),
+             (2, ''),
+             (3, 'App Reviews'),
+             (3, 'Development Tools'),
+             (3, 'Programming Languages'),
+             (4, ''),
+             (5, 'Some Nonsense'),
+             (5, 'State Secrets')],
+        )
+
+    def test_model_ordering(self):
+        opts = BlogCategoryModel._meta
+        self.addCleanup(setattr, opts, 'ordering', opts.ordering)
+        opts.ordering = ['name']
+        migration = QuerySetExportation(BlogCategoryModel.objects.all())
+        migration.export_chunk_size = 2
+        with self.assertNumQueries(8):  # Keys and rows of four chunks
+            self.assertEqual(
+                [row['id'] for row in json.loads(migration.export_data())],
+                [1, 2, 3, 4, 5, 6, 7],
+            )
+
+    def test_explicit_ordering(self):
+        queryset = BlogCategoryModel.objects.order_by('name')
+        migration = QuerySetExportation(queryset)
+        migration.export_chunk_size = 2
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                [row['id'] for row in json.loads(migration.export_data())],
+                [5, 4, 1, 3, 7, 6, 2],
+            )
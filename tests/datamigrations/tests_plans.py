@@ -3,19 +3,31 @@
 from __future__ import unicode_literals
 
 import collections
+from datetime import timedelta
 from io import open
 from itertools import chain
 import os
+from unittest import skipUnless
 
 from django import test
-from django.utils.encoding import force_str
+from django.db import connection, models
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.encoding import force_bytes, force_str, force_text
 from django.utils._os import upath
 
+from yepes.contrib.datamigrations.checkpoints import Checkpoint
+from yepes.contrib.datamigrations.exceptions import DataImportionError
 from yepes.contrib.datamigrations.importation_plans import (
     importation_plans,
     PlanRegistry,
 )
 from yepes.contrib.datamigrations.importation_plans.bulk_create import BulkCreatePlan
+from yepes.contrib.datamigrations.importation_plans.bulk_load import (
+    BulkLoadPlan,
+    CopyBuffer,
+)
+from yepes.contrib.datamigrations.importation_plans.bulk_replace_all import BulkReplaceAllPlan
 from yepes.contrib.datamigrations.importation_plans.create import CreatePlan
 from yepes.contrib.datamigrations.importation_plans.direct import DirectPlan
 from yepes.contrib.datamigrations.importation_plans.replace import ReplacePlan
@@ -23,6 +35,7 @@ from yepes.contrib.datamigrations.importation_plans.replace_all import ReplaceAl
 from yepes.contrib.datamigrations.importation_plans.update import UpdatePlan
 from yepes.contrib.datamigrations.importation_plans.update_or_bulk_create import UpdateOrBulkCreatePlan
 from yepes.contrib.datamigrations.importation_plans.update_or_create import UpdateOrCreatePlan
+from yepes.contrib.datamigrations.importation_plans.upsert import UpsertPlan
 from yepes.test_mixins import TempDirMixin
 
 from .data_migrations import (
@@ -36,6 +49,7 @@ from .models import (
     AuthorModel,
     BlogModel,
     BlogCategoryModel,
+    LoggedAlphabetModel,
     PostModel,
 )
 
@@ -50,6 +64,8 @@ class PlanRegistryTests(test.TestCase):
     def setUp(self):
         super(PlanRegistryTests, self).setUp()
         self.assertEqual('bulk_create', BulkCreatePlan.name)
+        self.assertEqual('bulk_load', BulkLoadPlan.name)
+        self.assertEqual('bulk_replace_all', BulkReplaceAllPlan.name)
         self.assertEqual('create', CreatePlan.name)
         self.assertEqual('direct', DirectPlan.name)
         self.assertEqual('replace', ReplacePlan.name)
@@ -57,6 +73,7 @@ class PlanRegistryTests(test.TestCase):
         self.assertEqual('update', UpdatePlan.name)
         self.assertEqual('update_or_bulk_create', UpdateOrBulkCreatePlan.name)
         self.assertEqual('update_or_create', UpdateOrCreatePlan.name)
+        self.assertEqual('upsert', UpsertPlan.name)
 
     def test_registry_class(self):
         registry = PlanRegistry()
@@ -96,13 +113,16 @@ class PlanRegistryTests(test.TestCase):
     def test_default_registry_object(self):
         self.assertEqual(
             {
-                BulkCreatePlan, CreatePlan, DirectPlan,
+                BulkCreatePlan, BulkLoadPlan, BulkReplaceAllPlan,
+                CreatePlan, DirectPlan,
                 ReplacePlan, ReplaceAllPlan, UpdatePlan,
-                UpdateOrBulkCreatePlan, UpdateOrCreatePlan,
+                UpdateOrBulkCreatePlan, UpdateOrCreatePlan, UpsertPlan,
             },
             set(importation_plans.get_plans()),
         )
         self.assertTrue('bulk_create' in importation_plans)
+        self.assertTrue('bulk_load' in importation_plans)
+        self.assertTrue('bulk_replace_all' in importation_plans)
         self.assertTrue('create' in importation_plans)
         self.assertTrue('direct' in importation_plans)
         self.assertTrue('replace' in importation_plans)
@@ -110,6 +130,7 @@ class PlanRegistryTests(test.TestCase):
         self.assertTrue('update' in importation_plans)
         self.assertTrue('update_or_bulk_create' in importation_plans)
         self.assertTrue('update_or_create' in importation_plans)
+        self.assertTrue('upsert' in importation_plans)
 
 
 class ImportationPlansTests(test.TestCase):
@@ -310,6 +331,57 @@ class ImportationPlansTests(test.TestCase):
             self.assertEqual(obj.letter, word[0])
             self.assertEqual(obj.word, word)
 
+    def test_bulk_load_plan(self):
+        migration = AlphabetMigration(AlphabetModel)
+        serializer = 'csv'
+        plan = 'bulk_load'
+        migration.import_data(self.source_1, serializer, plan)
+        importation = migration.import_data(self.source_2, serializer, plan, batch_size=2)
+        self.assertEqual(importation.counts['inserted'], 5)
+        self.assertIsNotNone(importation.elapsed_time)
+        objs = AlphabetModel.objects.all()
+        self.assertEqual(len(objs), 10)
+        for i, word in enumerate(chain(self.words_1, self.words_2)):
+            obj = objs[i]
+            self.assertEqual(obj.pk, i + 1)
+            self.assertEqual(obj.letter, word[0])
+            self.assertEqual(obj.word, word)
+
+    def test_bulk_load_plan_progress(self):
+        migration = AlphabetMigration(AlphabetModel)
+
+        def import_batch(plan, batch):
+            raise AssertionError('Rows should not be loaded batch by batch.')
+
+        self.addCleanup(setattr, BulkLoadPlan, 'import_batch',
+                        BulkLoadPlan.__dict__['import_batch'])
+        BulkLoadPlan.import_batch = import_batch
+        processed = []
+
+        def progress(plan):
+            processed.append(plan.processed)
+            self.assertIsNotNone(plan.elapsed_time)
+
+        importation = migration.import_data(self.source_1, 'csv', 'bulk_load',
+                                            batch_size=2, progress=progress)
+        self.assertEqual(processed, [2, 4, 5])
+        self.assertEqual(importation.counts['inserted'], 5)
+        self.assertEqual(AlphabetModel.objects.count(), 5)
+
+    def test_bulk_replace_all_plan(self):
+        migration = AlphabetMigration(AlphabetModel)
+        serializer = 'csv'
+        plan = 'bulk_replace_all'
+        migration.import_data(self.source_1, serializer, plan)
+        migration.import_data(self.source_3, serializer, plan)
+        objs = AlphabetModel.objects.all()
+        self.assertEqual(len(objs), 5)
+        for i, word in enumerate(self.words_3):
+            obj = objs[i]
+            self.assertEqual(obj.pk, i + 11)
+            self.assertEqual(obj.letter, word[0])
+            self.assertEqual(obj.word, word)
+
     def test_replace_plan(self):
         migration = AlphabetMigration(AlphabetModel)
         serializer = 'csv'
@@ -372,7 +444,9 @@ class ImportationPlansTests(test.TestCase):
 
         migration.import_data(self.source_1, serializer, 'direct')
         migration.import_data(self.source_2, serializer, 'direct')
-        migration.import_data(self.source_4, serializer, plan)
+        importation = migration.import_data(self.source_4, serializer, plan)
+        self.assertEqual(importation.counts['updated'], 5)
+        self.assertEqual(importation.counts['unchanged'], 5)
         objs = AlphabetModel.objects.all()
         self.assertEqual(len(objs), 10)
         for i, word in enumerate(self.words_4):
@@ -435,7 +509,10 @@ class ImportationPlansTests(test.TestCase):
             self.assertEqual(obj.letter, word[0])
             self.assertEqual(obj.word, word)
 
-        migration.import_data(self.source_4, serializer, plan)
+        importation = migration.import_data(self.source_4, serializer, plan)
+        self.assertEqual(importation.counts['inserted'], 5)
+        self.assertEqual(importation.counts['updated'], 5)
+        self.assertEqual(importation.counts['unchanged'], 5)
         objs = AlphabetModel.objects.all()
         self.assertEqual(len(objs), 15)
         for i, word in enumerate(self.words_4):
@@ -444,6 +521,182 @@ class ImportationPlansTests(test.TestCase):
             self.assertEqual(obj.letter, word[0])
             self.assertEqual(obj.word, word)
 
+    def test_update_plan_with_pre_save_fields(self):
+        migration = AlphabetMigration(LoggedAlphabetModel)
+        serializer = 'csv'
+        plan = 'update'
+        migration.import_data(self.source_1, serializer, 'direct')
+        migration.import_data(self.source_2, serializer, 'direct')
+        last_modified = timezone.now() - timedelta(days=1)
+        LoggedAlphabetModel.objects.update(last_modified=last_modified)
+
+        importation = migration.import_data(self.source_4, serializer, plan)
+        self.assertEqual(importation.counts['updated'], 5)
+        self.assertEqual(importation.counts['unchanged'], 5)
+        objs = LoggedAlphabetModel.objects.order_by('pk')
+        for i, word in enumerate(self.words_4[:10]):
+            obj = objs[i]
+            self.assertEqual(obj.word, word)
+            if i < 5:
+                self.assertEqual(obj.last_modified, last_modified)
+            else:
+                self.assertGreater(obj.last_modified, last_modified)
+
+    def test_update_plan_in_batches(self):
+        migration = AlphabetMigration(AlphabetModel)
+        migration.import_data(self.source_1, 'csv', 'direct')
+        migration.import_data(self.source_2, 'csv', 'direct')
+
+        def bulk_batch_size(fields, objs):
+            return 2
+
+        connection.ops.bulk_batch_size = bulk_batch_size
+        self.addCleanup(delattr, connection.ops, 'bulk_batch_size')
+        with CaptureQueriesContext(connection) as context:
+            importation = migration.import_data(self.source_4, 'csv', 'update')
+
+        updates = [
+            query
+            for query
+            in context.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(importation.counts['updated'], 5)
+        objs = AlphabetModel.objects.order_by('pk')
+        for i, word in enumerate(self.words_4[:10]):
+            self.assertEqual(objs[i].word, word)
+
+    @skipUnless(UpsertPlan.is_supported(connection), 'Database does not support native upserts.')
+    def test_upsert_plan(self):
+        migration = AlphabetMigration(AlphabetModel)
+        serializer = 'csv'
+        plan = 'upsert'
+        self.assertIsInstance(migration.get_importation_plan(), UpdateOrCreatePlan)
+        self.assertIsInstance(migration.get_importation_plan(plan), UpsertPlan)
+        migration.import_data(self.source_1, serializer, plan)
+        objs = AlphabetModel.objects.all()
+        self.assertEqual(len(objs), 5)
+        for i, word in enumerate(self.words_1):
+            obj = objs[i]
+            self.assertEqual(obj.pk, i + 1)
+            self.assertEqual(obj.letter, word[0])
+            self.assertEqual(obj.word, word)
+
+        migration.import_data(self.source_2, serializer, plan)
+        importation = migration.import_data(self.source_4, serializer, plan)
+
+        self.assertEqual(importation.counts['upserted'], 15)
+        objs = AlphabetModel.objects.all()
+        self.assertEqual(len(objs), 15)
+        for i, word in enumerate(self.words_4):
+            obj = objs[i]
+            self.assertEqual(obj.pk, i + 1)
+            self.assertEqual(obj.letter, word[0])
+            self.assertEqual(obj.word, word)
+
+    @skipUnless(UpsertPlan.is_supported(connection), 'Database does not support native upserts.')
+    def test_upsert_plan_with_pre_save_fields(self):
+        migration = AlphabetMigration(LoggedAlphabetModel)
+        serializer = 'csv'
+        plan = 'upsert'
+        migration.import_data(self.source_1, serializer, plan)
+        migration.import_data(self.source_2, serializer, plan)
+        date = timezone.now() - timedelta(days=1)
+        LoggedAlphabetModel.objects.update(creation_date=date, last_modified=date)
+
+        migration.import_data(self.source_4, serializer, plan)
+        objs = LoggedAlphabetModel.objects.order_by('pk')
+        self.assertEqual(len(objs), 15)
+        for i, word in enumerate(self.words_4):
+            obj = objs[i]
+            self.assertEqual(obj.word, word)
+            self.assertEqual(obj.slug, word)
+            self.assertGreater(obj.last_modified, date)
+            if i < 10:
+                self.assertEqual(obj.creation_date, date)
+            else:
+                self.assertGreater(obj.creation_date, date)
+
+
+class CopyBufferTests(test.SimpleTestCase):
+
+    def test_field_types(self):
+        fields = [
+            models.CharField(),
+            models.BinaryField(),
+            models.BooleanField(),
+            models.TextField(),
+        ]
+        rows = [
+            [b'caf\xc3\xa9', b'\x00\xff', True, 'a\tb\nc'],
+            ['caf\xe9', bytearray(b'\x01'), False, None],
+        ]
+        buffer = CopyBuffer(rows, fields)
+        self.assertEqual(
+            buffer.read(),
+            force_bytes('caf\xe9\t\\\\x00ff\tt\ta\\tb\\nc\n'
+                        'caf\xe9\t\\\\x01\tf\t\\N\n'),
+        )
+        self.assertEqual(buffer.read(), b'')
+
+
+class CheckpointTests(TempDirMixin, test.TestCase):
+
+    source = ImportationPlansTests.source_4
+    tempDirPrefix = 'test_data_migrations_'
+    words = ImportationPlansTests.words_4
+
+    def test_resume_importation(self):
+        migration = AlphabetMigration(AlphabetModel)
+        checkpoint_path = os.path.join(self.temp_dir, 'alphabet.checkpoint')
+        checkpoint = Checkpoint(checkpoint_path)
+        plan = migration.get_importation_plan('bulk_create')
+        checkpoint.set_offset(plan.get_checkpoint_key(), 10)
+
+        checkpoint = Checkpoint(checkpoint_path, resume=True)
+        importation = migration.import_data(self.source, 'csv', 'bulk_create',
+                                            batch_size=2, commit_every=2,
+                                            checkpoint=checkpoint)
+        self.assertEqual(importation.offset, 10)
+        self.assertEqual(importation.processed, 5)
+        self.assertTrue(checkpoint.is_finished(importation.get_checkpoint_key()))
+        self.assertEqual(checkpoint.get_offset(importation.get_checkpoint_key()), 15)
+        self.assertEqual(
+            list(AlphabetModel.objects.values_list('word', flat=True)),
+            self.words[10:],
+        )
+        checkpoint = Checkpoint(checkpoint_path, resume=True)
+        importation = migration.import_data(self.source, 'csv', 'bulk_create',
+                                            commit_every=2,
+                                            checkpoint=checkpoint)
+        self.assertEqual(importation.processed, 0)
+        self.assertEqual(AlphabetModel.objects.count(), 5)
+
+        checkpoint.clear()
+        self.assertFalse(os.path.exists(checkpoint_path))
+
+    def test_changed_source(self):
+        source_path = os.path.join(self.temp_dir, 'alphabet.csv')
+        with open(source_path, 'w') as source_file:
+            source_file.write(force_text(self.source))
+
+        checkpoint_path = os.path.join(self.temp_dir, 'alphabet.checkpoint')
+        checkpoint = Checkpoint(checkpoint_path, source=source_path)
+        checkpoint.set_offset('tests.alphabet', 10)
+
+        checkpoint = Checkpoint(checkpoint_path, resume=True, source=source_path)
+        self.assertEqual(checkpoint.get_offset('tests.alphabet'), 10)
+
+        with open(source_path, 'a') as source_file:
+            source_file.write('z,zebra\n')
+
+        with self.assertRaisesRegexp(DataImportionError, 'has changed'):
+            Checkpoint(checkpoint_path, resume=True, source=source_path)
+
+        checkpoint = Checkpoint(checkpoint_path, source=source_path)
+        self.assertEqual(checkpoint.get_offset('tests.alphabet'), 0)
+
 
 class NaturalAndCompositeKeysTests(TempDirMixin, test.TestCase):
 
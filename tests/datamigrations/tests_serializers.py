@@ -2,18 +2,33 @@
 
 from __future__ import unicode_literals
 
+from datetime import date
+from io import BytesIO, StringIO
+import unittest
+
 from django import test
 
+from yepes.contrib.datamigrations.constants import FLOAT, INTEGER, TEXT
 from yepes.contrib.datamigrations.serializers import (
     serializers,
     SerializerRegistry,
 )
 from yepes.contrib.datamigrations.serializers.csv import CsvSerializer
-from yepes.contrib.datamigrations.serializers.json import JsonSerializer
+from yepes.contrib.datamigrations.serializers.json import (
+    JsonSerializer,
+    JsonlSerializer,
+)
+from yepes.contrib.datamigrations.serializers.parquet import ParquetSerializer
 from yepes.contrib.datamigrations.serializers.tsv import TsvSerializer
 from yepes.contrib.datamigrations.serializers.xls import XlsSerializer
 from yepes.contrib.datamigrations.serializers.xlsx import XlsxSerializer
 from yepes.contrib.datamigrations.serializers.yaml import YamlSerializer
+from yepes.types import Undefined
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
 
 
 class SerializerRegistryTests(test.TestCase):
@@ -24,6 +39,8 @@ class SerializerRegistryTests(test.TestCase):
         super(SerializerRegistryTests, self).setUp()
         self.assertEqual('csv', CsvSerializer.name)
         self.assertEqual('json', JsonSerializer.name)
+        self.assertEqual('jsonl', JsonlSerializer.name)
+        self.assertEqual('parquet', ParquetSerializer.name)
         self.assertEqual('tsv', TsvSerializer.name)
         self.assertEqual('xls', XlsSerializer.name)
         self.assertEqual('xlsx', XlsxSerializer.name)
@@ -67,15 +84,136 @@ class SerializerRegistryTests(test.TestCase):
     def test_default_registry_object(self):
         self.assertEqual(
             {
-                CsvSerializer, JsonSerializer, TsvSerializer,
-                XlsSerializer, XlsxSerializer, YamlSerializer,
+                CsvSerializer, JsonSerializer, JsonlSerializer,
+                ParquetSerializer, TsvSerializer, XlsSerializer,
+                XlsxSerializer, YamlSerializer,
             },
             set(serializers.get_serializers()),
         )
         self.assertTrue('csv' in serializers)
         self.assertTrue('json' in serializers)
+        self.assertTrue('jsonl' in serializers)
+        self.assertTrue('parquet' in serializers)
         self.assertTrue('tsv' in serializers)
         self.assertTrue('xls' in serializers)
         self.assertTrue('xlsx' in serializers)
         self.assertTrue('yaml' in serializers)
 
+
+class JsonSerializerTests(test.SimpleTestCase):
+
+    headers = ['id', 'name', 'extra']
+    data = [
+        [1, 'Plain text', None],
+        [2, 'Brackets ]} and "quotes"', True],
+        [3, 'Árbol', {'tags': ['a', 'b']}],
+    ]
+
+    def test_streaming_load(self):
+        serializer = JsonSerializer()
+        serializer.chunk_size = 4
+        string = serializer.serialize(self.headers, self.data)
+        rows = serializer.deserialize(['extra', 'id', 'missing'], string)
+        self.assertEqual(next(rows), [None, 1, Undefined])
+        self.assertEqual(
+            list(rows),
+            [[True, 2, Undefined], [{'tags': ['a', 'b']}, 3, Undefined]],
+        )
+
+    def test_invalid_documents(self):
+        serializer = JsonSerializer()
+        self.assertEqual(list(serializer.deserialize(self.headers, '[]')), [])
+        with self.assertRaises(ValueError):
+            list(serializer.deserialize(self.headers, '{"id": 1}'))
+        with self.assertRaises(ValueError):
+            list(serializer.deserialize(self.headers, '[{"id": 1}'))
+
+    def test_multibyte_characters_between_chunks(self):
+        serializer = JsonSerializer()
+        serializer.chunk_size = 3
+        file = BytesIO('[{"a": "ñññññ"}]'.encode('utf-8'))
+        self.assertEqual(list(serializer.iterdecode(file)), [{'a': 'ñññññ'}])
+
+        file = BytesIO('[{"a": "ñ"}]'.encode('utf-8')[:-4])
+        with self.assertRaises(ValueError):
+            list(serializer.iterdecode(file))
+
+    def test_malformed_object(self):
+        serializer = JsonSerializer()
+        serializer.chunk_size = 4
+        serializer.max_object_size = 16
+        file = StringIO('[{"id": 1 "name": "a"}, ' + '{"id": 2}, ' * 1000 + ']')
+        with self.assertRaises(ValueError):
+            list(serializer.iterdecode(file))
+
+        self.assertLess(file.tell(), 100)
+
+    def test_json_lines(self):
+        serializer = JsonlSerializer()
+        string = serializer.serialize(self.headers, self.data)
+        self.assertEqual(len(string.splitlines()), 3)
+        self.assertEqual(
+            list(serializer.deserialize(self.headers, string)),
+            self.data,
+        )
+
+    def test_streaming_dump(self):
+        for serializer in (CsvSerializer(), JsonSerializer(), JsonlSerializer()):
+            serializer.rows_per_chunk = 2
+            self.assertTrue(serializer.is_streamable)
+            chunks = list(serializer.iterserialize(self.headers, self.data))
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual(
+                chunks[0][:0].join(chunks),  # CSV chunks are bytes in Python 2
+                serializer.serialize(self.headers, self.data),
+            )
+
+    def test_single_chunk_dump(self):
+        serializer = YamlSerializer()
+        self.assertFalse(serializer.is_streamable)
+        chunks = list(serializer.iterserialize(self.headers, self.data))
+        self.assertEqual(
+            chunks,
+            [serializer.serialize(self.headers, self.data)],
+        )
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class ParquetSerializerTests(test.SimpleTestCase):
+
+    headers = ['id', 'name', 'price']
+    data = [
+        [1, 'Plain text', 1.5],
+        [2, None, None],
+        [3, 'Árbol', 3.25],
+    ]
+    data_types = [INTEGER, TEXT, FLOAT]
+
+    def test_row_groups(self):
+        serializer = ParquetSerializer(row_group_size=2)
+        string = serializer.serialize(self.headers, self.data, data_types=self.data_types)
+        self.assertIsInstance(string, bytes)
+        self.assertEqual(
+            list(serializer.deserialize(self.headers, string)),
+            self.data,
+        )
+        self.assertEqual(
+            list(serializer.deserialize(['price', 'missing'], string)),
+            [[1.5, Undefined], [None, Undefined], [3.25, Undefined]],
+        )
+
+    def test_empty_data(self):
+        serializer = ParquetSerializer()
+        string = serializer.serialize(self.headers, [], data_types=self.data_types)
+        self.assertEqual(list(serializer.deserialize(self.headers, string)), [])
+
+    def test_without_data_types(self):
+        serializer = ParquetSerializer()
+        string = serializer.serialize(
+            ['id', 'published', 'date'],
+            [[1, True, date(2017, 3, 1)], [2, False, None]],
+        )
+        self.assertEqual(
+            list(serializer.deserialize(['id', 'published', 'date'], string)),
+            [['1', 'True', '2017-03-01'], ['2', 'False', None]],
+        )
@@ -14,6 +14,7 @@ from yepes.apps import apps
 from yepes.contrib.datamigrations import ModelMigration
 from yepes.contrib.datamigrations.importation_plans.direct import DirectPlan
 from yepes.contrib.datamigrations.serializers.csv import CsvSerializer
+from yepes.contrib.datamigrations.serializers import serializers
 from yepes.contrib.datamigrations.serializers.json import JsonSerializer
 from yepes.test_mixins import TempDirMixin
 
@@ -414,3 +415,36 @@ class ImportModelsTest(TempDirMixin, TestCase):
                 stdout=output,
             )
 
+
+
+class BenchmarkSerializersTest(TestCase):
+
+    available_apps = ['yepes.contrib.datamigrations']
+
+    def test_serializer_not_found(self):
+        with self.assertRaisesRegexp(CommandError, 'Unknown serializer: foo'):
+            call_command('benchmark_serializers', formats=['foo'])
+
+    def test_formats(self):
+        formats = ['csv', 'json', 'xlsx']
+        try:
+            serializers.get_serializer('parquet')().serialize(['id'], [])
+        except ImportError:
+            pass
+        else:
+            formats.append('parquet')
+
+        output = StringIO()
+        call_command(
+            'benchmark_serializers',
+            formats=formats,
+            rows=10,
+            stdout=output,
+        )
+        lines = output.getvalue().splitlines()
+        self.assertEqual(
+            [line[:18].strip() for line in lines],
+            formats[:3] + ['xlsx (full mode)'] + formats[3:],
+        )
+        for line in lines:
+            self.assertEqual(line[18:].split()[0], '10')
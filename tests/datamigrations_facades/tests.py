@@ -3,8 +3,13 @@
 from __future__ import unicode_literals
 
 import os
+import tarfile
+import threading
+from unittest import skipIf
+import warnings
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
 from django.utils._os import upath
 
 from yepes.apps import apps
@@ -14,6 +19,7 @@ from yepes.contrib.datamigrations.facades import (
     MultipleImportFacade,
     SingleExportFacade,
     SingleImportFacade,
+    run_jobs,
 )
 from yepes.contrib.datamigrations.importation_plans.direct import DirectPlan
 from yepes.contrib.datamigrations.serializers.csv import CsvSerializer
@@ -210,6 +216,45 @@ class MultipleImportTest(TempDirMixin, TestCase):
         result = migration.export_data(None, JsonSerializer)
         self.assertEqual(source.splitlines(), result.splitlines())
 
+    def test_compressed_file(self):
+        source_path = os.path.join(MIGRATIONS_DIR, 'backup')
+        MultipleImportFacade.from_file_path(
+            source_path,
+            use_natural_keys=True,
+            plan='direct',
+        )
+        archive_path = os.path.join(self.temp_dir, 'backup.tar')
+        MultipleExportFacade.to_compressed_file_path(
+            archive_path,
+            models=['datamigrations_facades_tests'],
+            serializer='json',
+        )
+        with tarfile.open(archive_path) as archive:
+            self.assertIn(
+                'datamigrations_facades_tests.author.json.gz',
+                archive.getnames(),
+            )
+
+        for model in (PostTags, Post, Tag, Category, Author):
+            model.objects.all().delete()
+
+        MultipleImportFacade.from_compressed_file_path(
+            archive_path,
+            plan='direct',
+        )
+        for model, file_name in ((Author, 'author.json'),
+                                 (Category, 'category.json'),
+                                 (Tag, 'tag.json'),
+                                 (Post, 'post.json'),
+                                 (PostTags, 'post_tags.json')):
+            source_path = os.path.join(MIGRATIONS_DIR, file_name)
+            with open(source_path, 'r') as source_file:
+                source = source_file.read()
+
+            migration = ModelMigration(model)
+            result = migration.export_data(None, JsonSerializer)
+            self.assertEqual(source.splitlines(), result.splitlines())
+
     def test_labels(self):
         source_path = os.path.join(MIGRATIONS_DIR, 'backup')
         MultipleImportFacade.from_file_path(
@@ -236,6 +281,107 @@ class MultipleImportTest(TempDirMixin, TestCase):
             )
 
 
+class JobsTest(TempDirMixin, TestCase):
+
+    available_apps = ['datamigrations_facades']
+
+    tempDirPrefix = 'test_datamigrations_facades_'
+
+    def test_run_jobs(self):
+        def function(arg):
+            return (arg * 2, threading.current_thread().name)
+
+        main_thread = threading.current_thread().name
+        results = run_jobs(function, [1, 2, 3])
+        self.assertEqual([r[0] for r in results], [2, 4, 6])
+        self.assertEqual({r[1] for r in results}, {main_thread})
+
+        results = run_jobs(function, [1, 2, 3], jobs=2)
+        self.assertEqual([r[0] for r in results], [2, 4, 6])
+        self.assertNotIn(main_thread, {r[1] for r in results})
+
+    def test_compressed_file(self):
+        archive_path = os.path.join(self.temp_dir, 'backup.tar')
+        with warnings.catch_warnings(record=True) as warning_list:
+            warnings.simplefilter('always')
+            MultipleExportFacade.to_compressed_file_path(
+                archive_path,
+                models=['datamigrations_facades_tests'],
+                jobs=1,
+            )
+            self.assertEqual(len(warning_list), 0)
+            MultipleExportFacade.to_compressed_file_path(
+                archive_path,
+                models=['datamigrations_facades_tests'],
+                jobs=2,
+            )
+            self.assertEqual(len(warning_list), 1)
+            self.assertIs(warning_list[0].category, RuntimeWarning)
+            MultipleImportFacade.from_compressed_file_path(
+                archive_path,
+                plan='direct',
+                jobs=2,
+            )
+            self.assertEqual(len(warning_list), 2)
+            self.assertIs(warning_list[1].category, RuntimeWarning)
+
+
+@skipIf(
+    connection.vendor == 'sqlite' and not connection.features.can_share_in_memory_db,
+    'The jobs cannot share the test database.',
+)
+class MultipleJobsTest(TempDirMixin, TransactionTestCase):
+
+    available_apps = ['datamigrations_facades']
+
+    maxDiff = None
+    tempDirPrefix = 'test_datamigrations_facades_'
+
+    def test_export(self):
+        source_path = os.path.join(MIGRATIONS_DIR, 'backup')
+        MultipleImportFacade.from_file_path(
+            source_path,
+            use_natural_keys=True,
+            plan='direct',
+        )
+        result_path = os.path.join(self.temp_dir, 'backup')
+        MultipleExportFacade.to_file_path(
+            result_path,
+            serializer='json',
+            use_natural_keys=True,
+            jobs=3,
+        )
+        with open(source_path, 'r') as source_file:
+            source = source_file.read()
+
+        with open(result_path, 'r') as result_file:
+            result = result_file.read()
+
+        self.assertEqual(source.splitlines(), result.splitlines())
+
+    @skipIf(connection.vendor == 'sqlite', 'SQLite locks tables on concurrent writes.')
+    def test_import(self):
+        source_path = os.path.join(MIGRATIONS_DIR, 'backup')
+        MultipleImportFacade.from_file_path(
+            source_path,
+            use_natural_keys=True,
+            plan='direct',
+            jobs=3,
+        )
+        for model, file_name in ((Author, 'author.json'),
+                                 (Category, 'category.json'),
+                                 (Tag, 'tag.json'),
+                                 (Post, 'post.json'),
+                                 (PostTags, 'post_tags.json')):
+            source_path = os.path.join(MIGRATIONS_DIR, file_name)
+            with open(source_path, 'r') as source_file:
+                source = source_file.read()
+
+            migration = ModelMigration(model)
+            result = migration.export_data(None, JsonSerializer)
+            self.assertEqual(source.splitlines(), result.splitlines())
+
+
 class SingleExportTest(TempDirMixin, TestCase):
 
     available_apps = ['datamigrations_facades']
@@ -8,10 +8,13 @@ from unittest import skipIf
 
 from django import test
 from django import VERSION as DJANGO_VERSION
+from django.core.management import call_command
 from django.utils import timezone
 from django.utils import translation
+from django.utils.six import StringIO
 
 from yepes.contrib.registry import registry
+from yepes.managers.searchable import SUGGESTION_INDEXES
 from yepes.model_mixins import Displayable
 from yepes.model_mixins.multilingual import TranslationDoesNotExist
 
@@ -1085,6 +1088,86 @@ class SearchableTest(test.TestCase):
             [self.article_2, self.article_1],
         )
 
+    def test_suggestions(self):
+        SUGGESTION_INDEXES.clear()
+        self.assertEqual(
+            Article.objects.suggest('defin'),
+            ['definitive'],
+        )
+        self.assertEqual(
+            Article.objects.suggest('Devel'),
+            ['development', 'developer'],
+        )
+        self.assertEqual(
+            Article.objects.suggest('devel', limit=1),
+            ['development'],
+        )
+        self.assertEqual(Article.objects.suggest('xyz'), [])
+        self.assertEqual(Article.objects.suggest(''), [])
+
+        Article.objects.create(title='Démonstration')
+        suggestions = Article.objects.suggest('demo')
+        self.assertEqual(len(suggestions), 1)
+        self.assertEqual(Article.objects.suggest('DÉMO'), suggestions)
+        SUGGESTION_INDEXES.clear()
+
+    def test_suggestion_updates(self):
+        SUGGESTION_INDEXES.clear()
+        self.addCleanup(SUGGESTION_INDEXES.clear)
+        index = Article.objects.get_suggestion_index()
+        count = dict(index.suggest('book'))['book']
+
+        self.article_1.save()
+        self.assertEqual(dict(index.suggest('book'))['book'], count)
+
+        self.article_1.content = ''
+        self.article_1.save()
+        self.assertEqual(dict(index.suggest('book'))['book'], count - 2)
+
+        self.article_2.delete()
+        self.assertEqual(index.suggest('book'), [])
+
+        Article.objects.filter(pk=self.article_3.pk).update(title='Zyzzyva')
+        self.assertEqual(index.suggest('zyzz'), [])
+        index.populate()
+        self.assertEqual(index.suggest('zyzz'), [('zyzzyva', 1)])
+
+    def test_suggestion_refresh(self):
+        SUGGESTION_INDEXES.clear()
+        self.addCleanup(SUGGESTION_INDEXES.clear)
+        index = Article.objects.get_suggestion_index()
+        suggestions = index.suggest('devel')
+
+        refreshes = []
+        index._refresh = lambda: refreshes.append(True)
+        index._expire_time = 0
+        with self.assertNumQueries(0):  # Stale words are served meanwhile
+            self.assertEqual(index.suggest('devel'), suggestions)
+        self.assertEqual(refreshes, [True])
+
+    def test_suggestions_across_related_fields(self):
+        SUGGESTION_INDEXES.clear()
+        self.addCleanup(SUGGESTION_INDEXES.clear)
+        self.assertEqual(Product.objects.suggest('tso'), ['tsod'])
+        self.variant_1.delete()
+        self.variant_2.delete()
+        self.product_1.save()
+        self.assertEqual(Product.objects.suggest('tso'), [])
+
+    def test_benchmark_command(self):
+        output = StringIO()
+        call_command(
+            'benchmark_search',
+            'modelmixins_tests.Article',
+            rows=[20],
+            repeat=1,
+            stdout=output,
+        )
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(all(line.split()[0] == '20' for line in lines))
+        self.assertEqual(Article.objects.count(), 3)  # Rows are rolled back
+
     def test_search_across_related_fields(self):
         self.assertEqual(
             Product.objects.search('TDGTD'),
@@ -0,0 +1,58 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.utils import timezone
+
+from yepes.contrib.emails.models import Connection
+from yepes.contrib.newsletters.models import (
+    Delivery,
+    Message,
+    Newsletter,
+    Subscriber,
+)
+
+
+def create_newsletter(name='Newsletter'):
+    connection, _ = Connection.objects.get_or_create(
+        name='Connection',
+        defaults={
+            'host': 'localhost',
+            'username': 'username',
+            'password': 'password',
+        },
+    )
+    return Newsletter.objects.create(
+        connection=connection,
+        name=name,
+        slug=name.lower(),
+        sender_name='Sender',
+        sender_address='sender@example.com',
+    )
+
+
+def create_message(newsletter, subject='Subject', html='<p>Hello</p>', text='Hello'):
+    return Message.objects.create(
+        newsletter=newsletter,
+        subject=subject,
+        slug=subject.lower(),
+        html=html,
+        text=text,
+    )
+
+
+def create_subscriber(address, **kwargs):
+    subscriber = Subscriber(**kwargs)
+    subscriber.set_email(address)
+    subscriber.save()
+    return subscriber
+
+
+def create_delivery(message, subscriber, date=None):
+    return Delivery.objects.create(
+        message=message,
+        newsletter_id=message.newsletter_id,
+        subscriber=subscriber,
+        domain_id=subscriber.email_domain_id,
+        date=date or timezone.now(),
+    )
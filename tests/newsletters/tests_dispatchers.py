@@ -0,0 +1,338 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+from datetime import timedelta
+import threading
+from unittest import skipIf
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection, DatabaseError
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from yepes.contrib.emails.models import Connection
+from yepes.contrib.newsletters.dispatchers import Dispatcher, DomainScheduler
+from yepes.contrib.newsletters.models import Delivery
+
+from .helpers import (
+    create_delivery,
+    create_message,
+    create_newsletter,
+    create_subscriber,
+)
+
+
+class Domain(object):
+
+    def __init__(self, pk, name):
+        self.pk = pk
+        self.name = name
+
+
+class FakeDelivery(object):
+
+    def __init__(self, domain, number):
+        self.domain = domain
+        self.domain_id = domain.pk
+        self.number = number
+
+    def __repr__(self):
+        return '{0}{1}'.format(self.domain.name[0], self.number)
+
+
+class TestBackend(EmailBackend):
+    """
+    Keeps the emails in ``mail.outbox`` and fails to send those whose
+    recipient is in ``failing_addresses`` or, without raising any error,
+    in ``silent_addresses``.
+    """
+    closed = 0
+    failing_addresses = set()
+    lock = threading.Lock()
+    silent_addresses = set()
+
+    def close(self):
+        with self.lock:
+            TestBackend.closed += 1
+
+    def send_messages(self, messages):
+        for message in messages:
+            for recipient in message.to:
+                if recipient in self.failing_addresses:
+                    raise IOError('Connection refused')
+                if recipient in self.silent_addresses:
+                    return 0
+
+        with self.lock:
+            return super(TestBackend, self).send_messages(messages)
+
+
+@skipIf(
+    connection.vendor == 'sqlite' and not connection.features.can_share_in_memory_db,
+    'The threads of the dispatcher cannot share the test database.',
+)
+class DispatcherTest(TransactionTestCase):
+
+    available_apps = [
+        'yepes.contrib.emails',
+        'yepes.contrib.newsletters',
+        'newsletters',
+    ]
+
+    def setUp(self):
+        get_backend = Connection.get_backend
+        Connection.get_backend = lambda self: TestBackend()
+
+        def restore():
+            Connection.get_backend = get_backend
+        self.addCleanup(restore)
+        TestBackend.closed = 0
+        TestBackend.failing_addresses = set()
+        TestBackend.silent_addresses = set()
+        mail.outbox = []
+
+        self.newsletter = create_newsletter()
+        self.message = create_message(
+            self.newsletter,
+            html='<p>Hello {{ newsletter.name }}</p>',
+            text='Hello {{ newsletter.name }}',
+        )
+        self.deliveries = [
+            create_delivery(self.message, create_subscriber(address, first_name=name))
+            for address, name
+            in [
+                ('alice@example.com', 'Alice'),
+                ('bob@example.com', 'Bob'),
+                ('carol@example.org', 'Carol'),
+                ('dave@example.net', ''),
+            ]
+        ]
+
+    def get_deliveries(self, *deliveries):
+        return Delivery.objects.filter(
+            pk__in=[delivery.pk for delivery in deliveries or self.deliveries],
+        ).select_related(
+            'domain',
+            'message',
+            'newsletter__connection',
+            'subscriber',
+        ).order_by('pk')
+
+    def test_dispatch(self):
+        # SQLite locks the tables of a shared in-memory database, so only
+        # one thread writes in these tests.
+        dispatcher = Dispatcher(
+            render_workers=2,
+            connections_per_server=1,
+            queue_size=1,
+            domain_concurrency=1,
+        )
+        self.assertEqual(dispatcher.dispatch(self.get_deliveries()), 4)
+        self.assertEqual(dispatcher.errors, [])
+
+        self.assertEqual(len(mail.outbox), 4)
+        emails = {email.to[0]: email for email in mail.outbox}
+        self.assertEqual(sorted(emails), [
+            '"Alice" <alice@example.com>',
+            '"Bob" <bob@example.com>',
+            '"Carol" <carol@example.org>',
+            'dave@example.net',
+        ])
+        email = emails['"Alice" <alice@example.com>']
+        self.assertEqual(email.subject, 'Subject')
+        self.assertEqual(email.from_email, self.newsletter.sender)
+        self.assertEqual(email.body, '\n\nHello Newsletter')
+        self.assertEqual(email.alternatives, [('\n\n<p>Hello Newsletter</p>', 'text/html')])
+        self.assertEqual(email.extra_headers['Precedence'], 'bulk')
+
+        for delivery in self.get_deliveries():
+            self.assertTrue(delivery.is_processed)
+            self.assertIsNotNone(delivery.process_date)
+            self.assertEqual(delivery.attempts, 0)
+
+        self.assertEqual(
+            sorted((stats.name, stats.sent, stats.failed) for stats in dispatcher.domain_stats),
+            [('example.com', 2, 0), ('example.net', 1, 0), ('example.org', 1, 0)],
+        )
+
+    def test_failed_deliveries(self):
+        TestBackend.failing_addresses = {'"Bob" <bob@example.com>'}
+        dispatcher = Dispatcher(connections_per_server=1, retry_delay=60)
+        self.assertEqual(dispatcher.dispatch(self.get_deliveries()), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(len(dispatcher.errors), 1)
+        delivery, exception = dispatcher.errors[0]
+        self.assertEqual(delivery.pk, self.deliveries[1].pk)
+        self.assertIsInstance(exception, IOError)
+
+        delivery = Delivery.objects.get(pk=delivery.pk)
+        self.assertFalse(delivery.is_processed)
+        self.assertEqual(delivery.attempts, 1)
+        self.assertEqual(delivery.lease_owner, '')
+        lease_expiration = delivery.lease_expiration
+        self.assertGreater(lease_expiration, timezone.now() + timedelta(seconds=50))
+        self.assertLess(lease_expiration, timezone.now() + timedelta(seconds=70))
+
+        # The delay is doubled after each attempt.
+        dispatcher.dispatch(self.get_deliveries(delivery))
+        delivery = Delivery.objects.get(pk=delivery.pk)
+        self.assertEqual(delivery.attempts, 2)
+        self.assertGreater(delivery.lease_expiration, timezone.now() + timedelta(seconds=110))
+
+        TestBackend.failing_addresses = set()
+        self.assertEqual(dispatcher.dispatch(self.get_deliveries(delivery)), 1)
+        self.assertTrue(Delivery.objects.get(pk=delivery.pk).is_processed)
+
+    def test_unsent_deliveries(self):
+        TestBackend.silent_addresses = {'"Bob" <bob@example.com>'}
+        dispatcher = Dispatcher(connections_per_server=1, retry_delay=60)
+        self.assertEqual(dispatcher.dispatch(self.get_deliveries()), 3)
+        self.assertEqual(len(dispatcher.errors), 1)
+        delivery, exception = dispatcher.errors[0]
+        self.assertEqual(delivery.pk, self.deliveries[1].pk)
+        self.assertIsInstance(exception, IOError)
+
+        delivery = Delivery.objects.get(pk=delivery.pk)
+        self.assertFalse(delivery.is_processed)
+        self.assertEqual(delivery.attempts, 1)
+        self.assertEqual(delivery.lease_owner, '')
+        self.assertGreater(delivery.lease_expiration, timezone.now() + timedelta(seconds=50))
+
+    def test_database_errors(self):
+        class BrokenQuerySet(object):
+            def update(self, **kwargs):
+                raise DatabaseError('Database is gone')
+
+        deliveries = list(self.get_deliveries())
+        Delivery.objects.filter = lambda *args, **kwargs: BrokenQuerySet()
+        self.addCleanup(delattr, Delivery.objects, 'filter')
+        TestBackend.failing_addresses = {'dave@example.net'}
+
+        # Sending threads do not die when deliveries cannot be updated.
+        dispatcher = Dispatcher(connections_per_server=1)
+        self.assertEqual(dispatcher.dispatch(deliveries), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(len(dispatcher.errors), 4)
+
+    def test_shutdown(self):
+        threads = threading.active_count()
+        dispatcher = Dispatcher(render_workers=3, connections_per_server=2)
+        dispatcher.dispatch(self.get_deliveries())
+        # All the sending threads receive STOP and close their connection.
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(TestBackend.closed, 2)
+
+    def test_no_deliveries(self):
+        dispatcher = Dispatcher()
+        self.assertEqual(dispatcher.dispatch([]), 0)
+        self.assertEqual(dispatcher.domain_stats, [])
+        self.assertEqual(mail.outbox, [])
+
+
+class DomainSchedulerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        domains = [Domain(1, 'a.com'), Domain(2, 'b.com'), Domain(3, 'c.com')]
+        self.deliveries = [
+            FakeDelivery(domains[0], 1),
+            FakeDelivery(domains[0], 2),
+            FakeDelivery(domains[0], 3),
+            FakeDelivery(domains[1], 1),
+            FakeDelivery(domains[1], 2),
+            FakeDelivery(domains[2], 1),
+        ]
+
+    def clock(self):
+        return self.now
+
+    def get_scheduler(self, **kwargs):
+        return DomainScheduler(self.deliveries, clock=self.clock, **kwargs)
+
+    def next_deliveries(self, scheduler):
+        deliveries = []
+        with scheduler.condition:
+            while True:
+                delivery, timeout = scheduler.next_delivery()
+                if delivery is None:
+                    return repr(deliveries), timeout
+                deliveries.append(delivery)
+
+    def test_round_robin(self):
+        scheduler = self.get_scheduler()
+        self.assertEqual(
+            self.next_deliveries(scheduler),
+            ('[a1, b1, c1, a2, b2, a3]', None),
+        )
+        self.assertIsNone(scheduler.acquire())
+
+    def test_concurrency(self):
+        scheduler = self.get_scheduler(concurrency=1)
+        self.assertEqual(self.next_deliveries(scheduler), ('[a1, b1, c1]', None))
+
+        # Domains wait until their deliveries are released.
+        scheduler.release(self.deliveries[3], True)
+        self.assertEqual(self.next_deliveries(scheduler), ('[b2]', None))
+        scheduler.release(self.deliveries[0], False)
+        self.assertEqual(self.next_deliveries(scheduler), ('[a2]', None))
+        scheduler.release(self.deliveries[1], True)
+        self.assertEqual(scheduler.acquire(), self.deliveries[2])
+        self.assertIsNone(scheduler.acquire())
+
+        stats = [(s.name, s.sent, s.failed) for s in scheduler.stats.values()]
+        self.assertEqual(stats, [('a.com', 1, 1), ('b.com', 1, 0), ('c.com', 0, 0)])
+
+    def test_rate(self):
+        scheduler = self.get_scheduler(rate=2)
+        self.assertEqual(self.next_deliveries(scheduler), ('[a1, b1, c1]', 0.5))
+        self.now += 0.25
+        self.assertEqual(self.next_deliveries(scheduler), ('[]', 0.25))
+        self.now += 0.25
+        self.assertEqual(self.next_deliveries(scheduler), ('[a2, b2]', 0.5))
+        self.now += 2
+        # Time not used by a domain is not accumulated.
+        self.assertEqual(self.next_deliveries(scheduler), ('[a3]', None))
+
+    def test_domain_limits(self):
+        scheduler = self.get_scheduler(concurrency=1, rate=10, limits={
+            'a.com': {'concurrency': 2},
+            'b.com': {'rate': 1},
+        })
+        self.assertEqual(scheduler.limits, {1: (2, 10), 2: (1, 1), 3: (1, 10)})
+        self.assertEqual(self.next_deliveries(scheduler), ('[a1, b1, c1]', 0.1))
+        self.now += 0.1
+        self.assertEqual(self.next_deliveries(scheduler), ('[a2]', None))
+
+        scheduler.release(self.deliveries[3], True)
+        self.assertEqual(self.next_deliveries(scheduler), ('[]', 0.9))
+        self.now += 0.9
+        self.assertEqual(self.next_deliveries(scheduler), ('[b2]', None))
+
+    @override_settings(
+        NEWSLETTERS_DOMAIN_CONCURRENCY=3,
+        NEWSLETTERS_DOMAIN_LIMITS={'a.com': {'rate': 5}},
+        NEWSLETTERS_DOMAIN_RATE=None,
+    )
+    def test_settings(self):
+        dispatcher = Dispatcher()
+        self.assertEqual(dispatcher.domain_concurrency, 3)
+        self.assertEqual(dispatcher.domain_limits, {'a.com': {'rate': 5}})
+        self.assertIsNone(dispatcher.domain_rate)
+
+    def test_waiting(self):
+        scheduler = self.get_scheduler(concurrency=1)
+        for _ in range(3):
+            scheduler.acquire()
+
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(scheduler.acquire()))
+        thread.start()
+        thread.join(0.1)
+        self.assertEqual(acquired, [])
+
+        scheduler.release(self.deliveries[0], True)
+        thread.join(5)
+        self.assertEqual(acquired, [self.deliveries[1]])
@@ -0,0 +1,125 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+import json
+
+from django.test import TestCase
+from django.utils.encoding import force_text
+
+from yepes.contrib.newsletters.data_migrations import SubscriberImportation
+from yepes.contrib.newsletters.models import (
+    Domain,
+    Subscriber,
+    SubscriberTag,
+    Subscription,
+)
+
+from .helpers import create_newsletter, create_subscriber
+
+
+class SubscriberPlanTest(TestCase):
+
+    def import_subscribers(self, rows, batch_size=3):
+        migration = SubscriberImportation()
+        return migration.import_data(
+            force_text(json.dumps(rows)),
+            'json',
+            batch_size=batch_size,
+        )
+
+    def test_invalid_addresses(self):
+        plan = self.import_subscribers([
+            {'email_address': 'alice@example.com'},
+            {'email_address': 'invalid'},
+            {'email_address': 'bob@example.com'},
+            {'email_address': 'carol@example.com'},
+            {'email_address': ''},
+            {'email_address': 'dave@'},
+        ])
+        self.assertEqual(plan.errors, [
+            (2, 'invalid', "'invalid' is not a valid email address."),
+            (5, '', "'' is not a valid email address."),
+            (6, 'dave@', "'dave@' is not a valid email address."),
+        ])
+        self.assertEqual(plan.counts['invalid'], 3)
+        self.assertEqual(plan.counts['inserted'], 3)
+        self.assertEqual(
+            list(Subscriber.objects.values_list('email_address', flat=True)),
+            ['alice@example.com', 'bob@example.com', 'carol@example.com'],
+        )
+
+    def test_duplicated_addresses(self):
+        create_subscriber('alice@example.com', first_name='Alice')
+        plan = self.import_subscribers([
+            {'email_address': 'ALICE@EXAMPLE.COM', 'first_name': 'Other'},
+            {'email_address': 'bob@example.com', 'first_name': 'Bob'},
+            {'email_address': ' bob@Example.com', 'first_name': 'Other'},
+            {'email_address': 'bob@example.com', 'first_name': 'Other'},
+        ])
+        self.assertEqual(plan.errors, [])
+        self.assertEqual(plan.counts['skipped'], 3)
+        self.assertEqual(plan.counts['inserted'], 1)
+        self.assertEqual(
+            list(Subscriber.objects.values_list('email_address', 'first_name')),
+            [('alice@example.com', 'Alice'), ('bob@example.com', 'Bob')],
+        )
+
+    def test_domains_and_tags(self):
+        create_subscriber('alice@example.com')
+        SubscriberTag.objects.create(name='old')
+        plan = self.import_subscribers([
+            {'email_address': 'bob@example.com', 'tags': 'old, new'},
+            {'email_address': 'carol@example.org', 'tags': 'new|other'},
+            {'email_address': 'dave@example.net', 'tags': ''},
+            {'email_address': 'eve@example.org', 'tags': 'new,new'},
+        ])
+        self.assertEqual(plan.counts['inserted'], 4)
+        self.assertEqual(
+            sorted(Domain.objects.values_list('name', flat=True)),
+            ['example.com', 'example.net', 'example.org'],
+        )
+        for subscriber in Subscriber.objects.all():
+            self.assertEqual(
+                subscriber.email_domain.name,
+                subscriber.email_address.rsplit('@', 1)[1],
+            )
+            self.assertTrue(subscriber.guid)
+
+        self.assertEqual(
+            sorted(SubscriberTag.objects.values_list('name', flat=True)),
+            ['new', 'old', 'other'],
+        )
+        tags = {
+            subscriber.email_address: sorted(tag.name for tag in subscriber.tags.all())
+            for subscriber
+            in Subscriber.objects.prefetch_related('tags')
+        }
+        self.assertEqual(tags, {
+            'alice@example.com': [],
+            'bob@example.com': ['new', 'old'],
+            'carol@example.org': ['new', 'other'],
+            'dave@example.net': [],
+            'eve@example.org': ['new'],
+        })
+
+    def test_subscriptions(self):
+        news = create_newsletter('News')
+        offers = create_newsletter('Offers')
+        self.import_subscribers([
+            {'email_address': 'alice@example.com', 'newsletters': 'News, Offers'},
+            {'email_address': 'bob@example.org', 'newsletters': 'Offers|Unknown'},
+            {'email_address': 'carol@example.com', 'newsletters': ''},
+            {'email_address': 'dave@example.net', 'newsletters': 'News,News'},
+        ], batch_size=2)
+        subscriptions = Subscription.objects.values_list(
+            'newsletter_id',
+            'subscriber__email_address',
+            'domain__name',
+        )
+        self.assertEqual(sorted(subscriptions), sorted([
+            (news.pk, 'alice@example.com', 'example.com'),
+            (offers.pk, 'alice@example.com', 'example.com'),
+            (offers.pk, 'bob@example.org', 'example.org'),
+            (news.pk, 'dave@example.net', 'example.net'),
+        ]))
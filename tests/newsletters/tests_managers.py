@@ -0,0 +1,298 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+from datetime import timedelta
+from unittest import skipIf
+
+from django import VERSION as DJANGO_VERSION
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from yepes.contrib.newsletters.dispatchers import Dispatcher, DomainScheduler
+from yepes.contrib.newsletters.managers import DeliveryQuerySet
+from yepes.contrib.newsletters.models import (
+    Delivery,
+    Subscriber,
+    SubscriberTag,
+)
+from yepes.contrib.newsletters.views import DispatchView
+
+from .helpers import (
+    create_delivery,
+    create_message,
+    create_newsletter,
+    create_subscriber,
+)
+
+
+class ClaimTest(TestCase):
+
+    def setUp(self):
+        self.message = create_message(create_newsletter())
+        now = timezone.now()
+        self.deliveries = [
+            create_delivery(
+                self.message,
+                create_subscriber('subscriber{0}@example.com'.format(i)),
+                now - timedelta(minutes=10 - i),
+            )
+            for i
+            in range(5)
+        ]
+        self.lease_time = timedelta(minutes=10)
+
+    def claim(self, owner, limit=10, **kwargs):
+        return sorted(
+            Delivery.objects.claim(owner, limit, self.lease_time, **kwargs),
+            key=lambda delivery: delivery.pk,
+        )
+
+    def assertClaimed(self, owner, deliveries, **kwargs):
+        self.assertEqual(
+            self.claim(owner, **kwargs),
+            [self.deliveries[i] for i in deliveries],
+        )
+
+    def test_claim(self):
+        self.assertClaimed('first', [0, 1], limit=2)
+        for delivery in Delivery.objects.filter(lease_owner='first'):
+            self.assertGreater(delivery.lease_expiration, timezone.now())
+
+        # Leased deliveries are skipped by other owners.
+        self.assertClaimed('second', [2, 3, 4])
+        self.assertClaimed('third', [])
+
+    def test_skip_locked(self):
+        self.skip_locked = getattr(connection.features, 'has_select_for_update_skip_locked', False)
+        def restore():
+            connection.features.has_select_for_update_skip_locked = self.skip_locked
+        self.addCleanup(restore)
+        connection.features.has_select_for_update_skip_locked = True
+
+        self.assertClaimed('first', [0, 1], limit=2)
+        self.assertClaimed('second', [2, 3, 4])
+        self.assertClaimed('third', [])
+
+    test_skip_locked = skipIf(
+        DJANGO_VERSION < (1, 11),
+        'select_for_update() has no skip_locked argument',
+    )(test_skip_locked)
+
+    def test_conditional_update(self):
+        # Another owner leases a candidate after it is selected, so the
+        # update does not match it.
+        def update(queryset, **kwargs):
+            QuerySet.update(
+                Delivery.objects.filter(pk=self.deliveries[0].pk),
+                lease_owner='other',
+                lease_expiration=timezone.now() + self.lease_time,
+            )
+            return QuerySet.update(queryset, **kwargs)
+        DeliveryQuerySet.update = update
+        self.addCleanup(delattr, DeliveryQuerySet, 'update')
+
+        self.assertClaimed('first', [1], limit=2)
+        self.assertEqual(
+            Delivery.objects.get(pk=self.deliveries[0].pk).lease_owner,
+            'other',
+        )
+
+    def test_expired_leases(self):
+        Delivery.objects.filter(pk=self.deliveries[0].pk).update(
+            lease_owner='crashed',
+            lease_expiration=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertClaimed('first', [0, 1], limit=2)
+
+    def test_processed_and_future_deliveries(self):
+        Delivery.objects.filter(pk=self.deliveries[0].pk).update(is_processed=True)
+        Delivery.objects.filter(pk=self.deliveries[1].pk).update(
+            date=timezone.now() + timedelta(hours=1),
+        )
+        self.assertClaimed('first', [2, 3, 4])
+
+    def test_max_attempts(self):
+        Delivery.objects.filter(pk=self.deliveries[0].pk).update(attempts=5)
+        Delivery.objects.filter(pk=self.deliveries[1].pk).update(attempts=4)
+        self.assertClaimed('first', [1, 2, 3, 4], max_attempts=5)
+        Delivery.objects.update(lease_owner='', lease_expiration=None)
+        self.assertClaimed('first', [0, 1, 2, 3, 4])
+
+    def test_backoff(self):
+        delivery = self.claim('first', limit=1)[0]
+        delivery.attempts = 2
+        dispatcher = Dispatcher(retry_delay=60)
+        dispatcher.scheduler = DomainScheduler([delivery])
+        dispatcher.scheduler.acquire()
+        dispatcher.delivery_failed(delivery, IOError('Connection refused'))
+
+        delivery = Delivery.objects.get(pk=delivery.pk)
+        self.assertEqual(delivery.lease_owner, '')
+        delay = (delivery.lease_expiration - timezone.now()).total_seconds()
+        self.assertTrue(230 < delay <= 240)
+
+        # The delivery is not claimed until the delay has passed.
+        self.assertClaimed('second', [1, 2, 3, 4])
+        Delivery.objects.filter(pk=delivery.pk).update(
+            lease_expiration=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertClaimed('third', [0])
+
+    def test_renew(self):
+        self.claim('first', limit=3)
+        Delivery.objects.filter(pk=self.deliveries[0].pk).update(is_processed=True)
+        Delivery.objects.filter(pk=self.deliveries[1].pk).update(lease_owner='')
+        self.assertEqual(
+            Delivery.objects.renew('first', timedelta(hours=1)),
+            1,
+        )
+        delivery = Delivery.objects.get(pk=self.deliveries[2].pk)
+        self.assertGreater(
+            delivery.lease_expiration,
+            timezone.now() + timedelta(minutes=59),
+        )
+
+
+class TestDispatchView(DispatchView):
+
+    def get_success_url(self):
+        return '/dispatched/'
+
+
+class ScheduleTest(TestCase):
+
+    def setUp(self):
+        self.message = create_message(create_newsletter())
+        self.date = timezone.now().replace(microsecond=0)
+        self.tags = [
+            SubscriberTag.objects.create(name='a'),
+            SubscriberTag.objects.create(name='b'),
+        ]
+        self.subscribers = []
+        for i, address in enumerate([
+                'alice@example.com',
+                'bob@example.org',
+                'carol@example.com',
+                'dave@example.net',
+                'eve@example.org']):
+            subscriber = create_subscriber(address)
+            subscriber.tags = self.tags[:i % 3]
+            self.subscribers.append(subscriber)
+
+        self.subscribers[4].is_enabled = False
+        self.subscribers[4].save()
+
+    def assertScheduled(self, subscribers):
+        deliveries = Delivery.objects.filter(message=self.message)
+        self.assertEqual(
+            sorted(deliveries.values_list('subscriber_id', flat=True)),
+            sorted(self.subscribers[i].pk for i in subscribers),
+        )
+        for delivery in deliveries.select_related('subscriber'):
+            self.assertEqual(delivery.newsletter_id, self.message.newsletter_id)
+            self.assertEqual(delivery.domain_id, delivery.subscriber.email_domain_id)
+            self.assertEqual(delivery.date, self.date)
+            self.assertFalse(delivery.is_processed)
+            self.assertEqual(delivery.attempts, 0)
+            self.assertEqual(delivery.lease_owner, '')
+
+    def test_unbatched(self):
+        count = Delivery.objects.schedule(
+            self.message,
+            Subscriber.objects.all(),
+            self.date,
+        )
+        self.assertEqual(count, 5)
+        self.assertScheduled([0, 1, 2, 3, 4])
+
+    def test_batched(self):
+        progress = []
+        count = Delivery.objects.schedule(
+            self.message,
+            Subscriber.objects.all(),
+            self.date,
+            batch_size=2,
+            progress=progress.append,
+        )
+        self.assertEqual(count, 5)
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertScheduled([0, 1, 2, 3, 4])
+
+    def test_exact_batches(self):
+        progress = []
+        Delivery.objects.schedule(
+            self.message,
+            Subscriber.objects.filter(pk__in=[s.pk for s in self.subscribers[:4]]),
+            self.date,
+            batch_size=2,
+            progress=progress.append,
+        )
+        self.assertEqual(progress, [2, 4, 4])
+        self.assertScheduled([0, 1, 2, 3])
+
+    def test_tag_joins(self):
+        # Subscribers with both tags are selected twice by the join.
+        subscribers = Subscriber.objects.filter(tags__in=self.tags)
+        self.assertEqual(subscribers.count(), 4)
+        for batch_size in (None, 1):
+            Delivery.objects.filter(message=self.message).delete()
+            count = Delivery.objects.schedule(
+                self.message,
+                subscribers,
+                self.date,
+                batch_size=batch_size,
+            )
+            self.assertEqual(count, 3)
+            self.assertScheduled([1, 2, 4])
+
+    def test_empty_queryset(self):
+        progress = []
+        count = Delivery.objects.schedule(
+            self.message,
+            Subscriber.objects.none(),
+            self.date,
+            batch_size=2,
+            progress=progress.append,
+        )
+        self.assertEqual(count, 0)
+        self.assertEqual(progress, [0])
+        self.assertScheduled([])
+
+    @override_settings(NEWSLETTERS_SCHEDULE_BATCH_SIZE=2)
+    def test_dispatch_view(self):
+        Delivery.objects.create(
+            message=self.message,
+            newsletter_id=self.message.newsletter_id,
+            subscriber=self.subscribers[0],
+            domain_id=self.subscribers[0].email_domain_id,
+            date=self.date,
+        )
+        view = TestDispatchView.as_view()
+        request = RequestFactory().post('/', {
+            'date_0': self.date.strftime('%Y-%m-%d'),
+            'date_1': self.date.strftime('%H:%M:%S'),
+            'tags_filter': 'eq',
+            'tags_filter_value': self.tags[0].pk,
+        })
+        response = view(request, pk=self.message.pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], '/dispatched/')
+        # Disabled subscribers and those that already have a delivery
+        # are skipped.
+        self.assertEqual(
+            sorted(Delivery.objects.filter(message=self.message).values_list('subscriber_id', flat=True)),
+            [self.subscribers[0].pk, self.subscribers[1].pk, self.subscribers[2].pk],
+        )
+
+        request = RequestFactory().post('/', {
+            'date_0': self.date.strftime('%Y-%m-%d'),
+            'date_1': self.date.strftime('%H:%M:%S'),
+            'tags_filter': 'ne',
+            'tags_filter_value': self.tags[1].pk,
+        })
+        view(request, pk=self.message.pk)
+        self.assertEqual(Delivery.objects.filter(message=self.message).count(), 4)
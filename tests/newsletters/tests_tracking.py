@@ -0,0 +1,111 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+import threading
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from yepes.contrib.newsletters.models import (
+    Click,
+    Delivery,
+    MessageLink,
+    Open,
+)
+from yepes.contrib.newsletters.tracking import TrackingBuffer
+
+from .helpers import (
+    create_delivery,
+    create_message,
+    create_newsletter,
+    create_subscriber,
+)
+from .tests_views import CACHES
+
+
+@override_settings(
+    CACHES=CACHES,
+    NEWSLETTERS_TRACKING_CACHE='newsletters_tests',
+)
+class TrackingBufferTest(TestCase):
+
+    def setUp(self):
+        super(TrackingBufferTest, self).setUp()
+        caches['newsletters_tests'].clear()
+        self.message = create_message(create_newsletter())
+        self.subscriber = create_subscriber('alice@example.com')
+        self.delivery = create_delivery(self.message, self.subscriber)
+        self.link = MessageLink.objects.create(url='http://example.com/')
+        self.buffer = TrackingBuffer(max_size=100, interval=3600)
+
+    def test_opens(self):
+        self.buffer.add_open(self.message.guid, self.subscriber.guid)
+        self.buffer.add_open(self.message.guid, self.subscriber.guid)
+        self.buffer.add_open(self.message.guid, 'unknown')
+        self.assertEqual(len(self.buffer.opens), 2)
+        self.assertEqual(Open.objects.count(), 0)
+
+        self.buffer.flush()
+        self.assertEqual(len(self.buffer.opens), 0)
+        open = Open.objects.get()
+        self.assertEqual(open.message, self.message)
+        self.assertEqual(open.newsletter_id, self.message.newsletter_id)
+        self.assertEqual(open.subscriber, self.subscriber)
+        self.assertEqual(open.domain_id, self.subscriber.email_domain_id)
+        delivery = Delivery.objects.get(pk=self.delivery.pk)
+        self.assertTrue(delivery.is_opened)
+        self.assertFalse(delivery.is_clicked)
+
+    def test_clicks(self):
+        self.buffer.add_click(self.link.guid, self.message.guid, self.subscriber.guid)
+        self.buffer.add_click(self.link.guid, self.message.guid, self.subscriber.guid)
+        self.buffer.add_click('unknown', self.message.guid, self.subscriber.guid)
+        self.buffer.flush()
+
+        self.assertEqual(Click.objects.count(), 2)
+        # Like the unbuffered views, clicks mark the delivery as opened but
+        # do not create opens.
+        self.assertEqual(Open.objects.count(), 0)
+        delivery = Delivery.objects.get(pk=self.delivery.pk)
+        self.assertTrue(delivery.is_clicked)
+        self.assertTrue(delivery.is_opened)
+
+    def test_failed_flush(self):
+        self.buffer.add_open(self.message.guid, self.subscriber.guid)
+        self.buffer.add_click(self.link.guid, self.message.guid, self.subscriber.guid)
+
+        def write(clicks, opens):
+            Click.objects.create(
+                link=self.link,
+                message=self.message,
+                subscriber=self.subscriber,
+            )
+            raise RuntimeError('Database error')
+
+        self.buffer.write = write
+        with self.assertRaises(RuntimeError):
+            self.buffer.flush()
+
+        # Nothing is written and the events are kept for the next flush.
+        self.assertEqual(Click.objects.count(), 0)
+        self.assertEqual(len(self.buffer.clicks), 1)
+        self.assertEqual(len(self.buffer.opens), 1)
+
+        del self.buffer.write
+        self.buffer.flush()
+        self.assertEqual(Click.objects.count(), 1)
+        self.assertEqual(Open.objects.count(), 1)
+
+    def test_background_flush(self):
+        flushed = threading.Event()
+        self.buffer.max_size = 2
+        self.buffer.flush = flushed.set
+
+        self.buffer.add_click(self.link.guid, self.message.guid, self.subscriber.guid)
+        self.assertTrue(self.buffer.thread.is_alive())
+        self.assertFalse(flushed.wait(0.1))
+
+        self.buffer.add_open(self.message.guid, self.subscriber.guid)
+        self.assertTrue(flushed.wait(5))
@@ -0,0 +1,161 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django import VERSION as DJANGO_VERSION
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from yepes.contrib.newsletters.models import (
+    MessageImage,
+    MessageLink,
+    Newsletter,
+    Subscriber,
+)
+from yepes.contrib.newsletters import utils
+from yepes.contrib.newsletters.utils import (
+    get_template,
+    prerender,
+    prerender_many,
+    render,
+    split_template,
+)
+from yepes.test_mixins import TempDirMixin
+
+from .tests_views import CACHES, make_png
+
+
+@override_settings(
+    CACHES=CACHES,
+    NEWSLETTERS_PRERENDER_CACHE='newsletters_tests',
+)
+class PrerenderTest(TempDirMixin, TestCase):
+
+    tempDirPrefix = 'test_newsletters_utils_'
+
+    def setUp(self):
+        super(PrerenderTest, self).setUp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.temp_dir)
+        self.settings_override.enable()
+        caches['newsletters_tests'].clear()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        super(PrerenderTest, self).tearDown()
+
+    def test_images(self):
+        source = "<img src=\"{% image_url 'logo' %}\">"
+        self.assertEqual(prerender(source), '\n<img src="">')
+
+        image = MessageImage(name='logo')
+        image.image = SimpleUploadedFile('logo.png', make_png())
+        image.save()
+
+        # The cached source is resolved again.
+        self.assertEqual(
+            prerender(source),
+            "\n<img src=\"{{% prerendered_image '{0}' %}}\">".format(image.guid),
+        )
+
+    def test_links(self):
+        sources = [
+            ("{% link_url 'http://example.com/' %}", None),
+            ("{% link_url 'http://example.com/' %}{% link_url 'http://example.org/' %}", None),
+        ]
+        results = prerender_many(sources)
+        self.assertEqual(2, MessageLink.objects.count())
+        com = MessageLink.objects.get(url='http://example.com/')
+        org = MessageLink.objects.get(url='http://example.org/')
+        self.assertEqual(results, [
+            "\n{{% prerendered_link '{0}' %}}".format(com.guid),
+            "\n{{% prerendered_link '{0}' %}}{{% prerendered_link '{1}' %}}".format(com.guid, org.guid),
+        ])
+        self.assertEqual(prerender_many(sources), results)
+        self.assertEqual(2, MessageLink.objects.count())
+
+
+class GetTemplateTest(TestCase):
+
+    def setUp(self):
+        compile_template = utils.compile_template
+        self.compiled = []
+        def compile_and_count(template_string):
+            self.compiled.append(template_string)
+            return compile_template(template_string)
+        utils.compile_template = compile_and_count
+        self.addCleanup(setattr, utils, 'compile_template', compile_template)
+
+    def test_compiled_once(self):
+        source = '<p>{{ subscriber.first_name }} {% now "Y" %}</p>'
+        template = get_template(source)
+        self.assertIs(get_template(source), template)
+        self.assertIs(get_template(''.join(['<p>', source[3:]])), template)
+        self.assertEqual(self.compiled, [source])
+
+    def test_edited_source(self):
+        source = '<p>{{ subscriber.last_name }}</p>'
+        template = get_template(source)
+        edited_template = get_template(source + '\n')
+        self.assertIsNot(edited_template, template)
+        self.assertIs(get_template(source), template)
+        self.assertEqual(self.compiled, [source, source + '\n'])
+
+
+class Boom(object):
+
+    @property
+    def name(self):
+        raise ValueError('Boom!')
+
+
+class SplitTemplateTest(TestCase):
+
+    source = (
+        '{% load i18n %}<h1>{{ newsletter.name|upper }}</h1>'
+        '{# Comment #}<p>{% trans "Hello" %} {{ subscriber.first_name }},</p>'
+        '{% if subscriber.last_name %}<p>{{ subscriber.last_name }}</p>{% endif %}'
+        '{% for tag in tags %}<i>{{ tag }}</i>{% endfor %}'
+        '<p>{{ newsletter.sender_name|default:subscriber.email_address }}</p>'
+    )
+
+    def setUp(self):
+        self.context = {
+            'newsletter': Newsletter(name='News', sender_name=''),
+            'tags': ['a', 'b'],
+        }
+
+    def test_same_output(self):
+        split = split_template(self.source, self.context)
+        for subscriber in (
+                Subscriber(first_name='Alice', last_name='Liddell',
+                           email_address='alice@example.com'),
+                Subscriber(first_name='Bob', email_address='bob@example.com')):
+            context = dict(self.context, subscriber=subscriber)
+            self.assertEqual(
+                render(split, context),
+                render(self.source, context),
+            )
+
+        self.assertEqual(
+            render(split, dict(self.context, subscriber=Subscriber(first_name='Bob'))),
+            '\n<h1>NEWS</h1><p>Hello Bob,</p><i>a</i><i>b</i><p></p>',
+        )
+
+    @override_settings(TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {'debug': True},
+    }])
+    def test_errors(self):
+        split = split_template('<p>{{ newsletter.name }}</p>{{ subscriber.name }}', {
+            'newsletter': Newsletter(name='News'),
+        })
+        with self.assertRaisesRegexp(ValueError, 'Boom!') as cm:
+            render(split, {'subscriber': Boom()})
+
+        if DJANGO_VERSION >= (1, 9):
+            self.assertEqual(
+                cm.exception.template_debug['during'],
+                '{{ subscriber.name }}',
+            )
@@ -0,0 +1,110 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+from io import BytesIO
+
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import FileResponse
+from django.test import TestCase
+from django.test.utils import override_settings
+from PIL import Image
+
+from yepes.contrib.newsletters.models import MessageImage
+from yepes.test_mixins import TempDirMixin
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+    'newsletters_tests': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'newsletters_tests',
+    },
+}
+
+
+def make_png():
+    buffer = BytesIO()
+    Image.new('RGB', (10, 10), (255, 0, 0)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(
+    CACHES=CACHES,
+    NEWSLETTERS_IMAGE_CACHE='newsletters_tests',
+    ROOT_URLCONF='newsletters.urls',
+)
+class ImageViewTest(TempDirMixin, TestCase):
+
+    tempDirPrefix = 'test_newsletters_views_'
+
+    def setUp(self):
+        super(ImageViewTest, self).setUp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.temp_dir)
+        self.settings_override.enable()
+        caches['newsletters_tests'].clear()
+        self.data = make_png()
+        self.image = MessageImage(name='logo')
+        self.image.image = SimpleUploadedFile('logo.png', self.data)
+        self.image.save()
+        self.url = '/newsletters/images/{0}/'.format(self.image.guid)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        super(ImageViewTest, self).tearDown()
+
+    def test_cached_image(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIsInstance(response, FileResponse)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+        self.assertEqual(response.content, self.data)
+        etag = response['ETag']
+
+        # The second request does not read the storage.
+        self.image.image.storage.delete(self.image.image.name)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, self.data)
+
+    def test_changed_image(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+
+        buffer = BytesIO()
+        Image.new('RGB', (20, 20), (0, 0, 255)).save(buffer, 'PNG')
+        self.image.image = SimpleUploadedFile('logo.png', buffer.getvalue())
+        self.image.save()
+
+        response = self.client.get(self.url)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.content, buffer.getvalue())
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(NEWSLETTERS_IMAGE_MAX_CACHED_SIZE=10)
+    def test_streamed_image(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        response.close()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,7 @@
+# -*- coding:utf-8 -*-
+
+from django.conf.urls import include, url
+
+urlpatterns = [
+    url(r'^newsletters/', include('yepes.contrib.newsletters.urls')),
+]
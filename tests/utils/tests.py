@@ -26,6 +26,7 @@ from yepes.utils import (
     modules,
     properties,
     slugify,
+    structures,
     unidecode,
 )
 from yepes.utils.minifier import decorators as minifier_decorators
@@ -533,6 +534,35 @@ class SlugifyTest(test.SimpleTestCase):
         ])
 
 
+class StructuresTest(test.SimpleTestCase):
+
+    def test_lru_dict(self):
+        d = structures.LRUDict(2)
+        d['a'] = 1
+        d['b'] = 2
+        self.assertEqual(d.get('a'), 1)
+        self.assertIsNone(d.get('e'))
+        d['c'] = 3
+        self.assertEqual(list(d.keys()), ['a', 'c'])
+        self.assertNotIn('b', d)
+
+        d['a'] = 4
+        d['d'] = 5
+        self.assertEqual(list(d.items()), [('a', 4), ('d', 5)])
+        self.assertEqual(list(d.values()), [4, 5])
+
+        # Indexing does not change the order.
+        self.assertEqual(d['a'], 4)
+        self.assertEqual(list(d.keys()), ['a', 'd'])
+        d.touch('a')
+        self.assertEqual(list(d.keys()), ['d', 'a'])
+
+        d = structures.LRUDict()
+        for i in range(100):
+            d[i] = i
+        self.assertEqual(len(d), 100)
+
+
 class UnidecodeTest(test.SimpleTestCase):
 
     def checkUnidecode(self, tests):
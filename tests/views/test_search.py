@@ -0,0 +1,108 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+import datetime
+
+from django import test
+
+from yepes.views.search import Facet, FacetedSearchQuery
+
+from .models import Author, Book
+
+
+class AuthorFacet(Facet):
+
+    field = 'authors__name'
+    name = 'author'
+
+
+class PagesFacet(Facet):
+
+    field = 'pages'
+    name = 'pages'
+
+
+class CountFacetsTests(test.TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author1 = Author.objects.create(
+            name='Roberto Bolaño',
+            slug='roberto-bolano'
+        )
+        cls.author2 = Author.objects.create(
+            name='Scott Rosenberg',
+            slug='scott-rosenberg'
+        )
+        cls.book1 = Book.objects.create(
+            name='2066',
+            slug='2066',
+            pages=800,
+            pubdate=datetime.date(2008, 10, 1)
+        )
+        cls.book1.authors.add(cls.author1, cls.author2)
+        cls.book2 = Book.objects.create(
+            name='Dreaming in Code',
+            slug='dreaming-in-code',
+            pages=300,
+            pubdate=datetime.date(2006, 5, 1)
+        )
+        cls.book2.authors.add(cls.author2)
+        cls.book3 = Book.objects.create(
+            name='Code Complete',
+            slug='code-complete',
+            pages=300,
+            pubdate=datetime.date(2004, 6, 9)
+        )
+
+    def setUp(self):
+        self.query = FacetedSearchQuery(view=None)
+        self.facets = [AuthorFacet(self.query), PagesFacet(self.query)]
+
+    def test_queryset(self):
+        with self.assertNumQueries(1):
+            counts = self.query.count_facets(Book.objects.all(), self.facets)
+
+        self.assertEqual(counts, {
+            'author': {
+                'Roberto Bolaño': 1,
+                'Scott Rosenberg': 2,
+                None: 1,
+            },
+            'pages': {
+                300: 2,
+                800: 1,
+            },
+        })
+
+    def test_filtered_queryset(self):
+        object_list = Book.objects.filter(pages=300)
+        counts = self.query.count_facets(object_list, self.facets)
+        self.assertEqual(counts, {
+            'author': {
+                'Scott Rosenberg': 1,
+                None: 1,
+            },
+            'pages': {
+                300: 2,
+            },
+        })
+
+    def test_empty_queryset(self):
+        with self.assertNumQueries(0):
+            counts = self.query.count_facets(Book.objects.none(), self.facets)
+
+        self.assertEqual(counts, {'author': {}, 'pages': {}})
+
+    def test_list(self):
+        facets = [PagesFacet(self.query)]
+        object_list = [self.book1, self.book2, self.book3]
+        with self.assertNumQueries(0):
+            counts = self.query.count_facets(object_list, facets)
+
+        self.assertEqual(counts, {'pages': {300: 2, 800: 1}})
+
+    def test_no_facets(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.query.count_facets(Book.objects.all(), []), {})
@@ -2,6 +2,9 @@
 
 from __future__ import unicode_literals
 
+import io
+import os
+import re
 from tempfile import TemporaryFile
 from wsgiref.util import FileWrapper
 
@@ -10,6 +13,9 @@ from django.contrib.admin import helpers
 from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse
 from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.encoding import force_bytes
+from django.utils.text import compress_sequence
 from django.utils.translation import ugettext as _
 from django.views.decorators.csrf import csrf_protect
 from django.views.generic import FormView, View
@@ -17,9 +23,11 @@ from django.views.generic import FormView, View
 from yepes.admin.forms import MassUpdateFormSet, MassUpdateErrorList
 from yepes.admin.view_mixins import AdminMixin
 from yepes.contrib.datamigrations import QuerySetExportation
+from yepes.contrib.datamigrations.serializers import serializers
 from yepes.utils.views import decorate_view
 
 
+ACCEPTS_GZIP_RE = re.compile(r'\bgzip\b')
 TRUE_VALUES = ('on', 'yes', 'true', '1')
 
 
@@ -29,6 +37,7 @@ TRUE_VALUES = ('on', 'yes', 'true', '1')
 class CsvExportView(AdminMixin, View):
 
     content_type='text/csv; charset=utf-8'
+    gzip_response = True
     serializer_name = 'csv'
 
     def dispatch(self, request, *args, **kwargs):
@@ -42,11 +51,36 @@ class CsvExportView(AdminMixin, View):
     def get(self, request, *args, **kwargs):
         qs = self.get_queryset()
         opts = qs.model._meta
-        temp_file = TemporaryFile()
         migration = QuerySetExportation(qs)
-        migration.export_data(temp_file, self.serializer_name)
+        serializer_class = serializers.get_serializer(self.serializer_name)
+        serializer = serializer_class(encoding='utf-8')
+        if serializer.is_streamable:
+            content = (
+                force_bytes(chunk)
+                for chunk
+                in migration.iterexport_data(serializer)
+                if chunk
+            )
+            length = None
+        else:
+            # Serializers that cannot yield chunks build the whole output at
+            # once, so it is written to disk instead of to memory.
+            temp_file = TemporaryFile()
+            stream = io.open(temp_file.fileno(), 'wb', closefd=False)
+            with serializer.wrap_to_dump(stream) as dump_file:
+                migration.export_data(dump_file, serializer)
+
+            length = os.fstat(temp_file.fileno()).st_size
+            temp_file.seek(0)
+            content = FileWrapper(temp_file)
+
+        compress = (self.gzip_response
+                    and ACCEPTS_GZIP_RE.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        if compress:
+            content = compress_sequence(content)
+
         response = StreamingHttpResponse(
-            FileWrapper(temp_file),
+            content,
             content_type=self.content_type,
         )
         response['Content-Disposition'] = 'attachment; filename="{0}.{1}.{2}"'.format(
@@ -54,8 +88,12 @@ class CsvExportView(AdminMixin, View):
             opts.object_name,
             self.serializer_name,
         )
-        response['Content-Length'] = temp_file.tell()
-        temp_file.seek(0)
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        elif length is not None:
+            response['Content-Length'] = length
+
+        patch_vary_headers(response, ('Accept-Encoding', ))
         return response
 
 
@@ -0,0 +1,265 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+import contextlib
+import gzip
+import io
+import shutil
+import tarfile
+import tempfile
+import time
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
+try:
+    import lzma
+except ImportError:  # Python 2
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from django.utils import six
+
+NUL = b'\0'
+
+
+def _open_bz2(file, mode):
+    return bz2.BZ2File(file, mode)
+
+
+def _open_gz(file, mode):
+    return gzip.GzipFile(fileobj=file, mode=mode)
+
+
+def _open_xz(file, mode):
+    return lzma.LZMAFile(file, mode)
+
+
+def _open_zst(file, mode):
+    if 'w' in mode:
+        stream = zstandard.ZstdCompressor().stream_writer(file, closefd=False)
+    else:
+        stream = zstandard.ZstdDecompressor().stream_reader(file, closefd=False)
+    return stream
+
+
+COMPRESSIONS = {
+    'gz': _open_gz,
+}
+if bz2 is not None and six.PY3:  # BZ2File only accepts file objects in Python 3.
+    COMPRESSIONS['bz2'] = _open_bz2
+if lzma is not None:
+    COMPRESSIONS['xz'] = _open_xz
+if zstandard is not None:
+    COMPRESSIONS['zst'] = _open_zst
+
+
+def split_member_name(name):
+    """
+    Returns the name of the member without the compression extension, and
+    the compression (or None if the member is not compressed).
+    """
+    base_name, _, extension = name.rpartition('.')
+    if base_name and extension in COMPRESSIONS:
+        return base_name, extension
+    else:
+        return name, None
+
+
+class MemberFile(io.RawIOBase):
+    """
+    Writable file-like object that writes in the archive file but counts
+    positions from the beginning of the member, so the member looks like
+    an independent file to the serializers.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.start = file.tell()
+        self.size = 0
+
+    def flush(self):
+        self.file.flush()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.tell() + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError('Invalid whence ({0})'.format(whence))
+
+        self.file.seek(self.start + position)
+        return position
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.file.tell() - self.start
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.file.write(data)
+        self.size = max(self.size, self.tell())
+        return len(data)
+
+
+class MemberReader(io.RawIOBase):
+    """
+    Readable file-like object that reads from the given stream. Wrapped in a
+    ``BufferedReader``, it provides the ``read1()`` method required by
+    ``TextIOWrapper``, which the streams of ``tarfile`` and ``gzip`` lack in
+    Python 2.
+    """
+    def __init__(self, file):
+        self.file = file
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+        super(MemberReader, self).close()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.file.read(len(b))
+        size = len(data)
+        b[:size] = data
+        return size
+
+
+class ArchiveWriter(object):
+    """
+    Writes a tar archive whose members are compressed one by one, instead of
+    compressing the whole archive. Thus, members are written directly in the
+    archive file and can be read later without extracting the others.
+
+    The size of each member is filled in its header once the member has been
+    written. If the archive file is not seekable, each member is written in
+    a temporary file before copying it to the archive.
+
+    """
+    def __init__(self, file, compression='gz'):
+        if compression is not None and compression not in COMPRESSIONS:
+            msg = "Compression '{0}' is not available."
+            raise ValueError(msg.format(compression))
+
+        self.file = file
+        self.compression = compression
+        try:
+            self.start = file.tell()
+        except (AttributeError, IOError, OSError):
+            self.start = None
+            self.offset = 0
+        else:
+            self.offset = self.start
+
+    def close(self):
+        # Two empty blocks mark the end of the archive, which is padded to a
+        # whole record.
+        self._write(NUL * tarfile.BLOCKSIZE * 2)
+        remainder = self.offset % tarfile.RECORDSIZE
+        if remainder:
+            self._write(NUL * (tarfile.RECORDSIZE - remainder))
+
+    @contextlib.contextmanager
+    def open_member(self, name, compress=True):
+        """
+        Returns a context manager that yields a binary file-like object where
+        the member content must be written.
+        """
+        compression = self.compression if compress else None
+        if compression is not None:
+            name = '.'.join((name, compression))
+
+        info = tarfile.TarInfo(name)
+        info.mode = 0o644
+        info.mtime = int(time.time())
+
+        if self.start is not None:
+            header_offset = self.offset
+            self._write(self._get_header(info))
+            member = MemberFile(self.file)
+        else:
+            member = MemberFile(tempfile.TemporaryFile())
+
+        raw_stream = io.BufferedWriter(member)
+        if compression is not None:
+            stream = COMPRESSIONS[compression](raw_stream, 'wb')
+        else:
+            stream = raw_stream
+        try:
+            yield stream
+        finally:
+            stream.close()
+            raw_stream.close()
+
+        info.size = member.size
+        if self.start is not None:
+            self.file.seek(header_offset)
+            self.file.write(self._get_header(info))
+            self.file.seek(member.start + member.size)
+            self.offset = member.start + member.size
+        else:
+            self._write(self._get_header(info))
+            member.file.seek(0)
+            shutil.copyfileobj(member.file, self.file)
+            member.file.close()
+            self.offset += member.size
+
+        remainder = member.size % tarfile.BLOCKSIZE
+        if remainder:
+            self._write(NUL * (tarfile.BLOCKSIZE - remainder))
+
+    def _get_header(self, info):
+        # GNU format keeps the header length whatever the member size is.
+        return info.tobuf(tarfile.GNU_FORMAT, 'utf-8', 'strict')
+
+    def _write(self, data):
+        self.file.write(data)
+        self.offset += len(data)
+
+
+class ArchiveReader(object):
+    """
+    Reads the archives written by ``ArchiveWriter``. Members can be read in
+    any order because they are decompressed on the fly from their position
+    in the archive file, which must be seekable.
+    """
+    def __init__(self, file):
+        self.tar = tarfile.open(fileobj=file, mode='r')
+
+    def close(self):
+        self.tar.close()
+
+    def get_members(self):
+        return [
+            info
+            for info
+            in self.tar.getmembers()
+            if info.isfile()
+        ]
+
+    def open_member(self, info):
+        """
+        Returns a binary file-like object to read the content of the member.
+        """
+        stream = self.tar.extractfile(info)
+        _, compression = split_member_name(info.name)
+        if compression is not None:
+            stream = COMPRESSIONS[compression](stream, 'rb')
+        if six.PY2:
+            stream = io.BufferedReader(MemberReader(stream))
+        return stream
@@ -0,0 +1,172 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import division, unicode_literals
+
+import io
+import json
+import os
+import threading
+from timeit import default_timer
+
+from django.utils import six
+
+from yepes.contrib.datamigrations.exceptions import DataImportionError
+
+
+class Checkpoint(object):
+    """
+    Stores in a JSON file how many rows of each importation have already
+    been committed, so an interrupted importation can be resumed from the
+    last commit instead of starting over.
+
+    Unless ``resume`` is True, any previous state is discarded. If the path
+    of the ``source`` file (or directory) is given, its size and its
+    modification time are stored with the offsets and the importation is not
+    resumed if they have changed, because the offsets would not match the
+    same rows.
+
+    """
+    def __init__(self, path, resume=False, source=None):
+        self.path = path
+        self.source_info = get_source_info(source) if source else None
+        self.state = {}
+        self.lock = threading.Lock()
+        if resume and os.path.exists(path):
+            with io.open(path, 'rt', encoding='utf-8') as file:
+                saved_state = json.load(file)
+
+            if saved_state.get('source') != self.source_info:
+                msg = ("'{0}' has changed since the checkpoint was saved, "
+                       "the importation cannot be resumed.")
+                raise DataImportionError(msg.format(source))
+
+            self.state = saved_state.get('importations', {})
+
+    def clear(self):
+        self.state = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def get_offset(self, key):
+        return self.state.get(key, {}).get('offset', 0)
+
+    def is_finished(self, key):
+        return self.state.get(key, {}).get('finished', False)
+
+    def save(self):
+        # The file is replaced at once, so it is never left half written.
+        temp_path = self.path + '.tmp'
+        saved_state = {
+            'importations': self.state,
+            'source': self.source_info,
+        }
+        with io.open(temp_path, 'wt', encoding='utf-8') as file:
+            # ``json.dumps()`` returns bytes in Python 2.
+            file.write(six.text_type(json.dumps(saved_state, sort_keys=True)))
+
+        if os.name == 'nt' and os.path.exists(self.path):
+            os.remove(self.path)
+
+        os.rename(temp_path, self.path)
+
+    def set_offset(self, key, offset, finished=False):
+        # Models may be imported by several threads at once.
+        with self.lock:
+            self.state[key] = {
+                'offset': offset,
+                'finished': finished,
+            }
+            self.save()
+
+
+class ProgressReport(object):
+    """
+    Callable that can be given as ``progress`` to ``ImportationPlan.run()``
+    to write the number of imported rows and the throughput, and also the
+    remaining time if the ``total`` number of rows is known.
+
+    Lines are written at most once every ``interval`` seconds.
+
+    """
+    def __init__(self, stdout, total=None, interval=1.0):
+        self.stdout = stdout
+        self.total = total
+        self.interval = interval
+        self.last_report = None
+
+    def __call__(self, plan):
+        now = default_timer()
+        if (self.last_report is not None
+                and now - self.last_report < self.interval):
+            return
+
+        self.last_report = now
+        self.stdout.write(self.format(plan))
+
+    def format(self, plan):
+        done = plan.offset + plan.processed
+        if plan.elapsed_time:
+            rate = plan.processed / plan.elapsed_time
+        else:
+            rate = 0
+
+        msg = '{0}: {1} entries ({2:.0f} entries per second)'.format(
+            plan.get_checkpoint_key(),
+            done,
+            rate,
+        )
+        if self.total:
+            msg += ', {0:.0f}%'.format(min(done / self.total, 1) * 100)
+            if rate:
+                remaining = max(self.total - done, 0) / rate
+                msg += ', ETA {0}'.format(format_seconds(remaining))
+
+        return msg + '.'
+
+
+def estimate_rows(file_path, serializer_name):
+    """
+    Estimates the number of rows of a file by counting its lines, without
+    loading it in memory. Returns None for the formats whose rows do not
+    match the lines.
+    """
+    if serializer_name not in ('csv', 'jsonl', 'tsv'):
+        return None
+
+    count = 0
+    with io.open(file_path, 'rb') as file:
+        for line in file:
+            if line.strip():
+                count += 1
+
+    if serializer_name != 'jsonl':
+        count -= 1  # Headers
+
+    return max(count, 0)
+
+
+def get_source_info(path):
+    """
+    Returns the size and the modification time of the given file or, if it
+    is a directory, the total size and the last modification time of its
+    files.
+    """
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    size = 0
+    mtime = os.stat(path).st_mtime
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            stat = os.stat(os.path.join(dir_path, file_name))
+            size += stat.st_size
+            mtime = max(mtime, stat.st_mtime)
+
+    return {'size': size, 'mtime': mtime}
+
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{0:d}:{1:02d}:{2:02d}'.format(hours, minutes, seconds)
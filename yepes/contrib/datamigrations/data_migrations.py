@@ -8,6 +8,7 @@ from django.db import models
 from django.utils import six
 from django.utils.six.moves import zip
 
+from yepes.contrib.datamigrations.constants import TEXT
 from yepes.contrib.datamigrations.exceptions import (
     UnableToCreateError,
     UnableToExportError,
@@ -36,13 +37,8 @@ class DataMigration(object):
     fields = []
 
     def export_data(self, file=None, serializer=None):
-        if not self.can_export:
-            raise UnableToExportError
-
-        serializer = self.get_serializer(serializer)
-        headers = [fld.name for fld in self.fields_to_export]
-        data = self.get_data_to_export(serializer)
-        return serializer.serialize(headers, data, file)
+        serializer, headers, data, data_types = self._prepare_exportation(serializer)
+        return serializer.serialize(headers, data, file, data_types)
 
     def get_data_to_export(self, serializer):
         raise NotImplementedError('Subclasses of DataMigration must override get_data_to_export() method')
@@ -80,7 +76,8 @@ class DataMigration(object):
 
         return serializer
 
-    def import_data(self, source, serializer=None, plan=None, batch_size=100):
+    def import_data(self, source, serializer=None, plan=None, batch_size=100,
+                          commit_every=None, checkpoint=None, progress=None):
         if not self.can_import:
             raise UnableToImportError
 
@@ -93,7 +90,22 @@ class DataMigration(object):
 
         serializer = self.get_serializer(serializer)
         data = self.get_data_to_import(source, serializer)
-        plan.run(data, batch_size)
+        plan.run(
+            data,
+            batch_size,
+            commit_every=commit_every,
+            checkpoint=checkpoint,
+            progress=progress,
+        )
+        return plan
+
+    def iterexport_data(self, serializer=None):
+        """
+        Yields the serialized data in chunks while it is being read from the
+        database.
+        """
+        serializer, headers, data, data_types = self._prepare_exportation(serializer)
+        return serializer.iterserialize(headers, data, data_types)
 
     @property
     def can_export(self):
@@ -111,9 +123,29 @@ class DataMigration(object):
     def fields_to_import(self):
         return self.fields if self.can_create or self.can_update else []
 
+    def _prepare_exportation(self, serializer):
+        if not self.can_export:
+            raise UnableToExportError
+
+        serializer = self.get_serializer(serializer)
+        fields = self.fields_to_export
+        headers = [fld.name for fld in fields]
+        data_types = [
+            fld.data_type
+            if not fld.force_string
+                and fld.data_type in serializer.exportation_data_types
+            else TEXT
+            for fld
+            in fields
+        ]
+        data = self.get_data_to_export(serializer)
+        return serializer, headers, data, data_types
+
 
 class BaseModelMigration(DataMigration):
 
+    export_chunk_size = 1000
+
     def __init__(self, model, use_base_manager=False,
                        ignore_missing_foreign_keys=False):
 
@@ -135,9 +167,8 @@ class BaseModelMigration(DataMigration):
 
     def _data_from_objects(self, queryset, serializer):
         fields =  self.fields_to_export
-        if (queryset._result_cache is None
-                and not queryset._prefetch_related_lookups):
-            queryset = queryset.iterator()
+        if queryset._result_cache is None:
+            queryset = self._iterate_in_chunks(queryset)
 
         return (
             [
@@ -158,16 +189,80 @@ class BaseModelMigration(DataMigration):
             [
                 fld.export_value(val, serializer)
                 for val, fld
-                in zip(row, fields)
+                in zip(row[1:], fields)
             ]
             for row
-            in queryset.values_list(*[
+            in self._iterate_in_chunks(queryset, [
                 fld.path
                 for fld
                 in fields
-            ]).iterator()
+            ])
         )
 
+    def _iterate_in_chunks(self, queryset, paths=None):
+        """
+        Walks the queryset in chunks ordered by primary key, filtering each
+        one by the last key of the previous chunk instead of using offsets.
+
+        So memory usage is bounded by the chunk size, no transaction is
+        kept open during the whole export and prefetches are applied to
+        each chunk separately.
+
+        The keys of each chunk are fetched first and the rows are fetched
+        later. So, if ``paths`` are given, a key that spans many rows
+        because of multi-valued relations yields all of them, although
+        they exceed the chunk size. Rows are returned as ``values_list()``
+        tuples that start by the key.
+
+        The ``ordering`` option of the model is ignored, but sliced
+        querysets and querysets explicitly ordered by other fields are
+        iterated as they are.
+
+        """
+        if paths is not None:
+            rows = queryset.values_list('pk', *paths)
+        else:
+            rows = queryset
+
+        query = queryset.query
+        if query.extra_order_by:
+            ordering = query.extra_order_by
+        else:
+            ordering = query.order_by
+
+        pk = queryset.model._meta.pk
+        if (query.low_mark or query.high_mark is not None
+                or tuple(ordering) not in ((), ('pk', ), (pk.name, ),
+                                           (pk.attname, ))):
+            if paths is not None or not queryset._prefetch_related_lookups:
+                rows = rows.iterator()
+
+            for row in rows:
+                yield row
+
+            return
+
+        keys = queryset.order_by('pk').values_list('pk', flat=True).distinct()
+        rows = rows.order_by('pk')
+        last_pk = None
+        while True:
+            if last_pk is None:
+                chunk = keys
+            else:
+                chunk = keys.filter(pk__gt=last_pk)
+
+            chunk = list(chunk[:self.export_chunk_size])
+            if not chunk:
+                break
+
+            for row in rows.filter(pk__in=chunk):
+                yield row
+
+            if len(chunk) < self.export_chunk_size:
+                break
+
+            last_pk = chunk[-1]
+
     def get_importation_plan(self, plan_class=None):
         if plan_class is None:
             if self.can_create and self.can_update:
@@ -4,25 +4,59 @@ from __future__ import unicode_literals
 
 import collections
 import io
+from multiprocessing.pool import ThreadPool
 import os
 import re
 import shutil
 import tempfile
 import warnings
 
+from django.db import connections
 from django.utils import six
 
 from yepes.apps import apps
 from yepes.contrib.datamigrations import ModelMigration
+from yepes.contrib.datamigrations.archives import (
+    ArchiveReader,
+    ArchiveWriter,
+    split_member_name,
+)
 from yepes.contrib.datamigrations.importation_plans import importation_plans
 from yepes.contrib.datamigrations.serializers import serializers
-from yepes.contrib.datamigrations.utils import sort_dependencies
+from yepes.contrib.datamigrations.utils import (
+    group_dependencies,
+    sort_dependencies,
+)
 
 TITLE_RE = re.compile(r'^-- Name: ([.\w]+); Type: ([.\w]+); Serializer: ([.\w]+)')
 HEADER_LINES = ['\n', '--\n', TITLE_RE, '--\n', '\n']
 FILE_NAME_RE = re.compile(r'^(\w+)\.(\w+)\.(\w+)$')
 
 
+def run_jobs(function, arguments, jobs=None):
+    """
+    Calls the function with each of the given arguments. If ``jobs`` is
+    greater than one, calls are distributed between that number of threads,
+    so each worker uses its own database connections.
+    """
+    if not jobs or jobs <= 1 or len(arguments) <= 1:
+        return [function(arg) for arg in arguments]
+
+    def worker(arg):
+        try:
+            return function(arg)
+        finally:
+            for connection in connections.all():
+                connection.close()
+
+    pool = ThreadPool(min(jobs, len(arguments)))
+    try:
+        return pool.map(worker, arguments)
+    finally:
+        pool.close()
+        pool.join()
+
+
 class MultipleExportFacade(object):
 
     # PUBLIC METHODS
@@ -32,13 +66,15 @@ class MultipleExportFacade(object):
         if not os.path.exists(dir):
             os.makedirs(dir)
 
+        jobs = options.pop('jobs', None)
         migration_kwargs, export_kwargs = cls._clean_options(options)
 
         model_list = sort_dependencies(migration_kwargs.pop('models'))
         model_list.reverse()
 
         serializer = export_kwargs.pop('serializer')
-        for model in model_list:
+
+        def export_model(model):
             migration = ModelMigration(model, **migration_kwargs)
             migration_serializer = migration.get_serializer(serializer)
             file_name = '{0}.{1}.{2}'.format(
@@ -50,16 +86,40 @@ class MultipleExportFacade(object):
             with migration_serializer.open_to_dump(file_path) as file:
                 migration.export_data(file, migration_serializer, **export_kwargs)
 
+        # Exports are read-only, so every model can be exported at once.
+        run_jobs(export_model, model_list, jobs)
+
     @classmethod
     def to_compressed_file(cls, file, **options):
-        temp_dir = tempfile.mkdtemp(prefix='export_')
-        cls.to_directory(temp_dir, **options)
-        cls._compress_directory(temp_dir, file)
-        try:
-            shutil.rmtree(six.text_type(temp_dir))
-        except OSError:
-            msg = 'Failed to remove temp directory: {0}'
-            warnings.warn(msg.format(temp_dir), RuntimeWarning)
+        jobs = options.pop('jobs', None)
+        if jobs and jobs > 1:
+            msg = ('Archive members are written one after another, so jobs '
+                   'cannot be used with compressed files.')
+            warnings.warn(msg, RuntimeWarning)
+
+        compression = options.pop('compression', 'gz')
+        migration_kwargs, export_kwargs = cls._clean_options(options)
+
+        model_list = sort_dependencies(migration_kwargs.pop('models'))
+
+        serializer = export_kwargs.pop('serializer')
+
+        archive = ArchiveWriter(file, compression)
+        for model in model_list:
+            migration = ModelMigration(model, **migration_kwargs)
+            migration_serializer = migration.get_serializer(serializer)
+            member_name = '{0}.{1}.{2}'.format(
+                    model._meta.app_label,
+                    model._meta.model_name,
+                    migration_serializer.name)
+
+            # Binary formats are already compressed.
+            compress = not migration_serializer.is_binary
+            with archive.open_member(member_name, compress) as member:
+                with migration_serializer.wrap_to_dump(member) as member_file:
+                    migration.export_data(member_file, migration_serializer, **export_kwargs)
+
+        archive.close()
 
     @classmethod
     def to_compressed_file_path(cls, file_path, **options):
@@ -130,10 +190,6 @@ class MultipleExportFacade(object):
         }
         return migration_kwargs, export_kwargs
 
-    @classmethod
-    def _compress_directory(cls, input_dir, output_file):
-        raise NotImplementedError
-
     @classmethod
     def _join_directory(self, input_dir, output_file):
         input_files = os.listdir(input_dir)
@@ -166,46 +222,61 @@ class MultipleImportFacade(object):
         if not os.path.exists(dir):
             raise AttributeError("Directory '{0}' does not exit.".format(dir))
 
+        jobs = options.pop('jobs', None)
         migration_kwargs, import_kwargs = cls._clean_options(options)
         selected_models = migration_kwargs.pop('models')
         selected_serializer = import_kwargs.pop('serializer')
 
-        found_models = []
-        files_and_serializers = {}
-        for file_name in os.listdir(dir):
-            matchobj = FILE_NAME_RE.search(file_name)
-            if matchobj is None:
-                continue
-
-            app_config = apps.get_app_config(matchobj.group(1))
-            model = app_config.get_model(matchobj.group(2))
-            if selected_models and model not in selected_models:
-                continue
-
-            serializer = (selected_serializer
-                          or serializers.get_serializer(matchobj.group(3))())
-
-            found_models.append(model)
-            files_and_serializers[model] = (file_name, serializer)
+        files_and_serializers = cls._match_files(
+            os.listdir(dir),
+            selected_models,
+            selected_serializer,
+        )
 
-        model_list = sort_dependencies(found_models)
-        for model in model_list:
+        def import_model(model):
             migration = ModelMigration(model, **migration_kwargs)
             file_name, serializer = files_and_serializers[model]
             file_path = os.path.join(dir, file_name)
             with serializer.open_to_load(file_path) as file:
                 migration.import_data(file, serializer, **import_kwargs)
 
+        # Models of the same group do not depend on each other, so they
+        # can be imported at once.
+        for model_group in group_dependencies(list(files_and_serializers)):
+            run_jobs(import_model, model_group, jobs)
+
     @classmethod
     def from_compressed_file(cls, file, **options):
-        temp_dir = tempfile.mkdtemp(prefix='import_')
-        cls._uncompress_directory(file, temp_dir)
-        cls.from_directory(temp_dir, **options)
+        jobs = options.pop('jobs', None)
+        if jobs and jobs > 1:
+            msg = ('Archive members are read from the same file, so jobs '
+                   'cannot be used with compressed files.')
+            warnings.warn(msg, RuntimeWarning)
+
+        migration_kwargs, import_kwargs = cls._clean_options(options)
+        selected_models = migration_kwargs.pop('models')
+        selected_serializer = import_kwargs.pop('serializer')
+
+        archive = ArchiveReader(file)
+        members = {
+            split_member_name(info.name)[0]: info
+            for info
+            in archive.get_members()
+        }
+        members_and_serializers = cls._match_files(
+            members,
+            selected_models,
+            selected_serializer,
+        )
         try:
-            shutil.rmtree(six.text_type(temp_dir))
-        except OSError:
-            msg = 'Failed to remove temp directory: {0}'
-            warnings.warn(msg.format(temp_dir), RuntimeWarning)
+            for model in sort_dependencies(list(members_and_serializers)):
+                migration = ModelMigration(model, **migration_kwargs)
+                member_name, serializer = members_and_serializers[model]
+                member = archive.open_member(members[member_name])
+                with serializer.wrap_to_load(member) as member_file:
+                    migration.import_data(member_file, serializer, **import_kwargs)
+        finally:
+            archive.close()
 
     @classmethod
     def from_compressed_file_path(cls, file_path, **options):
@@ -236,6 +307,30 @@ class MultipleImportFacade(object):
 
     # PRIVATE METHODS
 
+    @classmethod
+    def _match_files(cls, file_names, selected_models, selected_serializer):
+        """
+        Returns a dictionary that maps the models of the given file names to
+        the file name and the serializer used to import it.
+        """
+        files_and_serializers = {}
+        for file_name in file_names:
+            matchobj = FILE_NAME_RE.search(file_name)
+            if matchobj is None:
+                continue
+
+            app_config = apps.get_app_config(matchobj.group(1))
+            model = app_config.get_model(matchobj.group(2))
+            if selected_models and model not in selected_models:
+                continue
+
+            serializer = (selected_serializer
+                          or serializers.get_serializer(matchobj.group(3))())
+
+            files_and_serializers[model] = (file_name, serializer)
+
+        return files_and_serializers
+
     @classmethod
     def _clean_options(cls, opts):
         selected_models = opts.pop('models', None)
@@ -262,6 +357,9 @@ class MultipleImportFacade(object):
         serializer = opts.pop('serializer', None)
         plan = opts.pop('plan', None)
         batch_size = opts.pop('batch_size', 100)
+        commit_every = opts.pop('commit_every', None)
+        checkpoint = opts.pop('checkpoint', None)
+        progress = opts.pop('progress', None)
 
         if isinstance(serializer, six.string_types):
             serializer = serializers.get_serializer(serializer)
@@ -276,6 +374,9 @@ class MultipleImportFacade(object):
             'serializer': serializer,
             'plan': plan,
             'batch_size': batch_size,
+            'commit_every': commit_every,
+            'checkpoint': checkpoint,
+            'progress': progress,
         }
         return migration_kwargs, import_kwargs
 
@@ -345,10 +446,6 @@ class MultipleImportFacade(object):
         if not header_found:
             raise ValueError('Invalid file format.')
 
-    @classmethod
-    def _uncompress_directory(cls, input_file, output_dir):
-        raise NotImplementedError
-
 
 class SingleExportFacade(object):
 
@@ -500,7 +597,7 @@ class SingleImportFacade(object):
     def from_file(cls, file, **options):
         migration_kwargs, import_kwargs = cls._clean_options(options)
         migration = ModelMigration(**migration_kwargs)
-        migration.import_data(file, **import_kwargs)
+        return migration.import_data(file, **import_kwargs)
 
     @classmethod
     def from_file_path(cls, file_path, **options):
@@ -530,7 +627,7 @@ class SingleImportFacade(object):
 
         serializer = import_kwargs['serializer']
         with serializer.open_to_load(file_path) as file:
-            cls.from_file(file, **options)
+            return cls.from_file(file, **options)
 
     # PRIVATE METHODS
 
@@ -554,6 +651,9 @@ class SingleImportFacade(object):
         serializer = opts.pop('serializer', None)
         plan = opts.pop('plan', None)
         batch_size = opts.pop('batch_size', 100)
+        commit_every = opts.pop('commit_every', None)
+        checkpoint = opts.pop('checkpoint', None)
+        progress = opts.pop('progress', None)
 
         if isinstance(serializer, six.string_types):
             serializer = serializers.get_serializer(serializer)
@@ -568,6 +668,9 @@ class SingleImportFacade(object):
             'serializer': serializer,
             'plan': plan,
             'batch_size': batch_size,
+            'commit_every': commit_every,
+            'checkpoint': checkpoint,
+            'progress': progress,
         }
         return migration_kwargs, import_kwargs
 
@@ -16,6 +16,8 @@ __all__ = (
 
 BUILTIN_PLANS = {
     'yepes.contrib.datamigrations.importation_plans.bulk_create.BulkCreatePlan',
+    'yepes.contrib.datamigrations.importation_plans.bulk_load.BulkLoadPlan',
+    'yepes.contrib.datamigrations.importation_plans.bulk_replace_all.BulkReplaceAllPlan',
     'yepes.contrib.datamigrations.importation_plans.create.CreatePlan',
     'yepes.contrib.datamigrations.importation_plans.direct.DirectPlan',
     'yepes.contrib.datamigrations.importation_plans.replace.ReplacePlan',
@@ -23,6 +25,7 @@ BUILTIN_PLANS = {
     'yepes.contrib.datamigrations.importation_plans.update.UpdatePlan',
     'yepes.contrib.datamigrations.importation_plans.update_or_bulk_create.UpdateOrBulkCreatePlan',
     'yepes.contrib.datamigrations.importation_plans.update_or_create.UpdateOrCreatePlan',
+    'yepes.contrib.datamigrations.importation_plans.upsert.UpsertPlan',
 }
 
 
@@ -3,10 +3,13 @@
 from __future__ import unicode_literals
 
 import collections
+import itertools
 import operator
+from timeit import default_timer
 
-from django.db import transaction
-from django.db.models import F, Q
+from django.db import connections, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import six
 from django.utils.six.moves import reduce
 from django.utils.text import camel_case_to_spaces, capfirst
 
@@ -15,7 +18,9 @@ from yepes.contrib.datamigrations.exceptions import (
     UnableToImportError,
     UnableToUpdateError,
 )
+from yepes.types import Undefined
 from yepes.utils.iterators import isplit
+from yepes.utils.structures import LRUDict
 from yepes.utils.properties import class_property
 
 
@@ -44,6 +49,10 @@ class ImportationPlan(object):
 
     def __init__(self, migration):
         self.migration = migration
+        self.counts = collections.Counter()
+        self.elapsed_time = None
+        self.offset = 0
+        self.processed = 0
 
     def check_conditions(self):
         if not self.migration.can_import:
@@ -56,6 +65,9 @@ class ImportationPlan(object):
     def finalize_importation(self):
         pass
 
+    def get_checkpoint_key(self):
+        return self.name
+
     def import_batch(self, batch):
         raise NotImplementedError('Subclasses of ImportationPlan must override import_batch() method')
 
@@ -65,14 +77,70 @@ class ImportationPlan(object):
     def prepare_importation(self):
         pass
 
-    def run(self, data, batch_size=100):
+    def run(self, data, batch_size=100, commit_every=None, checkpoint=None,
+            progress=None):
+        """
+        Imports the data in batches of ``batch_size`` rows.
+
+        By default, all data is imported in a single transaction. If
+        ``commit_every`` is given, a transaction is committed every that
+        number of batches and, if a ``Checkpoint`` is also given, the number
+        of committed rows is stored in it. Thus, an importation can be
+        resumed from the last commit.
+
+        ``progress`` is called with the plan after each transaction or each
+        batch.
+
+        """
         self.check_conditions()
-        with transaction.atomic():
-            self.prepare_importation()
-            for batch in isplit(data, batch_size):
-                self.import_batch(self.prepare_batch(batch))
+        start = default_timer()
+        if commit_every is None:
+            with transaction.atomic():
+                self.prepare_importation()
+                for batch in isplit(data, batch_size):
+                    self.processed += len(batch)
+                    self.import_batch(self.prepare_batch(batch))
+                    if progress is not None:
+                        self.elapsed_time = default_timer() - start
+                        progress(self)
+
+                self.finalize_importation()
+        else:
+            key = self.get_checkpoint_key()
+            if checkpoint is not None:
+                if checkpoint.is_finished(key):
+                    self.elapsed_time = 0
+                    return
+
+                self.offset = checkpoint.get_offset(key)
+
+            if not self.offset:
+                with transaction.atomic():
+                    self.prepare_importation()
+            else:
+                data = itertools.islice(data, self.offset, None)
 
-            self.finalize_importation()
+            batches = isplit(data, batch_size)
+            for step in isplit(batches, commit_every):
+                with transaction.atomic():
+                    for batch in step:
+                        self.processed += len(batch)
+                        self.import_batch(self.prepare_batch(batch))
+
+                if checkpoint is not None:
+                    checkpoint.set_offset(key, self.offset + self.processed)
+
+                if progress is not None:
+                    self.elapsed_time = default_timer() - start
+                    progress(self)
+
+            with transaction.atomic():
+                self.finalize_importation()
+
+            if checkpoint is not None:
+                checkpoint.set_offset(key, self.offset + self.processed, True)
+
+        self.elapsed_time = default_timer() - start
 
 
 class ModelImportationPlan(ImportationPlan):
@@ -82,6 +150,131 @@ class ModelImportationPlan(ImportationPlan):
     Subclasses must at least overwrite ``import_batch()``.
 
     """
+    natural_key_cache_size = 10000
+    natural_key_prefetch_limit = 1000
+
+    def __init__(self, migration):
+        super(ModelImportationPlan, self).__init__(migration)
+        self._natural_key_caches = {}
+
+    def get_checkpoint_key(self):
+        opts = self.migration.model._meta
+        return '{0}.{1}'.format(opts.app_label, opts.model_name)
+
+    def bulk_update(self, changes):
+        """
+        Saves the changes found by ``find_changes()`` with a few UPDATE
+        statements instead of saving the objects one by one.
+
+        Like ``save()``, this method calls the ``pre_save()`` method of each
+        field, so columns such as ``auto_now`` dates are also updated. Only
+        the modified columns are updated and each one is set with a CASE
+        expression that only contains the rows in which it changed. Note
+        that, like ``QuerySet.update()``, this method does not send
+        ``pre_save`` or ``post_save`` signals.
+
+        """
+        if not changes:
+            return
+
+        model = self.migration.model
+        manager = model._base_manager
+        connection = connections[manager.db]
+        fields = [
+            f
+            for f
+            in model._meta.concrete_fields
+            if not f.primary_key
+        ]
+        changes = [
+            (obj, self.get_modified_values(obj, fields, modified_attnames))
+            for obj, modified_attnames
+            in changes
+        ]
+        attnames = sorted({
+            attname
+            for obj, modified_values
+            in changes
+            for attname
+            in modified_values
+        })
+        # Each modified column needs two parameters per row and the
+        # primary keys are passed again in the WHERE clause.
+        batch_size = max(1, connection.ops.bulk_batch_size(
+            ['pk'] + attnames * 2,
+            changes,
+        ))
+        fields = {
+            f.attname: f
+            for f
+            in fields
+        }
+        for i in six.moves.range(0, len(changes), batch_size):
+            batch = changes[i:i + batch_size]
+            values = {}
+            for attname in attnames:
+                field = fields[attname]
+                whens = [
+                    When(pk=obj.pk, then=Value(
+                        modified_values[attname],
+                        output_field=field,
+                    ))
+                    for obj, modified_values
+                    in batch
+                    if attname in modified_values
+                ]
+                if whens:
+                    values[field.name] = Case(
+                        default=F(field.name),
+                        output_field=field,
+                        *whens
+                    )
+
+            manager.filter(pk__in=[obj.pk for obj, _ in batch]).update(**values)
+
+    def find_changes(self, batch, objs):
+        """
+        Compares the rows of the batch with the existing objects and sets
+        the new values to the objects.
+
+        Returns a list of ``(obj, modified_attnames)`` tuples with the
+        modified objects, and a list with the rows that do not match any
+        existing object. The unchanged rows are only counted.
+
+        """
+        key = self.migration.primary_key
+        if not isinstance(key, collections.Iterable):
+            key_attr = key.attname
+
+            def get_key(row):
+                return row[key_attr]
+        else:
+            key_attrs = [k.attname for k in key]
+
+            def get_key(row):
+                return tuple(row[attr] for attr in key_attrs)
+
+        changes = []
+        new_rows = []
+        for row in batch:
+            obj = objs.get(get_key(row))
+            if obj is None:
+                new_rows.append(row)
+                continue
+
+            modified_attnames = []
+            for k, v in six.iteritems(row):
+                if v != getattr(obj, k):
+                    setattr(obj, k, v)
+                    modified_attnames.append(k)
+
+            if modified_attnames:
+                changes.append((obj, modified_attnames))
+            else:
+                self.counts['unchanged'] += 1
+
+        return changes, new_rows
+
     def get_existing_keys(self, batch):
         key = self.migration.primary_key
         if not batch or key is None:
@@ -143,26 +336,88 @@ class ModelImportationPlan(ImportationPlan):
                 in batch
             )))
 
+    def get_modified_values(self, obj, fields, modified_attnames):
+        """
+        Calls the ``pre_save()`` method of the given fields, as ``save()``
+        does, and returns a dict that maps the attnames of the modified
+        fields to the values that must be saved.
+
+        Fields that alter the object when it is saved (``auto_now`` dates,
+        fields that fill other columns, etc.) are included, even if they are
+        not in ``modified_attnames``.
+
+        """
+        original_values = {
+            f.attname: getattr(obj, f.attname)
+            for f
+            in fields
+        }
+        saved_values = [
+            (f.attname, f.pre_save(obj, False))
+            for f
+            in fields
+        ]
+        modified_values = {}
+        for attname, value in saved_values:
+            original_value = original_values[attname]
+            current_value = getattr(obj, attname)
+            if current_value != value and current_value != original_value:
+                # The attribute was set by the ``pre_save()`` method of
+                # another field after calling its own method.
+                value = current_value
+
+            if attname in modified_attnames or value != original_value:
+                modified_values[attname] = value
+
+        return modified_values
+
+    def get_natural_key_cache(self, fld):
+        """
+        Returns the cache that maps the natural keys of the given field to
+        primary keys of the related model.
+
+        If the related table has no more than ``natural_key_prefetch_limit``
+        rows, it is loaded with a single query and the cache is marked as
+        complete, so no more queries are needed for this field.
+
+        """
+        try:
+            return self._natural_key_caches[fld]
+        except KeyError:
+            pass
+
+        m = self.migration
+        rel_field = m.model_fields[fld][-1]
+        rel_model = rel_field.model
+        rel_manager = rel_model._base_manager
+        cache = None
+        if (rel_model is not m.model
+                and self.natural_key_prefetch_limit):
+            qs = rel_manager.values_list(rel_field.name, 'pk')
+            rows = list(qs[:self.natural_key_prefetch_limit + 1])
+            if len(rows) <= self.natural_key_prefetch_limit:
+                cache = LRUDict()
+                cache.update(rows)
+                cache.complete = True
+
+        if cache is None:
+            cache = LRUDict(self.natural_key_cache_size)
+            cache.complete = False
+
+        self._natural_key_caches[fld] = cache
+        return cache
+
     def prepare_batch(self, batch):
         m = self.migration
         if m.natural_foreign_keys is not None:
             for fld in m.natural_foreign_keys:
                 attr = fld.attname
                 path = fld.path
-                rel_field = m.model_fields[fld][-1]
-                rel_manager = rel_field.model._base_manager
-                keys = dict(
-                    rel_manager.filter(**{
-                        '{0}__in'.format(rel_field.name): {
-                            row[path]
-                            for row
-                            in batch
-                        }
-                    }).values_list(
-                        rel_field.name,
-                        'pk',
-                    ).iterator()
-                )
+                keys = self.resolve_natural_keys(fld, {
+                    row[path]
+                    for row
+                    in batch
+                })
                 if not m.ignore_missing_foreign_keys:
                     for row in batch:
                         row[attr] = keys[row.pop(path)]
@@ -181,3 +436,47 @@ class ModelImportationPlan(ImportationPlan):
 
         return batch
 
+    def resolve_natural_keys(self, fld, values):
+        """
+        Returns a dictionary that maps the given natural keys to primary keys
+        of the related model. Keys that do not match any object are omitted.
+
+        Only the keys that are not cached are searched in the database, all
+        of them in one query.
+
+        """
+        m = self.migration
+        rel_field = m.model_fields[fld][-1]
+        rel_model = rel_field.model
+        cache = self.get_natural_key_cache(fld)
+        keys = {}
+        missing_values = []
+        for value in values:
+            pk = cache.get(value, Undefined)
+            if pk is Undefined:
+                if not cache.complete:
+                    missing_values.append(value)
+            elif pk is not None:
+                keys[value] = pk
+
+        if missing_values:
+            found_keys = dict(
+                rel_model._base_manager.filter(**{
+                    '{0}__in'.format(rel_field.name): missing_values
+                }).values_list(
+                    rel_field.name,
+                    'pk',
+                ).iterator()
+            )
+            for value in missing_values:
+                pk = found_keys.get(value)
+                if pk is not None:
+                    keys[value] = pk
+                    cache[value] = pk
+                elif rel_model is not m.model:
+                    # Objects of the imported model may be created by
+                    # previous batches, so only the misses of other
+                    # models are remembered.
+                    cache[value] = None
+
+        return keys
@@ -0,0 +1,273 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+import binascii
+import contextlib
+import datetime
+import itertools
+from timeit import default_timer
+
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import AutoField, FileField
+from django.utils.encoding import force_bytes, force_text
+from django.utils.six.moves import zip
+
+from yepes.contrib.datamigrations.importation_plans import ModelImportationPlan
+from yepes.utils.iterators import isplit
+
+
+class CopyBuffer(object):
+    """
+    File-like object that reads the rows from an iterator and returns them
+    in the text format of PostgreSQL's ``COPY FROM STDIN`` statement.
+    """
+    def __init__(self, rows, fields):
+        self.rows = iter(rows)
+        self.fields = fields
+        self.buffer = b''
+
+    def format_row(self, row):
+        return '\t'.join(
+            self.format_value(value, field)
+            for value, field
+            in zip(row, self.fields)
+        ) + '\n'
+
+    def format_value(self, value, field):
+        if value is None:
+            return '\\N'
+        elif field.get_internal_type() == 'BinaryField':
+            value = getattr(value, 'adapted', value)   # psycopg2's Binary adapter.
+            if isinstance(value, memoryview):
+                value = value.tobytes()
+            value = binascii.hexlify(bytes(value)).decode('ascii')
+            return '\\\\x' + value
+        elif isinstance(value, bool):
+            return 't' if value else 'f'
+        elif isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        elif hasattr(value, 'adapted') and hasattr(value, 'dumps'):
+            value = value.dumps(value.adapted)   # psycopg2's Json adapter.
+
+        return (force_text(value)
+                .replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r'))
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                row = next(self.rows)
+            except StopIteration:
+                break
+            else:
+                self.buffer += force_bytes(self.format_row(row))
+
+        if size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class BulkLoadPlan(ModelImportationPlan):
+    """
+    Inserts the rows without building model instances, unless some field
+    needs a value computed in Python, and sends them with the fastest
+    method of each backend: ``COPY FROM STDIN`` on PostgreSQL and
+    ``executemany()`` with a prepared ``INSERT`` on the others. On SQLite,
+    durability is relaxed while the data is loaded.
+
+    Like ``bulk_create()``, this plan does not call ``save()`` nor sends
+    ``pre_save`` or ``post_save`` signals.
+
+    """
+    updates_data = False
+
+    def count_rows(self, rows):
+        for row in rows:
+            self.counts['inserted'] += 1
+            yield row
+
+    def get_connection(self):
+        manager = self.migration.model._base_manager
+        return connections[manager.write_db]
+
+    def get_fields(self, row_attnames):
+        return [
+            f
+            for f
+            in self.migration.model._meta.concrete_fields
+            if not isinstance(f, AutoField) or f.attname in row_attnames
+        ]
+
+    def get_values(self, rows, fields, connection):
+        """
+        Returns an iterator that converts the rows into lists of values that
+        are ready to be sent to the database.
+        """
+        model = self.migration.model
+        if self.requires_model_instances(fields, rows[0]):
+            for row in rows:
+                obj = model(**row)
+                yield [
+                    f.get_db_prep_save(f.pre_save(obj, True), connection)
+                    for f
+                    in fields
+                ]
+        else:
+            defaults = {
+                f.attname: f.get_db_prep_save(f.get_default(), connection)
+                for f
+                in fields
+                if f.attname not in rows[0]
+            }
+            for row in rows:
+                yield [
+                    defaults[f.attname]
+                    if f.attname in defaults
+                    else f.get_db_prep_save(row[f.attname], connection)
+                    for f
+                    in fields
+                ]
+
+    def import_batch(self, batch):
+        if not batch:
+            return
+
+        connection = self.get_connection()
+        fields = self.get_fields(batch[0])
+        self.load_rows(self.get_values(batch, fields, connection),
+                       fields, connection)
+
+    def load_rows(self, rows, fields, connection):
+        qn = connection.ops.quote_name
+        table = qn(self.migration.model._meta.db_table)
+        columns = ', '.join(qn(f.column) for f in fields)
+        rows = self.count_rows(rows)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                sql = 'COPY {0} ({1}) FROM STDIN'.format(table, columns)
+                cursor.copy_expert(sql, CopyBuffer(rows, fields))
+            else:
+                sql = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+                    table,
+                    columns,
+                    ', '.join(['%s'] * len(fields)),
+                )
+                for batch in isplit(rows, 1000):
+                    cursor.executemany(sql, batch)
+
+        if (connection.vendor == 'postgresql'
+                and any(isinstance(f, AutoField) for f in fields)):
+            # Explicit primary keys do not advance the sequences.
+            sequence_sql = connection.ops.sequence_reset_sql(
+                no_style(),
+                [self.migration.model],
+            )
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+    def prepare_batch(self, batch):
+        batch = super(BulkLoadPlan, self).prepare_batch(batch)
+        pk_attname = self.migration.model._meta.pk.attname
+        for row in batch:
+            if 'pk' in row:
+                # Rows are not always turned into model instances, so the
+                # primary key needs its column name.
+                row[pk_attname] = row.pop('pk')
+
+        return batch
+
+    @contextlib.contextmanager
+    def relaxed_durability(self, connection):
+        if connection.vendor != 'sqlite' or connection.in_atomic_block:
+            # SQLite does not allow to change the safety level inside a
+            # transaction.
+            yield
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous = OFF')
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = {0:d}'.format(synchronous))
+
+    def report_progress(self, batches, start, progress=None):
+        """
+        Counts the rows of the batches while they are streamed to the
+        database and calls ``progress`` once each batch has been converted.
+        """
+        for batch in batches:
+            yield batch
+            self.processed += len(batch)
+            if progress is not None:
+                self.elapsed_time = default_timer() - start
+                progress(self)
+
+    def requires_model_instances(self, fields, row):
+        for f in fields:
+            if isinstance(f, FileField):
+                return True  # Files are committed on pre_save().
+            if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False):
+                return True
+            if f.attname not in row and f.has_default() and callable(f.default):
+                return True
+
+        return False
+
+    def run(self, data, batch_size=100, commit_every=None, checkpoint=None,
+            progress=None):
+        if commit_every is not None:
+            # Partial commits need the rows to be loaded batch by batch.
+            return super(BulkLoadPlan, self).run(
+                data,
+                batch_size,
+                commit_every=commit_every,
+                checkpoint=checkpoint,
+                progress=progress,
+            )
+
+        self.check_conditions()
+        connection = self.get_connection()
+        start = default_timer()
+        with self.relaxed_durability(connection):
+            with transaction.atomic(using=connection.alias):
+                self.prepare_importation()
+                batches = self.report_progress(
+                    (
+                        self.prepare_batch(batch)
+                        for batch
+                        in isplit(data, batch_size)
+                    ),
+                    start,
+                    progress,
+                )
+                # Rows of every batch are sent within the same statement,
+                # so they are converted batch by batch.
+                first_batch = None
+                for first_batch in batches:
+                    if first_batch:
+                        break
+
+                if first_batch:
+                    fields = self.get_fields(first_batch[0])
+                    rows = itertools.chain.from_iterable(
+                        self.get_values(batch, fields, connection)
+                        for batch
+                        in itertools.chain([first_batch], batches)
+                        if batch
+                    )
+                    self.load_rows(rows, fields, connection)
+
+                self.finalize_importation()
+
+        self.elapsed_time = default_timer() - start
@@ -0,0 +1,13 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+from yepes.contrib.datamigrations.importation_plans.bulk_load import BulkLoadPlan
+
+
+class BulkReplaceAllPlan(BulkLoadPlan):
+
+    def prepare_importation(self):
+        model = self.migration.model
+        manager = model._base_manager
+        manager.truncate()
@@ -0,0 +1,149 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+import collections
+
+from django.db import connections
+from django.db.models import AutoField
+from django.utils import six
+
+from yepes.contrib.datamigrations.exceptions import DataImportionError
+from yepes.contrib.datamigrations.importation_plans import ModelImportationPlan
+from yepes.models import statements
+
+
+class UpsertPlan(ModelImportationPlan):
+    """
+    Inserts or updates each batch with a single native statement:
+    ``INSERT ... ON CONFLICT DO UPDATE`` on PostgreSQL and SQLite, and
+    ``INSERT ... ON DUPLICATE KEY UPDATE`` on MySQL.
+
+    The migration key must be covered by a unique constraint. Columns set
+    by the ``pre_save()`` method of the fields are updated too. Like
+    ``bulk_create()``, this plan does not call ``save()`` nor sends
+    ``pre_save`` or ``post_save`` signals.
+
+    """
+    @classmethod
+    def is_supported(cls, connection):
+        if connection.vendor == 'postgresql':
+            return (connection.pg_version >= 90500)
+        elif connection.vendor == 'sqlite':
+            return (connection.Database.sqlite_version_info >= (3, 24, 0))
+        elif connection.vendor == 'mysql':
+            return True
+        else:
+            return False
+
+    def check_conditions(self):
+        super(UpsertPlan, self).check_conditions()
+        if not self.is_supported(self.get_connection()):
+            msg = 'Database backend does not support native upserts.'
+            raise DataImportionError(msg)
+
+    def get_connection(self):
+        manager = self.migration.model._base_manager
+        return connections[manager.write_db]
+
+    def import_batch(self, batch):
+        if not batch:
+            return
+
+        m = self.migration
+        model = m.model
+        opts = model._meta
+        connection = self.get_connection()
+        qn = connection.ops.quote_name
+
+        key = m.primary_key
+        if not isinstance(key, collections.Iterable):
+            key = (key, )
+
+        key_fields = [m.model_fields[fld][0] for fld in key]
+        row_attnames = set()
+        for row in batch:
+            row_attnames.update(row)
+
+        fields = [
+            f
+            for f
+            in opts.concrete_fields
+            if not isinstance(f, AutoField) or f.attname in row_attnames
+        ]
+        rows = []
+        saved_attnames = set()
+        for row in batch:
+            obj = model(**row)
+            original_values = [getattr(obj, f.attname) for f in fields]
+            saved_values = [f.pre_save(obj, True) for f in fields]
+            values = []
+            for f, original_value, value in zip(fields, original_values, saved_values):
+                current_value = getattr(obj, f.attname)
+                if current_value != value and current_value != original_value:
+                    # The attribute was set by the ``pre_save()`` method of
+                    # another field after calling its own method.
+                    value = current_value
+
+                if (value != original_value
+                        and not (getattr(f, 'auto_now_add', False)
+                                 and not getattr(f, 'auto_now', False))):
+                    saved_attnames.add(f.attname)
+
+                values.append(f.get_db_prep_save(value, connection))
+
+            rows.append(values)
+
+        # Columns set by ``pre_save()`` (``auto_now`` dates, slugs, columns
+        # filled by other fields, etc.) are also updated, but creation dates
+        # are kept.
+        update_fields = [
+            f
+            for f
+            in fields
+            if f not in key_fields
+            and (f.attname in row_attnames or f.attname in saved_attnames)
+        ]
+        if not update_fields:
+            # The statement needs at least one assignment, so the key is
+            # set to itself.
+            update_fields = key_fields[:1]
+
+        assignment = statements.get_sql('upsert_assignment', connection.vendor)
+        sql_template = statements.get_sql('upsert', connection.vendor).format(
+            table=qn(opts.db_table),
+            columns=', '.join(qn(f.column) for f in fields),
+            key=', '.join(qn(f.column) for f in key_fields),
+            assignments=', '.join(
+                assignment.format(column=qn(f.column))
+                for f
+                in update_fields
+            ),
+            values='{values}',
+        )
+        placeholders = '({0})'.format(', '.join(['%s'] * len(fields)))
+
+        batch_size = max(1, connection.ops.bulk_batch_size(fields, batch))
+        with connection.cursor() as cursor:
+            for i in six.moves.range(0, len(rows), batch_size):
+                chunk = rows[i:i + batch_size]
+                params = []
+                for values in chunk:
+                    params.extend(values)
+
+                sql = sql_template.format(
+                    values=', '.join([placeholders] * len(chunk)),
+                )
+                cursor.execute(sql, params)
+
+        self.counts['upserted'] += len(batch)
+
+    def prepare_batch(self, batch):
+        batch = super(UpsertPlan, self).prepare_batch(batch)
+        pk_attname = self.migration.model._meta.pk.attname
+        for row in batch:
+            if 'pk' in row:
+                # Columns of the statement are taken from the row keys.
+                row[pk_attname] = row.pop('pk')
+
+        return batch
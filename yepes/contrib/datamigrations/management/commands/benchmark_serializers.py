@@ -0,0 +1,181 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import division, unicode_literals
+
+import gc
+import json
+import os
+import random
+import shutil
+import tempfile
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import six
+
+from yepes.contrib.datamigrations.constants import FLOAT, INTEGER, TEXT
+from yepes.contrib.datamigrations.serializers import serializers
+
+HEADERS = ['id', 'code', 'name', 'price', 'stock']
+DATA_TYPES = [INTEGER, TEXT, TEXT, FLOAT, INTEGER]
+
+WORDS = (
+    'alfa', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf',
+    'hotel', 'india', 'juliett', 'kilo', 'lima', 'mike', 'november',
+    'oscar', 'papa', 'quebec', 'romeo', 'sierra', 'tango', 'uniform',
+    'victor', 'whiskey', 'x-ray', 'yankee', 'zulu',
+)
+
+
+class Command(BaseCommand):
+    help = ('Measures the time and the peak memory that serializers need to '
+            'dump and load a generated sheet. For xlsx, loading the workbook '
+            'in full mode is also measured to compare it with the read-only '
+            'mode used by the serializer.')
+
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format',
+            action='append',
+            default=None,
+            dest='formats',
+            help=('Serialization format to measure. Can be used several '
+                  'times. Defaults to csv and xlsx.'))
+        parser.add_argument('--rows',
+            action='store',
+            default=200000,
+            dest='rows',
+            type=int,
+            help='Number of rows of the generated sheet. Defaults to 200000.')
+        parser.add_argument('--seed',
+            action='store',
+            default=0,
+            dest='seed',
+            type=int,
+            help='Seed of the data generator.')
+        parser.add_argument('-o', '--output',
+            action='store',
+            default=None,
+            dest='output',
+            help='Specifies a file to write the results to, as JSON.')
+
+    def handle(self, **options):
+        formats = options['formats'] or ['csv', 'xlsx']
+        for name in formats:
+            if not serializers.has_serializer(name):
+                raise CommandError('Unknown serializer: {0}'.format(name))
+
+        rows = options['rows']
+        temp_dir = tempfile.mkdtemp(prefix='benchmark_')
+        results = []
+        try:
+            for name in formats:
+                serializer = serializers.get_serializer(name)()
+                file_path = os.path.join(temp_dir, 'data.' + name)
+                data = self.generate_rows(rows, options['seed'])
+                record = {
+                    'format': name,
+                    'rows': rows,
+                }
+                with serializer.open_to_dump(file_path) as file:
+                    record['dump_time'], record['dump_memory'] = self.measure(
+                        lambda: serializer.serialize(HEADERS, data, file, DATA_TYPES))
+
+                record['file_size'] = os.path.getsize(file_path)
+                with serializer.open_to_load(file_path) as file:
+                    record['load_time'], record['load_memory'] = self.measure(
+                        lambda: self.consume(serializer.deserialize(HEADERS, file)))
+
+                results.append(record)
+                self.write_record(record)
+
+                if name == 'xlsx':
+                    record = self.measure_full_xlsx(file_path, rows)
+                    results.append(record)
+                    self.write_record(record)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def consume(self, rows):
+        count = 0
+        for _ in rows:
+            count += 1
+        return count
+
+    def generate_rows(self, rows, seed):
+        rng = random.Random(seed)
+        for i in six.moves.range(rows):
+            yield [
+                i + 1,
+                'C{0:08d}'.format(rng.randint(0, 99999999)),
+                ' '.join(rng.choice(WORDS) for _ in six.moves.range(3)),
+                round(rng.uniform(0, 1000), 2),
+                rng.randint(0, 500),
+            ]
+
+    def measure(self, function):
+        gc.collect()
+        if tracemalloc is not None:
+            tracemalloc.start()
+
+        start = default_timer()
+        function()
+        elapsed = default_timer() - start
+
+        if tracemalloc is not None:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            peak = None
+
+        return elapsed, peak
+
+    def measure_full_xlsx(self, file_path, rows):
+        from openpyxl import load_workbook
+
+        def load():
+            workbook = load_workbook(file_path)
+            for row in workbook.active.iter_rows():
+                [cell.value for cell in row]
+
+        record = {
+            'format': 'xlsx (full mode)',
+            'rows': rows,
+            'dump_time': None,
+            'dump_memory': None,
+            'file_size': os.path.getsize(file_path),
+        }
+        record['load_time'], record['load_memory'] = self.measure(load)
+        return record
+
+    def write_record(self, record):
+        def memory(value):
+            return '{0:.1f}MiB'.format(value / 1048576) if value is not None else '-'
+
+        def seconds(value):
+            return '{0:.2f}s'.format(value) if value is not None else '-'
+
+        self.stdout.write(' '.join((
+            '{format:<18} {rows:>8}',
+            'size={size:<10}',
+            'dump={dump_time:<8} peak={dump_memory:<10}',
+            'load={load_time:<8} peak={load_memory}',
+        )).format(
+            format=record['format'],
+            rows=record['rows'],
+            size='{0:.1f}MiB'.format(record['file_size'] / 1048576),
+            dump_time=seconds(record['dump_time']),
+            dump_memory=memory(record['dump_memory']),
+            load_time=seconds(record['load_time']),
+            load_memory=memory(record['load_memory']),
+        ))
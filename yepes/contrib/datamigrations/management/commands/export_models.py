@@ -24,7 +24,9 @@ class Command(BaseCommand):
             action='store',
             default=None,
             dest='file',
-            help='Specifies a file to write the serialized data to.')
+            help=('Specifies a file to write the serialized data to. If its '
+                  'extension is .tar, models are written in a tar archive '
+                  'whose members are compressed one by one.'))
         parser.add_argument('-d', '--directory',
             action='store',
             default=None,
@@ -45,6 +47,19 @@ class Command(BaseCommand):
             default=None,
             dest='newline',
             help='Specifies how to end lines.')
+        parser.add_argument('--compression',
+            action='store',
+            default='gz',
+            dest='compression',
+            help=('Specifies how the members of tar archives are compressed: '
+                  'gz, bz2, xz, zst or none. Defaults to gz.'))
+        parser.add_argument('-j', '--jobs',
+            action='store',
+            default=1,
+            dest='jobs',
+            help=('Number of models that can be exported at the same time. '
+                  'Each job uses its own database connection.'),
+            type=int)
         parser.add_argument('--natural',
             action='store_true',
             default=False,
@@ -67,11 +82,20 @@ class Command(BaseCommand):
             'encoding': options['encoding'],
             'newline': options['newline'],
             'use_natural_keys': options['natural'],
+            'jobs': options['jobs'],
             'use_base_manager': options['base_manager'],
         }
         try:
 
-            if file_path:
+            if file_path and file_path.endswith('.tar'):
+                compression = options['compression']
+                if compression != 'none':
+                    kwargs['compression'] = compression
+                else:
+                    kwargs['compression'] = None
+
+                MultipleExportFacade.to_compressed_file_path(file_path, **kwargs)
+            elif file_path:
                 MultipleExportFacade.to_file_path(file_path, **kwargs)
             elif directory:
                 MultipleExportFacade.to_directory(directory, **kwargs)
@@ -1,9 +1,18 @@
 # -*- coding:utf-8 -*-
 
-from __future__ import unicode_literals
+from __future__ import division, unicode_literals
 
-from django.core.management.base import BaseCommand, CommandError
+import os
 
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import six
+
+from yepes.contrib.datamigrations.checkpoints import (
+    Checkpoint,
+    ProgressReport,
+    estimate_rows,
+)
+from yepes.contrib.datamigrations.exceptions import DataImportionError
 from yepes.contrib.datamigrations.facades import SingleImportFacade
 
 
@@ -45,6 +54,27 @@ class Command(BaseCommand):
             dest='batch',
             help='Maximum number of entries that can be imported at a time.',
             type=int)
+        parser.add_argument('--commit-every',
+            action='store',
+            default=None,
+            dest='commit_every',
+            help=('Commits the imported entries every that number of '
+                  'batches and saves the progress in a checkpoint file. '
+                  'By default, all entries are imported in a single '
+                  'transaction.'),
+            type=int)
+        parser.add_argument('--checkpoint',
+            action='store',
+            default=None,
+            dest='checkpoint',
+            help=('Specifies the checkpoint file. Defaults to the path of '
+                  'the input followed by ".checkpoint".'))
+        parser.add_argument('--resume',
+            action='store_true',
+            default=False,
+            dest='resume',
+            help=('Resume a previous importation from its checkpoint, '
+                  'skipping the entries that were already committed.'))
         parser.add_argument('--fields',
             action='store',
             default=None,
@@ -113,9 +143,32 @@ class Command(BaseCommand):
         if options['exclude'] is not None:
             kwargs['exclude'] = options['exclude'].split(',')
 
+        checkpoint = None
+        if options['commit_every'] is not None:
+            if options['commit_every'] < 1:
+                raise CommandError('--commit-every must be a positive number.')
+
+            checkpoint_path = options['checkpoint'] or file_path + '.checkpoint'
+            try:
+                checkpoint = Checkpoint(checkpoint_path, options['resume'],
+                                        source=file_path)
+            except DataImportionError as e:
+                raise CommandError(str(e))
+
+            kwargs['commit_every'] = options['commit_every']
+            kwargs['checkpoint'] = checkpoint
+        elif options['resume']:
+            raise CommandError('--resume must be used with --commit-every.')
+
+        if verbosity >= 2:
+            serializer_name = (options['format']
+                               or os.path.splitext(file_path)[1].lstrip('.'))
+            total = estimate_rows(file_path, serializer_name)
+            kwargs['progress'] = ProgressReport(self.stdout, total)
+
         try:
 
-            SingleImportFacade.from_file_path(file_path, **kwargs)
+            plan = SingleImportFacade.from_file_path(file_path, **kwargs)
 
         except Exception as e:
             if show_traceback:
@@ -123,6 +176,18 @@ class Command(BaseCommand):
             else:
                 raise CommandError(str(e))
 
+        if checkpoint is not None:
+            checkpoint.clear()
+
         if verbosity >= 1:
             self.stdout.write('Entries were successfully imported.')
+            for name in ('inserted', 'updated', 'upserted', 'unchanged'):
+                if name in plan.counts:
+                    msg = '{0} entries {1}.'
+                    self.stdout.write(msg.format(plan.counts[name], name))
+
+            if plan.elapsed_time:
+                total = sum(six.itervalues(plan.counts))
+                msg = 'Imported in {0:.2f} seconds ({1:.0f} entries per second).'
+                self.stdout.write(msg.format(plan.elapsed_time, total / plan.elapsed_time))
 
@@ -2,8 +2,15 @@
 
 from __future__ import unicode_literals
 
+import os
+
 from django.core.management.base import BaseCommand, CommandError
 
+from yepes.contrib.datamigrations.checkpoints import (
+    Checkpoint,
+    ProgressReport,
+)
+from yepes.contrib.datamigrations.exceptions import DataImportionError
 from yepes.contrib.datamigrations.facades import MultipleImportFacade
 
 
@@ -18,7 +25,9 @@ class Command(BaseCommand):
             action='store',
             default=None,
             dest='file',
-            help='Specifies a file from which the data will be readed.')
+            help=('Specifies a file from which the data will be readed. If '
+                  'its extension is .tar, models are read from the members '
+                  'of the archive without extracting them.'))
         parser.add_argument('-d', '--directory',
             action='store',
             default=None,
@@ -50,6 +59,34 @@ class Command(BaseCommand):
             dest='batch',
             help='Maximum number of entries that can be imported at a time.',
             type=int)
+        parser.add_argument('--commit-every',
+            action='store',
+            default=None,
+            dest='commit_every',
+            help=('Commits the imported entries every that number of '
+                  'batches and saves the progress in a checkpoint file. '
+                  'By default, all entries are imported in a single '
+                  'transaction.'),
+            type=int)
+        parser.add_argument('--checkpoint',
+            action='store',
+            default=None,
+            dest='checkpoint',
+            help=('Specifies the checkpoint file. Defaults to the path of '
+                  'the input followed by ".checkpoint".'))
+        parser.add_argument('--resume',
+            action='store_true',
+            default=False,
+            dest='resume',
+            help=('Resume a previous importation from its checkpoint, '
+                  'skipping the entries that were already committed.'))
+        parser.add_argument('-j', '--jobs',
+            action='store',
+            default=1,
+            dest='jobs',
+            help=('Number of models that can be imported at the same time. '
+                  'Each job uses its own database connection.'),
+            type=int)
         parser.add_argument('--natural',
             action='store_true',
             default=False,
@@ -81,11 +118,38 @@ class Command(BaseCommand):
             'plan': options['plan'],
             'batch_size': options['batch'],
             'use_natural_keys': options['natural'],
+            'jobs': options['jobs'],
             'ignore_missing_foreign_keys': options['ignore_missing'],
         }
+        checkpoint = None
+        if options['commit_every'] is not None:
+            if options['commit_every'] < 1:
+                raise CommandError('--commit-every must be a positive number.')
+
+            checkpoint_path = options['checkpoint']
+            if not checkpoint_path:
+                input_path = (file_path or directory).rstrip(os.sep)
+                checkpoint_path = input_path + '.checkpoint'
+
+            try:
+                checkpoint = Checkpoint(checkpoint_path, options['resume'],
+                                        source=file_path or directory)
+            except DataImportionError as e:
+                raise CommandError(str(e))
+
+            kwargs['commit_every'] = options['commit_every']
+            kwargs['checkpoint'] = checkpoint
+        elif options['resume']:
+            raise CommandError('--resume must be used with --commit-every.')
+
+        if verbosity >= 2:
+            kwargs['progress'] = ProgressReport(self.stdout)
+
         try:
 
-            if file_path:
+            if file_path and file_path.endswith('.tar'):
+                MultipleImportFacade.from_compressed_file_path(file_path, **kwargs)
+            elif file_path:
                 MultipleImportFacade.from_file_path(file_path, **kwargs)
             else:
                 MultipleImportFacade.from_directory(directory, **kwargs)
@@ -96,6 +160,9 @@ class Command(BaseCommand):
             else:
                 raise CommandError(str(e))
 
+        if checkpoint is not None:
+            checkpoint.clear()
+
         if verbosity >= 1:
             self.stdout.write('Entries were successfully imported.')
 
@@ -18,6 +18,8 @@ __all__ = (
 BUILTIN_SERIALIZERS = [
     'yepes.contrib.datamigrations.serializers.csv.CsvSerializer',
     'yepes.contrib.datamigrations.serializers.json.JsonSerializer',
+    'yepes.contrib.datamigrations.serializers.json.JsonlSerializer',
+    'yepes.contrib.datamigrations.serializers.parquet.ParquetSerializer',
     'yepes.contrib.datamigrations.serializers.tsv.TsvSerializer',
     'yepes.contrib.datamigrations.serializers.xls.XlsSerializer',
     'yepes.contrib.datamigrations.serializers.xlsx.XlsxSerializer',
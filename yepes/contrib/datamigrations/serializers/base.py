@@ -2,7 +2,7 @@
 
 from __future__ import unicode_literals
 
-from io import open, BytesIO, StringIO
+from io import open, BytesIO, StringIO, TextIOWrapper
 
 from django.utils import six
 from django.utils.text import camel_case_to_spaces, capfirst
@@ -31,6 +31,9 @@ class Serializer(object):
         BOOLEAN,
     ])
     is_binary = False
+    is_streamable = False
+    rows_per_chunk = 1000
+    uses_data_types = False
 
     @class_property
     def name(cls):
@@ -77,11 +80,22 @@ class Serializer(object):
     def dump(self, headers, data, file):
         raise NotImplementedError('Subclasses of Serializer must override dump() method')
 
-    def dumps(self, headers, data):
+    def dumps(self, headers, data, **kwargs):
         stream = BytesIO() if self.is_binary else StringIO()
-        self.dump(headers, data, stream)
+        self.dump(headers, data, stream, **kwargs)
         return stream.getvalue()
 
+    def iterdump(self, headers, data, **kwargs):
+        """
+        Yields the serialized data in chunks, so it can be sent while it is
+        being generated. By default, all data is serialized at once.
+        """
+        yield self.dumps(headers, data, **kwargs)
+
+    def iterserialize(self, headers, data, data_types=None):
+        kwargs = {'data_types': data_types} if self.uses_data_types else {}
+        return self.iterdump(headers, data, **kwargs)
+
     def load(self, headers, file):
         raise NotImplementedError('Subclasses of Serializer must override load() method')
 
@@ -101,11 +115,30 @@ class Serializer(object):
         else:
             return open(path, 'rt', encoding=self.encoding, errors=self.errors, newline=self.newline)
 
-    def serialize(self, headers, data, file=None):
+    def serialize(self, headers, data, file=None, data_types=None):
+        # Only serializers that write typed columns receive the data types.
+        kwargs = {'data_types': data_types} if self.uses_data_types else {}
         if file is None:
-            return self.dumps(headers, data)
+            return self.dumps(headers, data, **kwargs)
         else:
             self.check_file(file)
-            self.dump(headers, data, file)
+            self.dump(headers, data, file, **kwargs)
             return None
 
+    def wrap_to_dump(self, stream):
+        """
+        Returns a file-like object that writes in the given binary stream.
+        """
+        if self.is_binary:
+            return stream
+        else:
+            return TextIOWrapper(stream, encoding=self.encoding, errors=self.errors, newline=self.newline)
+
+    def wrap_to_load(self, stream):
+        """
+        Returns a file-like object that reads from the given binary stream.
+        """
+        if self.is_binary:
+            return stream
+        else:
+            return TextIOWrapper(stream, encoding=self.encoding, errors=self.errors, newline=self.newline)
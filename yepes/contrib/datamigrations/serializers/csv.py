@@ -2,6 +2,9 @@
 
 from __future__ import absolute_import, unicode_literals
 
+from io import BytesIO, StringIO
+import itertools
+
 from django.utils.six import PY2
 
 if PY2:
@@ -12,6 +15,7 @@ else:
 from yepes.contrib.datamigrations.serializers import Serializer
 from yepes.contrib.datamigrations.constants import FLOAT, INTEGER, TEXT
 from yepes.types import Undefined
+from yepes.utils.iterators import isplit
 
 
 class CsvSerializer(Serializer):
@@ -25,6 +29,7 @@ class CsvSerializer(Serializer):
         TEXT,
     ])
     is_binary = True if PY2 else False
+    is_streamable = True
 
     def __init__(self, **serializer_parameters):
         defaults = {
@@ -67,6 +72,17 @@ class CsvSerializer(Serializer):
         writer.writerow(headers)
         writer.writerows(data)
 
+    def iterdump(self, headers, data):
+        buffer = BytesIO() if self.is_binary else StringIO()
+        writer = csv.writer(buffer, **self.serializer_parameters)
+        writer.writerow(headers)
+        for rows in itertools.chain([[]], isplit(data, self.rows_per_chunk)):
+            # Headers are yielded before fetching the first rows.
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
     def load(self, headers, file):
         reader = csv.reader(file, **self.serializer_parameters)
         first_line = next(reader)
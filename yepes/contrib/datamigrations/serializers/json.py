@@ -2,16 +2,26 @@
 
 from __future__ import absolute_import, unicode_literals
 
+import codecs
 from json import JSONDecoder, JSONEncoder
+import re
 
 from django.utils.six import PY2
 from django.utils.six.moves import zip
 
 from yepes.contrib.datamigrations.serializers import Serializer
 from yepes.types import Undefined
+from yepes.utils.iterators import isplit
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
 
 class JsonSerializer(Serializer):
 
+    chunk_size = 65536
+    is_streamable = True
+    max_object_size = 16777216
+
     def __init__(self, **serializer_parameters):
         defaults = {
             'ensure_ascii': False,
@@ -37,6 +47,11 @@ class JsonSerializer(Serializer):
         super(JsonSerializer, self).__init__(**defaults)
 
     def dump(self, headers, data, file):
+        write = file.write
+        for chunk in self.iterdump(headers, data):
+            write(chunk)
+
+    def iterdump(self, headers, data):
         encoder = JSONEncoder(**self.serializer_parameters)
 
         # JSON pieces
@@ -52,10 +67,6 @@ class JsonSerializer(Serializer):
         row_end = '}'
         row_separator = item_separator if indent is None else item_separator.rstrip()
 
-        # Function shortcuts
-        write = file.write
-        serialize = encoder.encode
-
         # Binary decoding
         if PY2:
             headers = [
@@ -63,48 +74,129 @@ class JsonSerializer(Serializer):
                 for key
                 in headers
             ]
+
             def serialize(value):
                 string = encoder.encode(value)
                 if isinstance(string, bytes):
                     string = string.decode()
                 return string
+        else:
+            serialize = encoder.encode
 
         # Data writing
         encoder.indent = None
-        write(data_begin)
+        yield data_begin
+        buffer = []
+        write = buffer.append
         first_row = True
-        for row in data:
-            if not first_row:
-                write(row_separator)
+        for rows in isplit(data, self.rows_per_chunk):
+            for row in rows:
+                if not first_row:
+                    write(row_separator)
+
+                write(newline_indent)
+                write(row_begin)
+                first_item = True
+                for key, value in zip(headers, row):
+                    if not first_item:
+                        write(item_separator)
 
-            write(newline_indent)
-            write(row_begin)
-            first_item = True
-            for key, value in zip(headers, row):
-                if not first_item:
-                    write(item_separator)
+                    write(key_wrapper)
+                    write(key)
+                    write(key_wrapper)
+                    write(key_separator)
 
-                write(key_wrapper)
-                write(key)
-                write(key_wrapper)
-                write(key_separator)
+                    serialized_value = serialize(value)
 
-                serialized_value = serialize(value)
+                    write(serialized_value)
+                    first_item = False
 
-                write(serialized_value)
-                first_item = False
+                write(row_end)
+                first_row = False
 
-            write(row_end)
-            first_row = False
+            yield ''.join(buffer)
+            del buffer[:]
 
         if indent is not None:
             write(newline)
 
         write(data_end)
-        encoder.indent = indent
+        yield ''.join(buffer)
+
+    def get_decoder(self):
+        if PY2:
+            return JSONDecoder(self.serializer_parameters.get('encoding'))
+        else:
+            return JSONDecoder()
+
+    def iterdecode(self, file):
+        """
+        Incrementally parses the array of objects written by ``dump()`` and
+        yields the objects one by one.
+
+        The file is read in chunks of ``chunk_size`` characters, so memory
+        usage does not depend on the size of the file but on the size of the
+        objects. Objects larger than ``max_object_size`` characters are
+        considered malformed.
+        """
+        decode = self.get_decoder().raw_decode
+        chunk_size = self.chunk_size
+        max_object_size = self.max_object_size
+        skip_whitespace = WHITESPACE_RE.match
+        text_decoder = codecs.getincrementaldecoder(self.encoding or 'utf-8')()
+
+        def read():
+            chunk = file.read(chunk_size)
+            if isinstance(chunk, bytes):
+                # Multibyte characters may be split between two chunks.
+                return text_decoder.decode(chunk, final=not chunk), not chunk
+            else:
+                return chunk, not chunk
+
+        buffer = ''
+        pos = 0
+        eof = False
+        array_begun = False
+        while True:
+            pos = skip_whitespace(buffer, pos).end()
+            if pos == len(buffer):
+                if eof:
+                    break
+
+                chunk, eof = read()
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+
+            char = buffer[pos]
+            if not array_begun:
+                if char != '[':
+                    raise ValueError('Expecting JSON array.')
+
+                array_begun = True
+                pos += 1
+            elif char == ']':
+                return
+            elif char == ',':
+                pos += 1
+            else:
+                try:
+                    object, pos = decode(buffer, pos)
+                except ValueError:
+                    if eof or len(buffer) - pos > max_object_size:
+                        raise
+
+                    # The object is incomplete, so more data is needed.
+                    chunk, eof = read()
+                    buffer = buffer[pos:] + chunk
+                    pos = 0
+                else:
+                    yield object
+
+        if array_begun:
+            raise ValueError('Unterminated JSON array.')
 
     def load(self, headers, file):
-        json = JSONDecoder(self.serializer_parameters.get('encoding'))
         return (
             [
                 object.get(header, Undefined)
@@ -112,6 +204,65 @@ class JsonSerializer(Serializer):
                 in headers
             ]
             for object
-            in json.decode(file.read())
+            in self.iterdecode(file)
         )
 
+
+class JsonlSerializer(JsonSerializer):
+    """
+    Writes one JSON object per line (JSON Lines), without enclosing array.
+
+    Each line can be parsed independently, so loading does not need to
+    keep track of partial objects.
+    """
+    def __init__(self, **serializer_parameters):
+        serializer_parameters['indent'] = None
+        serializer_parameters.setdefault('separators', (', ', ': '))
+        super(JsonlSerializer, self).__init__(**serializer_parameters)
+
+    def iterdump(self, headers, data):
+        encoder = JSONEncoder(**self.serializer_parameters)
+        key_separator = encoder.key_separator
+        item_separator = encoder.item_separator
+
+        # Binary decoding
+        if PY2:
+            headers = [
+                key.decode() if isinstance(key, bytes) else key
+                for key
+                in headers
+            ]
+
+            def serialize(value):
+                string = encoder.encode(value)
+                if isinstance(string, bytes):
+                    string = string.decode()
+                return string
+        else:
+            serialize = encoder.encode
+
+        keys = [
+            serialize(key) + key_separator
+            for key
+            in headers
+        ]
+        for rows in isplit(data, self.rows_per_chunk):
+            yield ''.join(
+                '{' + item_separator.join(
+                    key + serialize(value)
+                    for key, value
+                    in zip(keys, row)
+                ) + '}\n'
+                for row
+                in rows
+            )
+
+    def iterdecode(self, file):
+        decode = self.get_decoder().decode
+        for line in file:
+            if isinstance(line, bytes):
+                line = line.decode(self.encoding or 'utf-8')
+
+            line = line.strip()
+            if line:
+                yield decode(line)
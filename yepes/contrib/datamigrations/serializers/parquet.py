@@ -0,0 +1,143 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from django.utils import six
+from django.utils.encoding import force_text
+
+from yepes.conf import settings
+from yepes.contrib.datamigrations.constants import (
+    BOOLEAN, FLOAT, INTEGER, TEXT,
+    DATE, DATETIME, TIME,
+)
+from yepes.contrib.datamigrations.serializers import Serializer
+from yepes.types import Undefined
+from yepes.utils.iterators import isplit
+
+
+class ParquetSerializer(Serializer):
+    """
+    Writes the data in Apache Parquet format, a columnar format where each
+    column is stored with its own type and compressed separately.
+
+    Rows are written in groups of ``row_group_size``, so neither export nor
+    import need to load the whole dataset in memory.
+
+    Requires ``pyarrow``, which is imported when the serializer is used.
+    Columns without data type are stored as text.
+
+    """
+    exportation_data_types = frozenset([
+        BOOLEAN,
+        FLOAT,
+        INTEGER,
+        TEXT,
+        DATE,
+        DATETIME,
+        TIME,
+    ])
+    importation_data_types = frozenset([
+        BOOLEAN,
+        FLOAT,
+        INTEGER,
+        TEXT,
+        DATE,
+        DATETIME,
+        TIME,
+    ])
+    is_binary = True
+    uses_data_types = True
+
+    def __init__(self, **serializer_parameters):
+        serializer_parameters.setdefault('compression', 'snappy')
+        serializer_parameters.setdefault('row_group_size', 10000)
+        super(ParquetSerializer, self).__init__(**serializer_parameters)
+
+    def dump(self, headers, data, file, data_types=None):
+        import pyarrow
+        from pyarrow import parquet
+
+        params = self.serializer_parameters
+        if data_types is None:
+            data_types = [TEXT] * len(headers)
+
+        schema = pyarrow.schema([
+            pyarrow.field(name, self.get_arrow_type(data_type))
+            for name, data_type
+            in six.moves.zip(headers, data_types)
+        ])
+        writer = parquet.ParquetWriter(
+            file,
+            schema,
+            compression=params['compression'],
+        )
+        try:
+            for rows in isplit(data, params['row_group_size']):
+                columns = list(six.moves.zip(*rows))
+                writer.write_table(pyarrow.Table.from_arrays(
+                    [
+                        pyarrow.array(
+                            [self.prepare_value(v, data_type) for v in column],
+                            type=field.type,
+                        )
+                        for column, field, data_type
+                        in six.moves.zip(columns, schema, data_types)
+                    ],
+                    schema=schema,
+                ))
+        finally:
+            writer.close()
+
+    def get_arrow_type(self, data_type):
+        import pyarrow
+
+        if data_type == BOOLEAN:
+            return pyarrow.bool_()
+        elif data_type == FLOAT:
+            return pyarrow.float64()
+        elif data_type == INTEGER:
+            return pyarrow.int64()
+        elif data_type == DATE:
+            return pyarrow.date32()
+        elif data_type == DATETIME:
+            if settings.USE_TZ:
+                return pyarrow.timestamp('us', tz='UTC')
+            else:
+                return pyarrow.timestamp('us')
+        elif data_type == TIME:
+            return pyarrow.time64('us')
+        else:
+            return pyarrow.string()
+
+    def load(self, headers, file):
+        from pyarrow import parquet
+
+        parquet_file = parquet.ParquetFile(file)
+        available_columns = parquet_file.schema.names
+        columns = [
+            header
+            for header
+            in headers
+            if header in available_columns
+        ]
+        for i in six.moves.range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(i, columns=columns)
+            values = {
+                name: table.column(name).to_pylist()
+                for name
+                in columns
+            }
+            for j in six.moves.range(table.num_rows):
+                yield [
+                    values[header][j] if header in values else Undefined
+                    for header
+                    in headers
+                ]
+
+    def prepare_value(self, value, data_type=TEXT):
+        if value is None or value == self.none_replacement:
+            return None
+        elif data_type == TEXT:
+            return force_text(value)
+        else:
+            return value
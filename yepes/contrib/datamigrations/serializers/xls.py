@@ -32,32 +32,32 @@ class XlsSerializer(Serializer):
         workbook.save(file)
 
     def load(self, headers, file):
-        workbook = open_workbook(file_contents=file.read())
-        worksheet = workbook.sheet_by_index(0)
-
-        columns = list(range(worksheet.ncols))
-        first_line = [
-            worksheet.cell_value(0, col)
-            for col
-            in columns
-        ]
-        if first_line != headers:
-            del columns[:]
-            for header in headers:
-                try:
-                    col = first_line.index(header)
-                except ValueError:
-                    col = None
-
-                columns.append(col)
-
-        return (
-            [
-                Undefined if col is None else worksheet.cell_value(row, col)
-                for col
-                in columns
-            ]
-            for row
-            in range(1, worksheet.nrows)
-        )
-
+        workbook = open_workbook(file_contents=file.read(), on_demand=True)
+        try:
+            worksheet = workbook.sheet_by_index(0)
+            if not worksheet.nrows:
+                return
+
+            first_line = worksheet.row_values(0)
+            if first_line == headers:
+                for row in range(1, worksheet.nrows):
+                    yield worksheet.row_values(row)
+            else:
+                columns = []
+                for header in headers:
+                    try:
+                        col = first_line.index(header)
+                    except ValueError:
+                        col = None
+
+                    columns.append(col)
+
+                for row in range(1, worksheet.nrows):
+                    values = worksheet.row_values(row)
+                    yield [
+                        Undefined if col is None else values[col]
+                        for col
+                        in columns
+                    ]
+        finally:
+            workbook.release_resources()
@@ -26,34 +26,45 @@ class XlsxSerializer(Serializer):
         workbook.save(file)
 
     def load(self, headers, file):
-        workbook = load_workbook(file)
-        worksheet = workbook.active
-        data = worksheet.iter_rows()
-
-        first_line = [
-            cell.value
-            for cell
-            in next(data)
-        ]
-        if first_line == headers:
-            return ([cell.value for cell in row] for row in data)
-
-        positions = []
-        for header in headers:
-            try:
-                pos = first_line.index(header)
-            except ValueError:
-                pos = None
-
-            positions.append(pos)
-
-        return (
-            [
-                Undefined if pos is None else row[pos].value
-                for pos
-                in positions
+        workbook = load_workbook(file, read_only=True)
+        try:
+            worksheet = workbook.active
+            data = worksheet.iter_rows()
+            first_row = next(data, None)
+            if first_row is None:
+                return
+
+            first_line = [
+                cell.value
+                for cell
+                in first_row
             ]
-            for row
-            in data
-        )
+            if first_line == headers:
+                positions = list(range(len(headers)))
+            else:
+                positions = []
+                for header in headers:
+                    try:
+                        pos = first_line.index(header)
+                    except ValueError:
+                        pos = None
+
+                    positions.append(pos)
+
+            for row in data:
+                yield [
+                    Undefined if pos is None else self.get_value(row, pos)
+                    for pos
+                    in positions
+                ]
+        finally:
+            # Read-only workbooks keep the file open until they are closed.
+            workbook.close()
 
+    def get_value(self, row, pos):
+        # Read-only worksheets do not return the empty cells at the end of
+        # the row.
+        try:
+            return row[pos].value
+        except IndexError:
+            return None
@@ -47,11 +47,12 @@ class ModelFieldsCache(object):
         return model_fields
 
 
-def sort_dependencies(model_list):
+def group_dependencies(model_list):
     """
-    Sorts a list of models to ensure that any model with a ForeignKey
-    pointing to another model in the list is serialized after its
-    dependency.
+    Splits a list of models in groups to ensure that any model with a
+    ForeignKey pointing to another model in the list is placed in a later
+    group than its dependency. Models of the same group do not depend on
+    each other.
     """
     # Remove all duplicates from the list of models.
     model_set = set()
@@ -75,23 +76,31 @@ def sort_dependencies(model_list):
                 else:
                     model_dependencies[model].append(field.related_model)
 
-    # Add the models without dependencies to the final list.
-    sorted_list = []
-    for model in model_list:
-        if model not in model_dependencies:
-            sorted_list.append(model)
+    # The models without dependencies form the first group.
+    groups = []
+    sorted_models = set()
+    first_group = [
+        model
+        for model
+        in model_list
+        if model not in model_dependencies
+    ]
+    if first_group:
+        groups.append(first_group)
+        sorted_models.update(first_group)
 
-    # Now iterate repeatedly over the dependency list to add the models
-    # whose dependencies were already added to the final list.
+    # Now iterate repeatedly over the dependency list to build a new group
+    # with the models whose dependencies were already added to previous
+    # groups.
     # This process continues until the dependency list is empty, or we
     # do a full iteration over the model dependencies without promoting
-    # a model to the final list.
+    # a model to a group.
     # If we do a full iteration without a promotion, that means there
     # are circular dependencies in the list.
     while model_dependencies:
         clean_models = []
         for model, dependencies in six.iteritems(model_dependencies):
-            if all(d in sorted_list for d in dependencies):
+            if all(d in sorted_models for d in dependencies):
                 clean_models.append(model)
 
         if not clean_models:
@@ -105,8 +114,22 @@ def sort_dependencies(model_list):
         for model in clean_models:
             del model_dependencies[model]
 
-        sorted_list.extend(clean_models)
-        del clean_models[:]
+        groups.append(clean_models)
+        sorted_models.update(clean_models)
+
+    return groups
 
-    return sorted_list
 
+def sort_dependencies(model_list):
+    """
+    Sorts a list of models to ensure that any model with a ForeignKey
+    pointing to another model in the list is serialized after its
+    dependency.
+    """
+    return [
+        model
+        for group
+        in group_dependencies(model_list)
+        for model
+        in group
+    ]
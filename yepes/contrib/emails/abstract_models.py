@@ -82,6 +82,27 @@ class AbstractConnection(Logged):
         if self._connection is not None:
             self._connection.close()
 
+    def get_backend(self):
+        """
+        Returns a new instance of the SMTP email backend, which uses the
+        authentication credentials set in the record to connect the SMTP
+        server. Unlike ``smtp_connection``, the instance is not shared, so
+        each thread can keep its own connection open.
+        """
+        if self.is_logged:
+            backend = 'yepes.contrib.emails.backends.LoggedSmtpBackend'
+        else:
+            backend = 'yepes.contrib.emails.backends.SmtpBackend'
+
+        return mail.get_connection(
+            backend, **{
+            'host': self.host,
+            'port': self.port,
+            'username': self.username,
+            'password': self.password,
+            'use_tls': self.is_secure,
+        })
+
     def open(self):
         """
         Ensures we have a connection to the email server. Returns whether or
@@ -105,19 +126,7 @@ class AbstractConnection(Logged):
         authentication credentials set in the record to connect the SMTP server.
         """
         if self._connection is None:
-            if self.is_logged:
-                backend = 'yepes.contrib.emails.backends.LoggedSmtpBackend'
-            else:
-                backend = 'yepes.contrib.emails.backends.SmtpBackend'
-
-            self._connection = mail.get_connection(
-                backend, **{
-                'host': self.host,
-                'port': self.port,
-                'username': self.username,
-                'password': self.password,
-                'use_tls': self.is_secure,
-            })
+            self._connection = self.get_backend()
         return self._connection
 
     # GRAPPELLI SETTINGS
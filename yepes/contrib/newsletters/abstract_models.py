@@ -28,6 +28,7 @@ from yepes.utils.html import extract_text
 from yepes.utils.properties import described_property
 from yepes.validators.email import DOMAIN_RE
 
+DeliveryManager = apps.get_class('newsletters.managers', 'DeliveryManager')
 NewsletterManager = apps.get_class('newsletters.managers', 'NewsletterManager')
 
 Delivery = LazyModel('newsletters', 'Delivery')
@@ -186,6 +187,22 @@ class AbstractDelivery(models.Model):
             editable=False,
             null=True,
             verbose_name=_('Effective Date'))
+    attempts = fields.SmallIntegerField(
+            default=0,
+            editable=False,
+            min_value=0,
+            verbose_name=_('Failed Attempts'))
+    lease_owner = fields.CharField(
+            blank=True,
+            editable=False,
+            max_length=32,
+            verbose_name=_('Lease Owner'))
+    lease_expiration = models.DateTimeField(
+            blank=True,
+            db_index=True,
+            editable=False,
+            null=True,
+            verbose_name=_('Lease Expiration'))
     is_bounced = fields.BooleanField(
             db_index=True,
             default=False,
@@ -217,6 +234,8 @@ class AbstractDelivery(models.Model):
             null=True,
             verbose_name=_('Click Date'))
 
+    objects = DeliveryManager()
+
     class Meta:
         abstract = True
         ordering = ['-date']
@@ -2,7 +2,7 @@
 
 from __future__ import unicode_literals
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.utils.translation import ugettext_lazy as _
 
 from yepes.apps import OverridableConfig
@@ -15,9 +15,12 @@ class NewslettersConfig(OverridableConfig):
 
     def ready(self):
         super(NewslettersConfig, self).ready()
+        image_changed = self.get_class('receivers', 'image_changed')
         message_bounced = self.get_class('receivers', 'message_bounced')
         message_clicked = self.get_class('receivers', 'message_clicked')
         message_opened = self.get_class('receivers', 'message_opened')
+        post_delete.connect(image_changed, self.get_model('MessageImage'))
+        post_save.connect(image_changed, self.get_model('MessageImage'))
         post_save.connect(message_bounced, self.get_model('Bounce'))
         post_save.connect(message_clicked, self.get_model('Click'))
         post_save.connect(message_opened, self.get_model('Open'))
@@ -0,0 +1,432 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import division, unicode_literals
+
+from collections import deque, namedtuple, OrderedDict
+from datetime import timedelta
+import threading
+from timeit import default_timer
+
+from django.core.mail import EmailMultiAlternatives
+from django.db import connections
+from django.db.models import F
+from django.utils import six
+from django.utils import timezone
+from django.utils.six.moves import queue
+
+from yepes.apps import apps
+from yepes.conf import settings
+from yepes.utils.minifier import minify_html
+
+Delivery = apps.get_model('newsletters', 'Delivery')
+
+prerender_many = apps.get_class('newsletters.utils', 'prerender_many')
+render = apps.get_class('newsletters.utils', 'render')
+split_template = apps.get_class('newsletters.utils', 'split_template')
+
+PrerenderedMessage = namedtuple(
+    'PrerenderedMessage',
+    ['subject', 'text', 'html'],
+)
+
+STOP = object()
+
+
+class DomainStats(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.sent = 0
+        self.failed = 0
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def throughput(self):
+        """
+        Returns the number of deliveries sent per second.
+        """
+        if not self.sent or self.end_time == self.start_time:
+            return 0
+        else:
+            return self.sent / (self.end_time - self.start_time)
+
+
+class DomainScheduler(object):
+    """
+    Hands out the deliveries alternating their domains, so the domains with
+    many subscribers do not delay the others.
+
+    A delivery is handed out only if its domain has less than
+    ``concurrency`` deliveries in progress and the ``rate`` of the domain
+    (deliveries per second) allows it. Both limits can be given for each
+    domain name in ``limits``. While a domain is throttled, deliveries of
+    other domains are still handed out.
+
+    Times are read from ``clock``, a function that returns seconds.
+
+    """
+    def __init__(self, deliveries, concurrency=None, rate=None, limits=None,
+                       clock=default_timer):
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.in_progress = {}
+        self.next_times = {}
+        self.pending = OrderedDict()
+        self.stats = OrderedDict()
+        self.limits = {}
+        limits = limits or {}
+        for delivery in deliveries:
+            domain_id = delivery.domain_id
+            if domain_id not in self.pending:
+                name = delivery.domain.name
+                domain_limits = limits.get(name, {})
+                self.limits[domain_id] = (
+                    domain_limits.get('concurrency', concurrency),
+                    domain_limits.get('rate', rate),
+                )
+                self.in_progress[domain_id] = 0
+                self.next_times[domain_id] = 0
+                self.pending[domain_id] = deque()
+                self.stats[domain_id] = DomainStats(name)
+
+            self.pending[domain_id].append(delivery)
+
+    def acquire(self):
+        """
+        Waits until a delivery can be sent and returns it. Returns None when
+        all deliveries have been handed out.
+        """
+        with self.condition:
+            while self.pending:
+                delivery, timeout = self.next_delivery()
+                if delivery is not None:
+                    return delivery
+
+                self.condition.wait(timeout)
+
+            return None
+
+    def next_delivery(self):
+        """
+        Returns the next delivery that can be sent without waiting, or None
+        and the seconds to wait until a throttled domain can send again
+        (None if the domains are waiting for deliveries to be released).
+        Must be called while holding ``condition``.
+        """
+        now = self.clock()
+        timeout = None
+        for domain_id in list(self.pending):
+            concurrency, rate = self.limits[domain_id]
+            if concurrency and self.in_progress[domain_id] >= concurrency:
+                continue
+
+            next_time = self.next_times[domain_id]
+            if next_time > now:
+                if timeout is None or next_time - now < timeout:
+                    timeout = next_time - now
+                continue
+
+            deliveries = self.pending.pop(domain_id)
+            delivery = deliveries.popleft()
+            if deliveries:
+                # The domain goes to the end of the line.
+                self.pending[domain_id] = deliveries
+
+            self.in_progress[domain_id] += 1
+            if rate:
+                self.next_times[domain_id] = max(next_time, now) + 1 / rate
+
+            stats = self.stats[domain_id]
+            if stats.start_time is None:
+                stats.start_time = now
+
+            return delivery, None
+
+        return None, timeout
+
+    def release(self, delivery, sent):
+        """
+        Frees the place of the delivery in its domain.
+        """
+        with self.condition:
+            self.in_progress[delivery.domain_id] -= 1
+            stats = self.stats[delivery.domain_id]
+            if sent:
+                stats.sent += 1
+            else:
+                stats.failed += 1
+            stats.end_time = self.clock()
+            self.condition.notify_all()
+
+
+class Dispatcher(object):
+    """
+    Sends deliveries through a pipeline of two stages that run concurrently:
+    a pool of threads that render the emails and, for each e-mail connection,
+    a pool of threads that keep their own SMTP connection open while they
+    send the rendered emails.
+
+    Deliveries are rendered in the order given by ``DomainScheduler``, which
+    enforces the limits of each domain, so the sending threads never wait
+    for a throttled domain. Stages are joined by queues of ``queue_size``
+    items, so only a few emails are held in memory at once.
+
+    Each delivery is marked as processed as soon as it is sent. Deliveries
+    that fail are retried later, waiting twice as long after each attempt.
+
+    Rendering threads run Python code and, thus, they share a single core.
+    They pay off because rendering overlaps with the network traffic of the
+    SMTP connections.
+
+    """
+    def __init__(self, render_workers=None, connections_per_server=None,
+                       queue_size=None, domain_concurrency=None,
+                       domain_rate=None, domain_limits=None,
+                       retry_delay=None):
+        if render_workers is None:
+            render_workers = settings.NEWSLETTERS_RENDER_WORKERS
+        if connections_per_server is None:
+            connections_per_server = settings.NEWSLETTERS_CONNECTIONS_PER_SERVER
+        if queue_size is None:
+            queue_size = settings.NEWSLETTERS_DISPATCH_QUEUE_SIZE
+        if domain_concurrency is None:
+            domain_concurrency = settings.NEWSLETTERS_DOMAIN_CONCURRENCY
+        if domain_rate is None:
+            domain_rate = settings.NEWSLETTERS_DOMAIN_RATE
+        if domain_limits is None:
+            domain_limits = settings.NEWSLETTERS_DOMAIN_LIMITS
+        if retry_delay is None:
+            retry_delay = settings.NEWSLETTERS_RETRY_DELAY
+
+        self.render_workers = max(render_workers, 1)
+        self.connections_per_server = max(connections_per_server, 1)
+        self.queue_size = queue_size
+        self.retry_delay = retry_delay
+        self.domain_concurrency = domain_concurrency
+        self.domain_limits = domain_limits
+        self.domain_rate = domain_rate
+        self.domain_stats = []
+        self.errors = []
+        self.lock = threading.Lock()
+        self.prerendered_messages = {}
+        self.sent_deliveries = []
+
+    def build_email(self, delivery):
+        message = self.prerendered_messages[delivery.message_id]
+        context = {
+            'subscriber': delivery.subscriber,
+            'newsletter': delivery.newsletter,
+            'message': delivery.message,
+        }
+        name = delivery.subscriber.full_name
+        address = delivery.subscriber.email_address
+        if name:
+            recipient = '"{0}" <{1}>'.format(name, address)
+        else:
+            recipient = address
+
+        email = EmailMultiAlternatives(
+            message.subject,
+            render(message.text, context),
+            delivery.newsletter.sender,
+            [recipient],
+        )
+        email.attach_alternative(
+            render(message.html, context),
+            'text/html',
+        )
+        if delivery.newsletter.reply_to_address:
+            email.extra_headers['Reply-To'] = delivery.newsletter.reply_to
+
+        if delivery.newsletter.return_path_address:
+            email.extra_headers['Return-Path'] = delivery.newsletter.return_path
+
+        email.extra_headers['Precedence'] = 'bulk'
+        return email
+
+    def dispatch(self, deliveries):
+        """
+        Sends the given deliveries and returns the number of sent deliveries.
+        Deliveries that could not be rendered or sent are stored in
+        ``errors`` with the raised exception, and the throughput of each
+        domain is stored in ``domain_stats``.
+        """
+        self.domain_stats = []
+        self.errors = []
+        self.prerendered_messages = {}
+        self.sent_deliveries = []
+        deliveries = list(deliveries)
+        if not deliveries:
+            return 0
+
+        # Prerendering writes in the database, so it is done before
+        # starting the threads.
+        self.prerender_messages(deliveries)
+
+        self.scheduler = DomainScheduler(
+            deliveries,
+            concurrency=self.domain_concurrency,
+            rate=self.domain_rate,
+            limits=self.domain_limits,
+        )
+        send_queues = {}
+        threads = []
+        for delivery in deliveries:
+            connection = delivery.newsletter.connection
+            if connection.pk not in send_queues:
+                send_queues[connection.pk] = queue.Queue(self.queue_size)
+                for _ in six.moves.range(self.connections_per_server):
+                    threads.append(self.start_thread(
+                        self.send_emails,
+                        connection,
+                        send_queues[connection.pk],
+                    ))
+
+        render_threads = [
+            self.start_thread(self.render_emails, send_queues)
+            for _
+            in six.moves.range(self.render_workers)
+        ]
+        for thread in render_threads:
+            thread.join()
+
+        for send_queue in six.itervalues(send_queues):
+            for _ in six.moves.range(self.connections_per_server):
+                send_queue.put(STOP)
+        for thread in threads:
+            thread.join()
+
+        self.domain_stats = list(six.itervalues(self.scheduler.stats))
+        return len(self.sent_deliveries)
+
+    def prerender_messages(self, deliveries):
+        """
+        Prerenders the messages of the given deliveries at once, so their
+        images and links are resolved with a single query.
+        """
+        messages = OrderedDict()
+        for delivery in deliveries:
+            if delivery.message_id not in self.prerendered_messages:
+                messages[delivery.message_id] = delivery
+
+        sources = []
+        for delivery in six.itervalues(messages):
+            context = {
+                'subscriber': None,  # Subscriber must not be specified here.
+                'newsletter': delivery.newsletter,
+                'message': delivery.message,
+            }
+            sources.append((delivery.message.text, context))
+            sources.append((minify_html(delivery.message.html), context))
+
+        prerendered = prerender_many(sources)
+        for i, (message_id, delivery) in enumerate(six.iteritems(messages)):
+            # Prerendered sources are compiled once and the parts that do
+            # not depend on the subscriber are rendered once, so only the
+            # personalized nodes are rendered for each subscriber.
+            _, context = sources[i * 2]
+            self.prerendered_messages[message_id] = PrerenderedMessage(
+                delivery.message.subject,
+                split_template(prerendered[i * 2], context),
+                split_template(prerendered[i * 2 + 1], context),
+            )
+
+    def render_emails(self, send_queues):
+        while True:
+            delivery = self.scheduler.acquire()
+            if delivery is None:
+                break
+            try:
+                email = self.build_email(delivery)
+            except Exception as e:
+                self.delivery_failed(delivery, e)
+            else:
+                connection_id = delivery.newsletter.connection_id
+                send_queues[connection_id].put((delivery, email))
+
+    def delivery_failed(self, delivery, exception):
+        """
+        Releases the delivery so it can be retried once the delay of its
+        attempt has passed.
+        """
+        with self.lock:
+            self.errors.append((delivery, exception))
+
+        self.scheduler.release(delivery, False)
+        delay = self.retry_delay * 2 ** delivery.attempts
+        try:
+            Delivery.objects.filter(pk=delivery.pk).update(
+                attempts=F('attempts') + 1,
+                lease_owner='',
+                lease_expiration=timezone.now() + timedelta(seconds=delay),
+            )
+        except Exception:
+            # The thread must keep consuming its queue. The delivery will
+            # be retried anyway when its lease expires.
+            pass
+
+    def delivery_sent(self, delivery):
+        with self.lock:
+            self.sent_deliveries.append(delivery)
+
+        self.scheduler.release(delivery, True)
+        try:
+            Delivery.objects.filter(pk=delivery.pk).update(
+                is_processed=True,
+                process_date=timezone.now(),
+                lease_owner='',
+                lease_expiration=None,
+            )
+        except Exception as e:
+            # The email has been sent, but the delivery will be sent again
+            # when its lease expires.
+            with self.lock:
+                self.errors.append((delivery, e))
+
+    def send_email(self, backend, delivery, email):
+        try:
+            # The connection is opened by the first email and kept open
+            # until the queue is exhausted.
+            backend.open()
+            return backend.send_messages([email])
+        except Exception:
+            backend.close()
+            raise
+
+    def send_emails(self, connection, send_queue):
+        backend = connection.get_backend()
+        try:
+            while True:
+                item = send_queue.get()
+                if item is STOP:
+                    break
+
+                delivery, email = item
+                try:
+                    sent = self.send_email(backend, delivery, email)
+                except Exception as e:
+                    self.delivery_failed(delivery, e)
+                else:
+                    if sent:
+                        self.delivery_sent(delivery)
+                    else:
+                        # Backends that fail silently return zero instead
+                        # of raising an exception.
+                        msg = 'The email backend did not send the message.'
+                        self.delivery_failed(delivery, IOError(msg))
+        finally:
+            backend.close()
+
+    def start_thread(self, target, *args):
+        def run():
+            try:
+                target(*args)
+            finally:
+                for connection in connections.all():
+                    connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
@@ -2,66 +2,185 @@
 
 from __future__ import unicode_literals
 
+from django.utils import six
+
 from yepes.contrib.datamigrations.importation_plans import ModelImportationPlan
 from yepes.loading import LazyModel
 from yepes.utils.emails import normalize_email, validate_email
 
 Domain = LazyModel('newsletters', 'Domain')
 Newsletter = LazyModel('newsletters', 'Newsletter')
+Subscription = LazyModel('newsletters', 'Subscription')
 SubscriberTag = LazyModel('newsletters', 'SubscriberTag')
 
 
-class SubscriberPlan(ModelImportationPlan):
-
-    updates_data = False
+def split_names(names):
+    if not names:
+        return []
+    elif ',' in names:
+        names = names.split(',')
+    elif '|' in names:
+        names = names.split('|')
+    else:
+        names = [names]
 
-    def import_batch(self, batch):
-        model = self.migration.model
-        key = self.migration.primary_key.attname
-        existing_keys = self.get_existing_keys(batch)
-        for row in batch:
-            if row[key] in existing_keys:
-                continue
+    unique_names = []
+    for name in names:
+        name = name.strip()
+        if name and name not in unique_names:
+            unique_names.append(name)
 
-            address = normalize_email(row['email_address'])
-            if not validate_email(address):
-                msg = "'{0}' is not a valid email address."
-                raise ValueError(msg.format(address))
+    return unique_names
 
-            _, domain_name = address.rsplit('@', 1)
-            domain, _ = Domain.cache.get_or_create(name=domain_name)
 
-            row['email_address'] = address
-            row['email_domain'] = domain
-
-            newsletter_names = row.pop('newsletters', False)
-            tag_names = row.pop('tags', False)
+class SubscriberPlan(ModelImportationPlan):
+    """
+    Imports the subscribers of each batch with a few queries, whatever the
+    number of rows is.
 
-            obj = model(**row)
-            obj.save(force_insert=True)
+    Addresses are normalized and validated before touching the database,
+    missing domains and tags are created at once, and subscribers,
+    subscriptions and tags are inserted with ``bulk_create()``. Existing
+    addresses are skipped.
 
-            if newsletter_names:
-                if ',' in newsletter_names:
-                    newsletter_names = newsletter_names.split(',')
-                elif '|' in newsletter_names:
-                    newsletter_names = newsletter_names.split('|')
-                else:
-                    newsletter_names = [newsletter_names]
+    Invalid rows do not abort the importation, they are stored in
+    ``errors`` as ``(row_number, address, message)`` tuples.
 
-                for name in newsletter_names:
-                    newsletter = Newsletter.cache.get(name=name)
-                    if newsletter is not None:
-                        obj.subscriptions.create(newsletter=newsletter)
+    """
+    updates_data = False
 
-            if tag_names:
-                if ',' in tag_names:
-                    tag_names = tag_names.split(',')
-                elif '|' in tag_names:
-                    tag_names = tag_names.split('|')
-                else:
-                    tag_names = [tag_names]
+    def __init__(self, migration):
+        super(SubscriberPlan, self).__init__(migration)
+        self.errors = []
+
+    def create_missing(self, model, names):
+        """
+        Returns a dictionary that maps the given names to primary keys of
+        the model. Names that do not match any object are created.
+        """
+        manager = model._base_manager
+        keys = dict(manager.filter(
+            name__in=names,
+        ).values_list('name', 'pk').iterator())
+
+        missing_names = [
+            name
+            for name
+            in names
+            if name not in keys
+        ]
+        if missing_names:
+            manager.bulk_create(
+                model(name=name)
+                for name
+                in missing_names
+            )
+            # ``bulk_create()`` does not set the primary keys in all
+            # databases, and signals are not sent, so the lookup table
+            # must be cleared by hand.
+            keys.update(manager.filter(
+                name__in=missing_names,
+            ).values_list('name', 'pk').iterator())
+            model.cache.clear()
+
+        return keys
 
-                for name in tag_names:
-                    tag, _ = SubscriberTag.cache.get_or_create(name=name)
-                    obj.tags.add(tag)
+    def import_batch(self, batch):
+        model = self.migration.model
+        manager = model._base_manager
+        first_row_number = self.offset + self.processed - len(batch) + 1
 
+        rows = {}
+        for i, row in enumerate(batch):
+            address = normalize_email(row['email_address'] or '')
+            if not validate_email(address):
+                msg = "'{0}' is not a valid email address."
+                self.errors.append((
+                    first_row_number + i,
+                    address,
+                    msg.format(address),
+                ))
+                self.counts['invalid'] += 1
+            elif address in rows:
+                self.counts['skipped'] += 1
+            else:
+                row['email_address'] = address
+                rows[address] = row
+
+        if rows:
+            existing_addresses = set(manager.filter(
+                email_address__in=list(rows),
+            ).values_list('email_address', flat=True).iterator())
+            for address in existing_addresses:
+                del rows[address]
+                self.counts['skipped'] += 1
+
+        if not rows:
+            return
+
+        domains = self.create_missing(Domain, {
+            address.rsplit('@', 1)[1]
+            for address
+            in rows
+        })
+
+        newsletter_names = {}
+        tag_names = {}
+        for address, row in six.iteritems(rows):
+            newsletter_names[address] = split_names(row.pop('newsletters', None))
+            tag_names[address] = split_names(row.pop('tags', None))
+
+        # Guids are generated here because the field default checks the
+        # uniqueness of each one with a query.
+        guid_field = model._meta.get_field('guid')
+        subscribers = []
+        for address, row in six.iteritems(rows):
+            row['email_domain_id'] = domains[address.rsplit('@', 1)[1]]
+            row['guid'] = guid_field.generate_guid()
+            subscribers.append(model(**row))
+
+        manager.bulk_create(subscribers)
+        self.counts['inserted'] += len(subscribers)
+
+        subscriber_ids = dict(manager.filter(
+            email_address__in=list(rows),
+        ).values_list('email_address', 'pk').iterator())
+
+        newsletters = {}
+        subscriptions = []
+        for address, names in six.iteritems(newsletter_names):
+            for name in names:
+                if name not in newsletters:
+                    newsletters[name] = Newsletter.cache.get(name=name)
+                if newsletters[name] is not None:
+                    subscriptions.append(Subscription(
+                        newsletter_id=newsletters[name].pk,
+                        subscriber_id=subscriber_ids[address],
+                        domain_id=rows[address]['email_domain_id'],
+                    ))
+
+        if subscriptions:
+            Subscription._base_manager.bulk_create(subscriptions)
+
+        tags = self.create_missing(SubscriberTag, {
+            name
+            for names
+            in six.itervalues(tag_names)
+            for name
+            in names
+        })
+        if tags:
+            tags_field = model._meta.get_field('tags')
+            through = tags_field.remote_field.through
+            source_attname = tags_field.m2m_column_name()
+            target_attname = tags_field.m2m_reverse_name()
+            through._base_manager.bulk_create(
+                through(**{
+                    source_attname: subscriber_ids[address],
+                    target_attname: tags[name],
+                })
+                for address, names
+                in six.iteritems(tag_names)
+                for name
+                in names
+            )
@@ -0,0 +1,108 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import division, unicode_literals
+
+import itertools
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yepes.apps import apps
+from yepes.utils.minifier import minify_html
+
+Message = apps.get_model('newsletters', 'Message')
+Subscriber = apps.get_model('newsletters', 'Subscriber')
+
+compile_template = apps.get_class('newsletters.utils', 'compile_template')
+get_template = apps.get_class('newsletters.utils', 'get_template')
+prerender = apps.get_class('newsletters.utils', 'prerender')
+render = apps.get_class('newsletters.utils', 'render')
+split_template = apps.get_class('newsletters.utils', 'split_template')
+
+
+class Command(BaseCommand):
+    help = ('Measures how many deliveries per second can be rendered when '
+            'the prerendered message is compiled for every subscriber, when '
+            'it is compiled only once and when the parts that do not depend '
+            'on the subscriber are also rendered only once.')
+
+    requires_system_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('-m', '--message',
+            action='store',
+            default=None,
+            dest='message',
+            help='Primary key of the message to render. Defaults to the last one.',
+            type=int)
+        parser.add_argument('-d', '--deliveries',
+            action='store',
+            default=1000,
+            dest='deliveries',
+            help='Number of deliveries to render. Defaults to 1000.',
+            type=int)
+
+    def handle(self, **options):
+        messages = Message.objects.select_related('newsletter')
+        if options['message'] is not None:
+            message = messages.filter(pk=options['message']).first()
+        else:
+            message = messages.order_by('-pk').first()
+        if message is None:
+            raise CommandError('No message was found.')
+
+        subscribers = list(Subscriber.objects.all()[:options['deliveries']])
+        if not subscribers:
+            raise CommandError('No subscriber was found.')
+
+        context = {
+            'subscriber': None,
+            'newsletter': message.newsletter,
+            'message': message,
+        }
+        text = prerender(message.text, context)
+        html = prerender(minify_html(message.html), context)
+        deliveries = list(itertools.islice(
+            itertools.cycle(subscribers),
+            options['deliveries'],
+        ))
+
+        def uncached(context):
+            render(compile_template(text), context)
+            render(compile_template(html), context)
+
+        compiled_text = get_template(text)
+        compiled_html = get_template(html)
+        def cached(context):
+            render(compiled_text, context)
+            render(compiled_html, context)
+
+        split_text = split_template(text, context)
+        split_html = split_template(html, context)
+        def split(context):
+            render(split_text, context)
+            render(split_html, context)
+
+        functions = (
+            ('uncached', uncached),
+            ('cached', cached),
+            ('split', split),
+        )
+        for name, function in functions:
+            elapsed = self.measure(function, deliveries, message)
+            self.stdout.write('{0:<10} {1:>8} deliveries in {2:.2f}s ({3:.0f} deliveries per second)'.format(
+                name,
+                len(deliveries),
+                elapsed,
+                len(deliveries) / elapsed if elapsed else 0,
+            ))
+
+    def measure(self, function, deliveries, message):
+        start = default_timer()
+        for subscriber in deliveries:
+            function({
+                'subscriber': subscriber,
+                'newsletter': message.newsletter,
+                'message': message,
+            })
+        return default_timer() - start
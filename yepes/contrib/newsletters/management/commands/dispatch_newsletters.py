@@ -2,25 +2,21 @@
 
 from __future__ import unicode_literals
 
-from collections import namedtuple
+from datetime import timedelta
+import signal
+import threading
+import time
+import uuid
 
-from django.core.mail import EmailMultiAlternatives
 from django.core.management.base import BaseCommand
-from django.utils import six
-from django.utils import timezone
 
 from yepes.apps import apps
-from yepes.utils.minifier import minify_html
+from yepes.conf import settings
 
 Delivery = apps.get_model('newsletters', 'Delivery')
 
-prerender = apps.get_class('newsletters.utils', 'prerender')
-render = apps.get_class('newsletters.utils', 'render')
+Dispatcher = apps.get_class('newsletters.dispatchers', 'Dispatcher')
 
-PrerenderedMessage = namedtuple(
-    'PrerenderedMessage',
-    ['subject', 'text', 'html'],
-)
 
 class Command(BaseCommand):
     help = 'Processes pending deliveries.'
@@ -34,87 +30,135 @@ class Command(BaseCommand):
             dest='messages',
             help='Maximum number of messages that can be dispatched.',
             type=int)
+        parser.add_argument('--render-workers',
+            action='store',
+            default=None,
+            dest='render_workers',
+            help='Number of threads that render the messages.',
+            type=int)
+        parser.add_argument('--connections',
+            action='store',
+            default=None,
+            dest='connections_per_server',
+            help='Number of SMTP connections opened to each server.',
+            type=int)
+        parser.add_argument('--queue-size',
+            action='store',
+            default=None,
+            dest='queue_size',
+            help='Maximum number of messages waiting between stages.',
+            type=int)
+        parser.add_argument('--domain-concurrency',
+            action='store',
+            default=None,
+            dest='domain_concurrency',
+            help='Maximum number of messages sent at once to the same domain.',
+            type=int)
+        parser.add_argument('--domain-rate',
+            action='store',
+            default=None,
+            dest='domain_rate',
+            help='Maximum number of messages sent per second to the same domain.',
+            type=float)
+        parser.add_argument('--queue',
+            action='store_true',
+            default=False,
+            dest='queue',
+            help=('Keeps running and dispatches the deliveries as they become '
+                  'pending. Several workers can be run at once.'))
+        parser.add_argument('--poll-interval',
+            action='store',
+            default=5.0,
+            dest='poll_interval',
+            help='Seconds to wait when there are no pending deliveries.',
+            type=float)
 
     def handle(self, **options):
-        pending_deliveries = Delivery.objects.filter(
-            is_processed=False,
-            date__lte=timezone.now(),
+        self.dispatcher = Dispatcher(
+            render_workers=options['render_workers'],
+            connections_per_server=options['connections_per_server'],
+            queue_size=options['queue_size'],
+            domain_concurrency=options['domain_concurrency'],
+            domain_rate=options['domain_rate'],
+        )
+        self.verbosity = options['verbosity']
+        # Deliveries are leased, so workers that run at the same time do not
+        # send them twice and those left by a crashed worker are sent again
+        # when the lease expires.
+        self.owner = uuid.uuid4().hex
+        if not options['queue']:
+            if not self.dispatch_batch(options['messages']):
+                self.stdout.write('No pending deliveries.')
+            return
+
+        self.stopped = False
+        def stop(signum, frame):
+            self.stopped = True
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            while not self.stopped:
+                if not self.dispatch_batch(options['messages']):
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def dispatch_batch(self, limit):
+        lease_time = timedelta(seconds=settings.NEWSLETTERS_LEASE_TIME)
+        deliveries = Delivery.objects.claim(
+            self.owner,
+            limit,
+            lease_time,
+            max_attempts=settings.NEWSLETTERS_MAX_ATTEMPTS,
         ).prefetch_related(
+            'domain',
             'message',
             'newsletter',
             'subscriber',
-        )[:options['messages']]
-
-        if pending_deliveries:
-
-            self.prerendered_messages = {}
-
-            newsletters = {}
-            for delivery in pending_deliveries:
-
-                message = self.get_prerendered_message(delivery)
-                context = {
-                    'subscriber': delivery.subscriber,
-                    'newsletter': delivery.newsletter,
-                    'message': delivery.message,
-                }
-                name = delivery.subscriber.full_name
-                address = delivery.subscriber.email_address
-                if name:
-                    recipient = '"{0}" <{1}>'.format(name, address)
-                else:
-                    recipient = address
-
-                email = EmailMultiAlternatives(
-                    message.subject,
-                    render(message.text, context),
-                    delivery.newsletter.sender,
-                    [recipient],
-                )
-                email.attach_alternative(
-                    render(message.html, context),
-                    'text/html',
-                )
-                if delivery.newsletter.reply_to_address:
-                    email.extra_headers['Reply-To'] = delivery.newsletter.reply_to
-
-                if delivery.newsletter.return_path_address:
-                    email.extra_headers['Return-Path'] = delivery.newsletter.return_path
-
-                email.extra_headers['Precedence'] = 'bulk'
-
-                if delivery.newsletter not in newsletters:
-                    newsletters[delivery.newsletter] = [email]
-                else:
-                    newsletters[delivery.newsletter].append(email)
-
-            for newsletter, emails in six.iteritems(newsletters):
-                newsletter.connection.send_messages(emails)
-
-            Delivery.objects.filter(
-                pk__in=pending_deliveries,
-            ).update(
-                is_processed=True,
-                process_date=timezone.now(),
-            )
+        )
+        if not deliveries:
+            return 0
+
+        # Leases are renewed while the batch is sent, however long it takes.
+        batch = [delivery.pk for delivery in deliveries]
+        finished = threading.Event()
+        thread = self.dispatcher.start_thread(
+            self.renew_leases,
+            batch,
+            lease_time,
+            finished,
+        )
+        try:
+            self.dispatcher.dispatch(deliveries)
+        finally:
+            finished.set()
+            thread.join()
+
+        for delivery, exception in self.dispatcher.errors:
+            self.stderr.write('Delivery {0} failed: {1}'.format(
+                delivery.pk,
+                exception,
+            ))
+
+        if not self.dispatcher.errors:
             self.stdout.write('Deliveries were successfully processed.')
         else:
-            self.stdout.write('No pending deliveries.')
-
-    def get_prerendered_message(self, delivery):
-        msg = self.prerendered_messages.get(delivery.message.pk)
-        if msg is None:
-            context = {
-                'subscriber': None, # Subscriber must not be specified here.
-                'newsletter': delivery.newsletter,
-                'message': delivery.message,
-            }
-            msg = PrerenderedMessage(
-                delivery.message.subject,
-                prerender(delivery.message.text, context),
-                prerender(minify_html(delivery.message.html), context),
-            )
-            self.prerendered_messages[delivery.message.pk] = msg
-
-        return msg
-
+            self.stdout.write('{0} deliveries were processed, {1} failed.'.format(
+                len(self.dispatcher.sent_deliveries),
+                len(self.dispatcher.errors),
+            ))
+
+        if self.verbosity >= 2:
+            for stats in self.dispatcher.domain_stats:
+                self.stdout.write('{0}: {1} sent, {2} failed ({3:.1f} messages per second).'.format(
+                    stats.name,
+                    stats.sent,
+                    stats.failed,
+                    stats.throughput,
+                ))
+
+        return len(deliveries)
+
+    def renew_leases(self, pks, lease_time, finished):
+        interval = lease_time.total_seconds() / 2
+        while not finished.wait(interval):
+            Delivery.objects.filter(pk__in=pks).renew(self.owner, lease_time)
@@ -30,7 +30,7 @@ class Command(BaseCommand):
             help='Specifies the serialization format of the input.')
         parser.add_argument('--batch',
             action='store',
-            default=100,
+            default=500,
             dest='batch',
             help='Maximum number of entries that can be imported at a time.',
             type=int)
@@ -57,7 +57,7 @@ class Command(BaseCommand):
             migration = SubscriberImportation()
             serializer = migration.get_serializer(serializer_name)
             with serializer.open_to_load(file_path) as file:
-                migration.import_data(file, serializer, None, options['batch'])
+                plan = migration.import_data(file, serializer, None, options['batch'])
 
         except Exception as e:
             if show_traceback:
@@ -65,6 +65,13 @@ class Command(BaseCommand):
             else:
                 raise CommandError(str(e))
 
+        for row_number, address, message in plan.errors:
+            self.stderr.write('Row {0}: {1}'.format(row_number, message))
+
         if verbosity >= 1:
             self.stdout.write('Subscribers were successfully imported.')
+            for name in ('inserted', 'skipped', 'invalid'):
+                if name in plan.counts:
+                    msg = '{0} subscribers {1}.'
+                    self.stdout.write(msg.format(plan.counts[name], name))
 
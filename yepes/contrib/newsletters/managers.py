@@ -2,8 +2,202 @@
 
 from __future__ import unicode_literals
 
-from django.db.models import Manager
+from django.db import connections, transaction
+from django.db.models import AutoField, Manager, Q
 from django.db.models.query import QuerySet
+from django.db.models.sql import EmptyResultSet
+from django.utils import timezone
+
+
+class DeliveryQuerySet(QuerySet):
+
+    def claim(self, owner, limit, lease_time, max_attempts=None):
+        """
+        Leases up to ``limit`` pending deliveries to ``owner`` for the given
+        time (a ``timedelta``). Deliveries leased to other owners are skipped
+        until their lease expires, so several workers can process the same
+        queue without sending anything twice.
+
+        Returns a queryset with the leased deliveries.
+        """
+        now = timezone.now()
+        pending = self.pending(now).filter(
+            Q(lease_expiration__isnull=True)
+            | Q(lease_expiration__lte=now),
+        )
+        if max_attempts is not None:
+            pending = pending.filter(attempts__lt=max_attempts)
+
+        candidates = pending.order_by('date', 'pk')
+        def lease(pks):
+            return pending.filter(pk__in=pks).update(
+                lease_owner=owner,
+                lease_expiration=now + lease_time,
+            )
+
+        connection = connections[self.db]
+        if getattr(connection.features, 'has_select_for_update_skip_locked', False):
+            with transaction.atomic(using=self.db):
+                candidates = candidates.select_for_update(skip_locked=True)
+                pks = list(candidates.values_list('pk', flat=True)[:limit])
+                if pks:
+                    lease(pks)
+        else:
+            # Without row locks, another worker may select the same rows.
+            # The update checks the conditions again and is atomic, so the
+            # owner tells which rows were won.
+            pks = list(candidates.values_list('pk', flat=True)[:limit])
+            if pks:
+                lease(pks)
+
+        if not pks:
+            return self.none()
+
+        return self.filter(
+            pk__in=pks,
+            lease_owner=owner,
+            lease_expiration__gt=now,
+        )
+
+    def pending(self, date=None):
+        """
+        Returns deliveries that are not processed and whose date has come.
+        """
+        if date is None:
+            date = timezone.now()
+        return self.filter(is_processed=False, date__lte=date)
+
+    def renew(self, owner, lease_time):
+        """
+        Extends the leases of ``owner`` that have not been processed nor
+        released yet, so they do not expire while they are being sent.
+
+        Returns the number of renewed leases.
+        """
+        return self.filter(
+            is_processed=False,
+            lease_owner=owner,
+        ).update(
+            lease_expiration=timezone.now() + lease_time,
+        )
+
+
+class DeliveryManager(Manager):
+
+    def get_queryset(self):
+        return DeliveryQuerySet(self.model, using=self._db)
+
+    def claim(self, *args, **kwargs):
+        """
+        Leases pending deliveries to a worker and returns them.
+        """
+        return self.get_queryset().claim(*args, **kwargs)
+
+    def pending(self, *args, **kwargs):
+        """
+        Returns deliveries that are not processed and whose date has come.
+        """
+        return self.get_queryset().pending(*args, **kwargs)
+
+    def renew(self, *args, **kwargs):
+        """
+        Extends the leases of a worker.
+        """
+        return self.get_queryset().renew(*args, **kwargs)
+
+    def schedule(self, message, subscribers, date, batch_size=None,
+                 progress=None):
+        """
+        Creates a delivery of the message for each of the given subscribers
+        with ``INSERT ... SELECT`` statements, so subscribers are not loaded
+        in Python. If ``batch_size`` is given, subscribers are inserted in
+        batches of consecutive primary keys and ``progress`` is called with
+        the number of created deliveries after each batch.
+
+        Returns the number of created deliveries.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        subscriber_opts = subscribers.model._meta
+        subscriber_pk = subscriber_opts.pk.column
+        subscriber_domain = subscriber_opts.get_field('email_domain').column
+
+        columns = []
+        values = []
+        params = []
+        for field in self.model._meta.concrete_fields:
+            if isinstance(field, AutoField):
+                continue
+
+            columns.append(qn(field.column))
+            if field.name == 'subscriber':
+                values.append('subscriber.{0}'.format(qn(subscriber_pk)))
+                continue
+            elif field.name == 'domain':
+                values.append('subscriber.{0}'.format(qn(subscriber_domain)))
+                continue
+            elif field.name == 'message':
+                value = message.pk
+            elif field.name == 'newsletter':
+                value = message.newsletter_id
+            elif field.name == 'date':
+                value = date
+            else:
+                value = field.get_default()
+
+            values.append('%s')
+            params.append(field.get_db_prep_save(value, connection))
+
+        subscribers = subscribers.values_list(
+            'pk',
+            'email_domain_id',
+        ).order_by().distinct()
+
+        def insert(queryset):
+            try:
+                select_sql, select_params = queryset.query.get_compiler(
+                    connection=connection,
+                ).as_sql()
+            except EmptyResultSet:
+                return 0
+            sql = 'INSERT INTO {0} ({1}) SELECT {2} FROM ({3}) subscriber'.format(
+                qn(self.model._meta.db_table),
+                ', '.join(columns),
+                ', '.join(values),
+                select_sql,
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params + list(select_params))
+                return cursor.rowcount
+
+        if not batch_size:
+            return insert(subscribers)
+
+        pks = subscribers.values_list('pk', flat=True).order_by('pk')
+        count = 0
+        last_pk = None
+        while True:
+            batch = subscribers
+            remaining_pks = pks
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+                remaining_pks = remaining_pks.filter(pk__gt=last_pk)
+
+            # Each batch starts after the last primary key of the previous
+            # one, so batches do not need to skip the rows already inserted.
+            bound = list(remaining_pks[batch_size - 1:batch_size])
+            if bound:
+                batch = batch.filter(pk__lte=bound[0])
+
+            count += insert(batch)
+            if progress is not None:
+                progress(count)
+            if not bound:
+                break
+
+            last_pk = bound[0]
+
+        return count
 
 
 class NewsletterQuerySet(QuerySet):
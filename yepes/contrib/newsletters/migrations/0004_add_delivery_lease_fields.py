@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import yepes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletters', '0003_add_meta_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='attempts',
+            field=yepes.fields.SmallIntegerField(default=0, editable=False, min_value=0, verbose_name='Failed Attempts'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='lease_expiration',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Lease Expiration'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='lease_owner',
+            field=yepes.fields.CharField(blank=True, editable=False, max_length=32, verbose_name='Lease Owner'),
+        ),
+    ]
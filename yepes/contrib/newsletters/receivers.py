@@ -2,13 +2,20 @@
 
 from __future__ import unicode_literals
 
+from django.core.cache import caches
 from django.utils import timezone
 
+from yepes.conf import settings
 from yepes.loading import LazyModel
 
 Delivery = LazyModel('newsletters', 'Delivery')
 
 
+def image_changed(sender, instance, **kwargs):
+    cache = caches[settings.NEWSLETTERS_IMAGE_CACHE]
+    cache.delete('.'.join(('newsletters.views.image', instance.guid)))
+
+
 def message_bounced(sender, instance, created, **kwargs):
     if created:
         Delivery.objects.filter(
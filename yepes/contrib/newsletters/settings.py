@@ -0,0 +1,25 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+NEWSLETTERS_BUFFERED_TRACKING = False
+NEWSLETTERS_CONNECTIONS_PER_SERVER = 2
+NEWSLETTERS_DISPATCH_QUEUE_SIZE = 100
+NEWSLETTERS_DOMAIN_CONCURRENCY = 2
+NEWSLETTERS_DOMAIN_LIMITS = {}
+NEWSLETTERS_DOMAIN_RATE = None
+NEWSLETTERS_IMAGE_CACHE = 'default'
+NEWSLETTERS_IMAGE_CACHE_TIMEOUT = 60 * 60
+NEWSLETTERS_IMAGE_MAX_CACHED_SIZE = 64 * 1024
+NEWSLETTERS_LEASE_TIME = 60 * 10
+NEWSLETTERS_MAX_ATTEMPTS = 5
+NEWSLETTERS_PRERENDER_CACHE = 'default'
+NEWSLETTERS_PRERENDER_CACHE_TIMEOUT = 60 * 60 * 24
+NEWSLETTERS_RENDER_WORKERS = 4
+NEWSLETTERS_RETRY_DELAY = 60
+NEWSLETTERS_SCHEDULE_BATCH_SIZE = 10000
+NEWSLETTERS_TEMPLATE_CACHE_SIZE = 100
+NEWSLETTERS_TRACKING_BUFFER_SIZE = 100
+NEWSLETTERS_TRACKING_CACHE = 'default'
+NEWSLETTERS_TRACKING_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+NEWSLETTERS_TRACKING_FLUSH_INTERVAL = 10
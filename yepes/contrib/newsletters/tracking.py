@@ -0,0 +1,240 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import unicode_literals
+
+import atexit
+from functools import reduce
+import logging
+import operator
+import threading
+
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import six
+from django.utils import timezone
+
+from yepes.conf import settings
+from yepes.loading import LazyModel
+
+Click = LazyModel('newsletters', 'Click')
+Delivery = LazyModel('newsletters', 'Delivery')
+Message = LazyModel('newsletters', 'Message')
+MessageLink = LazyModel('newsletters', 'MessageLink')
+Open = LazyModel('newsletters', 'Open')
+Subscriber = LazyModel('newsletters', 'Subscriber')
+
+logger = logging.getLogger('yepes.contrib.newsletters')
+
+
+class TrackingBuffer(object):
+    """
+    Keeps the opens and the clicks of the messages in memory and writes
+    them in batches, so the tracking views do not write in the database.
+
+    Events are identified by the guids of the URLs, which are resolved when
+    the buffer is flushed. That is done by a background thread, which is
+    started with the first event, every ``interval`` seconds or as soon as
+    the buffer holds ``max_size`` events, and also when the process exits.
+    Events that cannot be written are kept for the next flush. Events of a
+    process that is killed are lost.
+
+    """
+    def __init__(self, max_size=100, interval=10.0):
+        self.max_size = max_size
+        self.interval = interval
+        self.clicks = []
+        self.opens = set()
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.full = threading.Event()
+        self.thread = None
+
+    def add_click(self, link_guid, message_guid, subscriber_guid):
+        with self.lock:
+            self.clicks.append((link_guid, message_guid, subscriber_guid))
+        self.notify()
+
+    def add_open(self, message_guid, subscriber_guid):
+        # Opens only should be registered the first time, so repeated opens
+        # are discarded here with the help of the cache, which is shared by
+        # all processes.
+        cache = caches[settings.NEWSLETTERS_TRACKING_CACHE]
+        key = '.'.join((
+            'newsletters.tracking.open',
+            message_guid,
+            subscriber_guid,
+        ))
+        if not cache.add(key, True, timeout=settings.NEWSLETTERS_TRACKING_CACHE_TIMEOUT):
+            return
+
+        with self.lock:
+            self.opens.add((message_guid, subscriber_guid))
+        self.notify()
+
+    def flush(self):
+        """
+        Writes the events in the database. If that fails, the events are
+        put back into the buffer and the exception is raised.
+        """
+        with self.flush_lock:
+            with self.lock:
+                clicks, self.clicks = self.clicks, []
+                opens, self.opens = self.opens, set()
+
+            if not clicks and not opens:
+                return
+
+            try:
+                with transaction.atomic():
+                    self.write(clicks, opens)
+            except Exception:
+                with self.lock:
+                    self.clicks[:0] = clicks
+                    self.opens.update(opens)
+                raise
+
+    def notify(self):
+        """
+        Starts the background thread if it is not running, for example
+        after forking the process, and wakes it up if the buffer is full.
+        """
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run)
+                self.thread.daemon = True
+                self.thread.start()
+            if len(self.clicks) + len(self.opens) >= self.max_size:
+                self.full.set()
+
+    def run(self):
+        while True:
+            self.full.wait(self.interval)
+            self.full.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Tracking events could not be written.')
+            finally:
+                for connection in connections.all():
+                    connection.close()
+
+    def write(self, clicks, opens):
+        """
+        Writes the events in the database and updates the deliveries with
+        one statement for each flag.
+        """
+        message_guids = set(g for _, g, _ in clicks)
+        message_guids.update(g for g, _ in opens)
+        messages = {
+            guid: (pk, newsletter_id)
+            for guid, pk, newsletter_id
+            in Message.objects.filter(
+                guid__in=message_guids,
+            ).values_list('guid', 'pk', 'newsletter_id')
+        }
+        subscriber_guids = set(g for _, _, g in clicks)
+        subscriber_guids.update(g for _, g in opens)
+        subscribers = {
+            guid: (pk, domain_id)
+            for guid, pk, domain_id
+            in Subscriber.objects.filter(
+                guid__in=subscriber_guids,
+            ).values_list('guid', 'pk', 'email_domain_id')
+        }
+        links = dict(MessageLink.objects.filter(
+            guid__in=set(g for g, _, _ in clicks),
+        ).values_list('guid', 'pk'))
+
+        new_clicks = []
+        clicked = set()
+        for link_guid, message_guid, subscriber_guid in clicks:
+            if (link_guid in links
+                    and message_guid in messages
+                    and subscriber_guid in subscribers):
+                message_id, newsletter_id = messages[message_guid]
+                subscriber_id, domain_id = subscribers[subscriber_guid]
+                new_clicks.append(Click(
+                    link_id=links[link_guid],
+                    message_id=message_id,
+                    newsletter_id=newsletter_id,
+                    subscriber_id=subscriber_id,
+                    domain_id=domain_id,
+                ))
+                clicked.add((message_id, subscriber_id))
+
+        opened = set()
+        for message_guid, subscriber_guid in opens:
+            if message_guid in messages and subscriber_guid in subscribers:
+                opened.add((
+                    messages[message_guid][0],
+                    subscribers[subscriber_guid][0],
+                ))
+
+        if opened:
+            opened.difference_update(Open.objects.filter(
+                self.get_pairs_filter(opened),
+            ).values_list('message_id', 'subscriber_id'))
+
+        newsletter_ids = dict(six.itervalues(messages))
+        domain_ids = dict(six.itervalues(subscribers))
+        new_opens = [
+            Open(
+                message_id=message_id,
+                newsletter_id=newsletter_ids[message_id],
+                subscriber_id=subscriber_id,
+                domain_id=domain_ids[subscriber_id],
+            )
+            for message_id, subscriber_id
+            in opened
+        ]
+
+        # Receivers are not called by ``bulk_create()``, so deliveries are
+        # updated here in the same way.
+        now = timezone.now()
+        if new_clicks:
+            Click.objects.bulk_create(new_clicks)
+            Delivery.objects.filter(
+                self.get_pairs_filter(clicked),
+                is_clicked=False,
+            ).update(is_clicked=True, click_date=now)
+            # Subscribers cannot click on links without first opening the
+            # message.
+            opened.update(clicked)
+        if new_opens:
+            Open.objects.bulk_create(new_opens)
+        if opened:
+            Delivery.objects.filter(
+                self.get_pairs_filter(opened),
+                is_opened=False,
+            ).update(is_opened=True, open_date=now)
+
+    def get_pairs_filter(self, pairs):
+        """
+        Returns a filter that matches the given pairs of message and
+        subscriber, with one condition for each message.
+        """
+        subscribers = {}
+        for message_id, subscriber_id in pairs:
+            subscribers.setdefault(message_id, []).append(subscriber_id)
+
+        return reduce(operator.or_, (
+            Q(message_id=message_id, subscriber_id__in=subscriber_ids)
+            for message_id, subscriber_ids
+            in six.iteritems(subscribers)
+        ))
+
+
+buffer = TrackingBuffer(
+    max_size=settings.NEWSLETTERS_TRACKING_BUFFER_SIZE,
+    interval=settings.NEWSLETTERS_TRACKING_FLUSH_INTERVAL,
+)
+atexit.register(buffer.flush)
+
+
+def track_click(link_guid, message_guid, subscriber_guid):
+    buffer.add_click(link_guid, message_guid, subscriber_guid)
+
+
+def track_open(message_guid, subscriber_guid):
+    buffer.add_open(message_guid, subscriber_guid)
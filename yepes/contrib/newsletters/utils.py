@@ -2,11 +2,23 @@
 
 from __future__ import unicode_literals
 
+import copy
+import hashlib
 import re
+import threading
 
-from django.template import Context, Template
+from django import VERSION as DJANGO_VERSION
+from django.core.cache import caches
+from django.db import models
+from django.template import Context, Node, NodeList, Template
+from django.template.base import TextNode, Variable, VariableNode
+from django.template.defaulttags import CommentNode, LoadNode
+from django.utils import six
+from django.utils.encoding import force_bytes, force_text
 
+from yepes.conf import settings
 from yepes.loading import LazyModel
+from yepes.utils.structures import LRUDict
 
 MessageImage = LazyModel('newsletters', 'MessageImage')
 MessageLink = LazyModel('newsletters', 'MessageLink')
@@ -14,44 +26,170 @@ MessageLink = LazyModel('newsletters', 'MessageLink')
 IMAGE_RE = re.compile(r"\{% image_url '([^']*)' %\}")
 LINK_RE = re.compile(r"\{% link_url '([^']*)' %\}")
 
+_templates = LRUDict(settings.NEWSLETTERS_TEMPLATE_CACHE_SIZE)
+_templates_lock = threading.Lock()
+
+
+def compile_template(template_string):
+    """
+    Compiles the given source with the ``newsletters`` tags loaded.
+    """
+    return Template('{% load newsletters %}\n' + template_string)
+
+
+def get_template(template_string):
+    """
+    Returns the compiled template of the given source, which is compiled only
+    the first time. Templates are cached by the hash of their source, so a
+    message that is edited after being prerendered is compiled again.
+    """
+    key = hashlib.sha1(force_bytes(template_string)).hexdigest()
+    with _templates_lock:
+        template = _templates.get(key)
+    if template is not None:
+        return template
+
+    template = compile_template(template_string)
+    with _templates_lock:
+        _templates[key] = template
+
+    return template
+
+
+class PersonalizedNode(Node):
+    """
+    Renders the parts of a template that were split by ``split_template()``.
+    Strings are written as they are and only the nodes are rendered.
+    """
+    def __init__(self, parts):
+        self.parts = parts
+
+    def render(self, context):
+        return ''.join(
+            part if isinstance(part, six.string_types) else force_text(render_node(part, context))
+            for part
+            in self.parts
+        )
+
+
+if DJANGO_VERSION < (1, 9):
+    def render_node(node, context):
+        return node.render(context)
+else:
+    def render_node(node, context):
+        # Nodes annotate their own exceptions, ``PersonalizedNode`` has no
+        # token to do it.
+        return node.render_annotated(context)
+
+
+def depends_on_subscriber(node):
+    """
+    Returns whether the output of the node may change from one subscriber
+    to another. Only text, comments, ``{% load %}`` and variables that do
+    not refer to the subscriber are considered static, any other node may
+    depend on it.
+    """
+    if isinstance(node, (CommentNode, LoadNode, TextNode)):
+        return False
+    elif isinstance(node, VariableNode):
+        expression = node.filter_expression
+        variables = [expression.var]
+        for _, args in expression.filters:
+            variables.extend(arg for _, arg in args)
+        return any(
+            isinstance(var, Variable)
+            and var.lookups is not None
+            and var.lookups[0] == 'subscriber'
+            for var
+            in variables
+        )
+    else:
+        return True
+
+
+def get_prerender_key(source, context=None):
+    """
+    Returns the cache key of the prerendered source, which changes when the
+    source or the objects of the context are modified.
+    """
+    parts = [force_text(source)]
+    for name, value in sorted(six.iteritems(context or {})):
+        if isinstance(value, models.Model):
+            value = '{0}.{1}:{2}:{3}'.format(
+                value._meta.app_label,
+                value._meta.model_name,
+                value.pk,
+                getattr(value, 'last_modified', None),
+            )
+        parts.append('{0}={1}'.format(name, force_text(value)))
+
+    checksum = hashlib.sha1(force_bytes('\n'.join(parts))).hexdigest()
+    return '.'.join(('newsletters.utils.prerender', checksum))
+
 
 def prerender(source, context=None):
-    ctxt = Context({'prerendering': True})
-    load = '{% load newsletters %}\n'
-    if context is not None:
-        ctxt.update(context)
+    return prerender_many([(source, context)])[0]
 
-    prerendered = Template(load + source).render(ctxt)
+
+def prerender_many(sources):
+    """
+    Prerenders several sources, given as ``(source, context)`` pairs, and
+    returns the results in the same order.
+
+    Rendered sources are kept in the ``NEWSLETTERS_PRERENDER_CACHE`` cache,
+    which is shared by all processes. Images and links are resolved after
+    reading the cache, with one query for all the sources, so the results
+    always point to the current images.
+    """
+    cache = caches[settings.NEWSLETTERS_PRERENDER_CACHE]
+    keys = [
+        get_prerender_key(source, context)
+        for source, context
+        in sources
+    ]
+    cached = cache.get_many(keys)
+    results = [cached.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        for i in missing:
+            source, context = sources[i]
+            ctxt = Context({'prerendering': True})
+            if context is not None:
+                ctxt.update(context)
+
+            results[i] = compile_template(source).render(ctxt)
+
+        cache.set_many(
+            {keys[i]: results[i] for i in missing},
+            timeout=settings.NEWSLETTERS_PRERENDER_CACHE_TIMEOUT,
+        )
 
     image_names = set()
-    def image_collector(matchobj):
-        image_names.add(matchobj.group(1))
-        return matchobj.group(0)
-    IMAGE_RE.sub(image_collector, prerendered)
-
-    image_guids = dict(MessageImage.objects.filter(
-        name__in=image_names,
-    ).values_list(
-        'name',
-        'guid',
-    ))
+    link_urls = set()
+    for prerendered in results:
+        image_names.update(IMAGE_RE.findall(prerendered))
+        link_urls.update(LINK_RE.findall(prerendered))
+
+    image_guids = {}
+    if image_names:
+        image_guids.update(MessageImage.objects.filter(
+            name__in=image_names,
+        ).values_list(
+            'name',
+            'guid',
+        ))
     def image_replacement(matchobj):
         guid = image_guids.get(matchobj.group(1))
         return "{{% prerendered_image '{0}' %}}".format(guid) if guid else ''
-    prerendered = IMAGE_RE.sub(image_replacement, prerendered)
 
-    link_urls = set()
-    def link_collector(matchobj):
-        link_urls.add(matchobj.group(1))
-        return matchobj.group(0)
-    LINK_RE.sub(link_collector, prerendered)
-
-    link_guids = dict(MessageLink.objects.filter(
-        url__in=link_urls,
-    ).values_list(
-        'url',
-        'guid',
-    ))
+    link_guids = {}
+    if link_urls:
+        link_guids.update(MessageLink.objects.filter(
+            url__in=link_urls,
+        ).values_list(
+            'url',
+            'guid',
+        ))
 
     new_links = [
         MessageLink(url=url)
@@ -66,16 +204,100 @@ def prerender(source, context=None):
     def link_replacement(matchobj):
         guid = link_guids.get(matchobj.group(1))
         return "{{% prerendered_link '{0}' %}}".format(guid)
-    prerendered = LINK_RE.sub(link_replacement, prerendered)
 
-    return prerendered
+    return [
+        LINK_RE.sub(link_replacement, IMAGE_RE.sub(image_replacement, prerendered))
+        for prerendered
+        in results
+    ]
+
+
+def read_image(image_file):
+    """
+    Reads the given image file and returns a dictionary with its content
+    type, its size, an ETag and its content, which is None if the file is
+    larger than ``NEWSLETTERS_IMAGE_MAX_CACHED_SIZE``.
+    """
+    max_size = settings.NEWSLETTERS_IMAGE_MAX_CACHED_SIZE
+    checksum = hashlib.md5()
+    chunks = []
+    size = 0
+    image_file.open('rb')
+    try:
+        header = b''
+        for chunk in image_file.chunks():
+            if not header:
+                header = chunk[:12]
+            checksum.update(chunk)
+            size += len(chunk)
+            if size <= max_size:
+                chunks.append(chunk)
+    finally:
+        image_file.close()
+
+    if header.startswith(b'\xff\xd8'):
+        content_type = 'image/jpeg'
+    elif header.startswith(b'\x89PNG\r\n\x1a\n'):
+        content_type = 'image/png'
+    elif header.startswith(b'GIF8'):
+        content_type = 'image/gif'
+    elif header.startswith(b'WEBP', 8):
+        content_type = 'image/webp'
+    else:
+        content_type = 'application/octet-stream'
+
+    return {
+        'content_type': content_type,
+        'data': b''.join(chunks) if size <= max_size else None,
+        'etag': checksum.hexdigest(),
+        'size': size,
+    }
+
+
+def split_template(template, context=None):
+    """
+    Returns a copy of the given template in which the nodes that do not
+    depend on the subscriber have already been rendered with ``context``.
+    Thus, rendering the copy for each subscriber only evaluates the
+    personalized nodes.
+    """
+    if not isinstance(template, Template):
+        template = get_template(template)
+
+    parts = []
+    static_nodes = NodeList()
+    def add_static_nodes():
+        if static_nodes:
+            static_template = copy.copy(template)
+            static_template.nodelist = NodeList(static_nodes)
+            parts.append(render(static_template, context))
+            del static_nodes[:]
+
+    for node in template.nodelist:
+        if depends_on_subscriber(node):
+            add_static_nodes()
+            parts.append(node)
+        else:
+            static_nodes.append(node)
+
+    add_static_nodes()
+    split = copy.copy(template)
+    split.nodelist = NodeList([PersonalizedNode(parts)])
+    return split
+
 
+def render(template, context=None):
+    """
+    Renders the given template for a subscriber. ``template`` can be a
+    prerendered source or a template returned by ``get_template()`` or
+    ``split_template()``.
+    """
+    if not isinstance(template, Template):
+        template = get_template(template)
 
-def render(template_string, context=None):
     ctxt = Context()
-    load = '{% load newsletters %}\n'
     if context is not None:
         ctxt.update(context)
 
-    return Template(load + template_string).render(ctxt)
+    return template.render(ctxt)
 
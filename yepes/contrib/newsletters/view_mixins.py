@@ -23,12 +23,15 @@ class ImageMixin(object):
     image_field = 'image'
     require_image = False
 
+    def get_image_guid(self):
+        return self.kwargs.get('image_guid', self.request.GET.get('i'))
+
     def get_image(self):
         if self._image is Undefined:
 
             image = None
 
-            guid = self.kwargs.get('image_guid', self.request.GET.get('i'))
+            guid = self.get_image_guid()
             name = self.kwargs.get('image_name')
             try:
                 if guid:
@@ -67,12 +70,15 @@ class LinkMixin(object):
     link_field = 'link'
     require_link = False
 
+    def get_link_guid(self):
+        return self.kwargs.get('link_guid', self.request.GET.get('l'))
+
     def get_link(self):
         if self._link is Undefined:
 
             link = None
 
-            guid = self.kwargs.get('link_guid', self.request.GET.get('l'))
+            guid = self.get_link_guid()
             url = self.kwargs.get('link_url', self.request.GET.get('u'))
             try:
                 if guid:
@@ -111,12 +117,15 @@ class MessageMixin(object):
     message_field = 'message'
     require_message = False
 
+    def get_message_guid(self):
+        return self.kwargs.get('message_guid', self.request.GET.get('m'))
+
     def get_message(self):
         if self._message is Undefined:
 
             message = None
 
-            guid = self.kwargs.get('message_guid', self.request.GET.get('m'))
+            guid = self.get_message_guid()
             slug = self.kwargs.get('message_slug')
             try:
                 if guid:
@@ -155,12 +164,15 @@ class NewsletterMixin(object):
     newsletter_field = 'newsletter'
     require_newsletter = False
 
+    def get_newsletter_guid(self):
+        return self.kwargs.get('newsletter_guid', self.request.GET.get('n'))
+
     def get_newsletter(self):
         if self._newsletter is Undefined:
 
             newsletter = None
 
-            guid = self.kwargs.get('newsletter_guid', self.request.GET.get('n'))
+            guid = self.get_newsletter_guid()
             slug = self.kwargs.get('newsletter_slug')
             try:
                 if guid:
@@ -199,12 +211,15 @@ class SubscriberMixin(object):
     subscriber_field = 'subscriber'
     require_subscriber = False
 
+    def get_subscriber_guid(self):
+        return self.kwargs.get('subscriber_guid', self.request.GET.get('s'))
+
     def get_subscriber(self):
         if self._subscriber is Undefined:
 
             subscriber = None
 
-            guid = self.kwargs.get('subscriber_guid', self.request.GET.get('s'))
+            guid = self.get_subscriber_guid()
             address = self.kwargs.get('subscriber_email', self.request.GET.get('e'))
             try:
                 if guid:
@@ -4,12 +4,18 @@ from __future__ import unicode_literals
 
 from django.contrib.admin.models import LogEntry, CHANGE
 from django.contrib.contenttypes.models import ContentType
-from django.core.cache import cache
+from django.core.cache import caches
 from django.core.urlresolvers import reverse
 from django.db.models import F, Q
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseNotModified,
+    HttpResponseRedirect,
+)
 from django.utils import six
 from django.utils.encoding import force_text
+from django.utils.http import parse_etags, quote_etag
 from django.utils.itercompat import is_iterable
 from django.utils.translation import ugettext_lazy as _
 from django.views.decorators.cache import never_cache
@@ -21,6 +27,7 @@ from django.views.generic import (
 )
 
 from yepes.apps import apps
+from yepes.conf import settings
 from yepes.utils.views import decorate_view
 from yepes.utils.aggregates import SumIf
 from yepes.views import FormView, UpdateView
@@ -45,7 +52,10 @@ NewsletterMixin = apps.get_class('newsletters.view_mixins', 'NewsletterMixin')
 SubscriberMixin = apps.get_class('newsletters.view_mixins', 'SubscriberMixin')
 
 prerender = apps.get_class('newsletters.utils', 'prerender')
+read_image = apps.get_class('newsletters.utils', 'read_image')
 render = apps.get_class('newsletters.utils', 'render')
+track_click = apps.get_class('newsletters.tracking', 'track_click')
+track_open = apps.get_class('newsletters.tracking', 'track_open')
 
 
 class DispatchView(UpdateView):
@@ -108,22 +118,14 @@ class DispatchView(UpdateView):
                 ~Q(tags=form_data['tags_filter_value']),
             )
 
-        subscribers = subscribers.values_list(
-            'pk',
-            'email_domain_id',
-        ).order_by('?')
-
-        deliveries = {}
-        for subscriber_id, domain_id in subscribers:
-            delivery = self.delivery_model()
-            delivery.message = self.object
-            delivery.newsletter_id = self.object.newsletter_id
-            delivery.subscriber_id = subscriber_id
-            delivery.domain_id = domain_id
-            delivery.date = form_data['date']
-            deliveries[subscriber_id] = delivery
-
-        self.delivery_model.objects.bulk_create(six.itervalues(deliveries))
+        # Deliveries are inserted by the database in batches, so neither
+        # the subscribers nor the deliveries are loaded in Python.
+        self.delivery_model.objects.schedule(
+            self.object,
+            subscribers,
+            form_data['date'],
+            batch_size=settings.NEWSLETTERS_SCHEDULE_BATCH_SIZE,
+        )
 
         return HttpResponseRedirect(self.get_success_url())
 
@@ -177,37 +179,72 @@ class ImageView(SubscriberMixin, MessageMixin, ImageMixin, View):
     require_image = True
 
     def get(self, request, *args, **kwargs):
-        image = self.get_image()
-        message = self.get_message()
-        subscriber = self.get_subscriber()
+        image_info = self.get_image_info()
+        if settings.NEWSLETTERS_BUFFERED_TRACKING:
+            # Guids are resolved when the buffer is flushed.
+            message_guid = self.get_message_guid()
+            subscriber_guid = self.get_subscriber_guid()
+            if message_guid and subscriber_guid:
+                track_open(message_guid, subscriber_guid)
+        else:
+            message = self.get_message()
+            subscriber = self.get_subscriber()
+            if message is not None and subscriber is not None:
+                open = Open()
+                open.message = message
+                open.subscriber = subscriber
+                # Unlike clicks, openings only should be registered the first time.
+                if not Open.objects.filter(
+                        message=message,
+                        subscriber=subscriber).exists():
+                    # This involves more code than just call ``get_or_create()``
+                    # but is more efficient because ``get_or_create()`` tries to
+                    # retrieve the entire record.
+                    open.save()
+
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        etag = quote_etag(image_info['etag'])
+        if '*' in etags or etag in etags or image_info['etag'] in etags:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        if image_info['data'] is not None:
+            response = HttpResponse(
+                image_info['data'],
+                content_type=image_info['content_type'],
+            )
+        else:
+            # Images too large to be cached are streamed from the storage.
+            # ``FieldFile.open()`` does not return the file in all Django
+            # versions, so the field file itself is given to the response.
+            image_file = self.get_image().image
+            image_file.open('rb')
+            response = FileResponse(
+                image_file,
+                content_type=image_info['content_type'],
+            )
 
-        if message is not None and subscriber is not None:
-            open = Open()
-            open.message = message
-            open.subscriber = subscriber
-            # Unlike clicks, openings only should be registered the first time.
-            if not Open.objects.filter(
-                    message=message,
-                    subscriber=subscriber).exists():
-                # This involves more code than just call ``get_or_create()``
-                # but is more efficient because ``get_or_create()`` tries to
-                # retrieve the entire record.
-                open.save()
-
-        image_data = image.image.read()
-        if image_data.startswith(b'\xff\xd8'):
-            image_type = 'image/jpeg'
-        elif image_data.startswith(b'\x89PNG\r\n\x1a\n'):
-            image_type = 'image/png'
-        elif image_data.startswith(b'GIF8'):
-            image_type = 'image/gif'
-        elif image_data.startswith(b'WEBP', 8):
-            image_type = 'image/webp'
-
-        response = HttpResponse(image_data, content_type=image_type)
-        response['Content-Length'] = len(image_data)
+        response['Content-Length'] = image_info['size']
+        response['ETag'] = etag
         return response
 
+    def get_image_info(self):
+        """
+        Returns the content type, the size, the ETag and, if the image is not
+        too large, the content of the image. These are kept in the cache, so
+        the storage is not read on every request.
+        """
+        cache = caches[settings.NEWSLETTERS_IMAGE_CACHE]
+        guid = self.get_image_guid() or self.get_image().guid
+        key = '.'.join(('newsletters.views.image', guid))
+        image_info = cache.get(key)
+        if image_info is None:
+            image_info = read_image(self.get_image().image)
+            cache.set(key, image_info, timeout=settings.NEWSLETTERS_IMAGE_CACHE_TIMEOUT)
+
+        return image_info
+
 
 class LinkView(SubscriberMixin, MessageMixin, LinkMixin, RedirectView):
 
@@ -216,15 +253,21 @@ class LinkView(SubscriberMixin, MessageMixin, LinkMixin, RedirectView):
 
     def get_redirect_url(self, *args, **kwargs):
         link = self.get_link()
-        message = self.get_message()
-        subscriber = self.get_subscriber()
-
-        if message is not None and subscriber is not None:
-            click = Click()
-            click.link = link
-            click.message = message
-            click.subscriber = subscriber
-            click.save()
+        if settings.NEWSLETTERS_BUFFERED_TRACKING:
+            # Guids are resolved when the buffer is flushed.
+            message_guid = self.get_message_guid()
+            subscriber_guid = self.get_subscriber_guid()
+            if message_guid and subscriber_guid:
+                track_click(link.guid, message_guid, subscriber_guid)
+        else:
+            message = self.get_message()
+            subscriber = self.get_subscriber()
+            if message is not None and subscriber is not None:
+                click = Click()
+                click.link = link
+                click.message = message
+                click.subscriber = subscriber
+                click.save()
 
         return link.url
 
@@ -240,13 +283,16 @@ class MessageView(SubscriberMixin, MessageMixin, View):
         if subscriber is not None:
             # Subscribers cannot access this view
             # without opening the message.
-            open = Open()
-            open.message = message
-            open.subscriber = subscriber
-            if not Open.objects.filter(
-                    message=message,
-                    subscriber=subscriber).exists():
-                open.save()
+            if settings.NEWSLETTERS_BUFFERED_TRACKING:
+                track_open(message.guid, subscriber.guid)
+            else:
+                open = Open()
+                open.message = message
+                open.subscriber = subscriber
+                if not Open.objects.filter(
+                        message=message,
+                        subscriber=subscriber).exists():
+                    open.save()
 
         html = self.get_prerendered_html(message)
         context = {
@@ -257,23 +303,14 @@ class MessageView(SubscriberMixin, MessageMixin, View):
         return HttpResponse(render(html, context))
 
     def get_prerendered_html(self, message):
-        key = 'yepes.newsletters.message.{0}'.format(message.guid)
-        html = cache.get(key)
-        try:
-            is_staff = self.request.user.is_staff
-        except AttributeError:
-            is_staff = False
-
-        if html is None or is_staff:
-            context = {
-                'subscriber': None, # Subscriber must not be specified here.
-                'newsletter': message.newsletter,
-                'message': message,
-            }
-            html = prerender(message.html, context)
-            cache.set(key, html)
-
-        return html
+        # Prerendered sources are cached until the message is modified, so
+        # the staff see their changes at once.
+        context = {
+            'subscriber': None, # Subscriber must not be specified here.
+            'newsletter': message.newsletter,
+            'message': message,
+        }
+        return prerender(message.html, context)
 
 
 @decorate_view(
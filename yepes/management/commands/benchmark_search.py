@@ -0,0 +1,371 @@
+# -*- coding:utf-8 -*-
+
+from __future__ import division, unicode_literals
+
+from datetime import date, time
+from decimal import Decimal
+import gc
+import json
+import random
+from timeit import default_timer
+import uuid
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.fields import (
+    AutoField,
+    BooleanField,
+    CharField,
+    DateField,
+    DateTimeField,
+    DecimalField,
+    EmailField,
+    FloatField,
+    IntegerField,
+    TextField,
+    TimeField,
+    UUIDField,
+)
+from django.db.models.query import QuerySet
+from django.utils import six
+from django.utils import timezone
+
+from yepes.apps import apps
+from yepes.contrib.registry import registry
+from yepes.managers.searchable import SearchableQuerySet
+
+# Words of several languages, with and without accents, so that the regular
+# expressions that the helper builds for the vowels are really exercised.
+VOCABULARY = (
+    'acción', 'árbol', 'avión', 'bajo', 'camión', 'canción', 'corazón',
+    'débil', 'después', 'dirección', 'fácil', 'jardín', 'lápiz', 'limón',
+    'música', 'número', 'pájaro', 'película', 'ratón', 'teléfono',
+    'café', 'château', 'élève', 'fenêtre', 'forêt', 'garçon', 'hôpital',
+    'île', 'théâtre', 'école', 'économie', 'étoile', 'cœur', 'noël',
+    'bäcker', 'brücke', 'größe', 'grün', 'häuser', 'küche', 'mädchen',
+    'müller', 'öffnung', 'schön', 'straße', 'tür', 'über', 'wörter',
+    'ação', 'avô', 'coração', 'irmã', 'lições', 'mãe', 'pão', 'você',
+    'book', 'chair', 'django', 'framework', 'garden', 'guide', 'house',
+    'library', 'material', 'model', 'python', 'query', 'search', 'table',
+    'technical', 'window', 'world', 'writer',
+)
+
+PHRASE = ('technical', 'material')
+
+
+class Command(BaseCommand):
+    help = ('Measures the relevance and the latency of the built-in search '
+            'engine. Generates synthetic corpora for the given model, runs a '
+            'fixed mix of queries and reports query time, Python scoring '
+            'time, peak memory and result overlap between databases. '
+            'Generated rows are always rolled back.')
+
+    requires_system_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', metavar='app_label.ModelName')
+        parser.add_argument('--rows',
+            action='append',
+            default=None,
+            dest='rows',
+            type=int,
+            help=('Size of the generated corpus. Can be used several times. '
+                  'Defaults to 10000, 100000 and 1000000.'))
+        parser.add_argument('--database',
+            action='append',
+            default=None,
+            dest='databases',
+            help=('Database to run the benchmark against. Can be used several '
+                  'times to compare backends.'))
+        parser.add_argument('--repeat',
+            action='store',
+            default=3,
+            dest='repeat',
+            type=int,
+            help='Number of times that each query is run. The best time is kept.')
+        parser.add_argument('--seed',
+            action='store',
+            default=0,
+            dest='seed',
+            type=int,
+            help='Seed of the corpus generator.')
+        parser.add_argument('-o', '--output',
+            action='store',
+            default=None,
+            dest='output',
+            help='Specifies a file to write the results to, as JSON.')
+
+    def handle(self, **options):
+        self.verbosity = options['verbosity']
+        label = options['model']
+        try:
+            model = apps.get_model(label)
+        except (LookupError, ValueError):
+            raise CommandError('Unknown model: {0}'.format(label))
+
+        if not isinstance(model._default_manager.get_queryset(), SearchableQuerySet):
+            msg = "Model '{0}' has not a searchable manager."
+            raise CommandError(msg.format(label))
+
+        fields = self.get_text_fields(model)
+        if not fields:
+            msg = "Model '{0}' has not text fields to fill."
+            raise CommandError(msg.format(label))
+
+        required_fields = self.get_required_fields(model, fields)
+        row_counts = options['rows'] or [10000, 100000, 1000000]
+        databases = options['databases'] or [DEFAULT_DB_ALIAS]
+        queries = self.get_queries()
+
+        results = []
+        keys = {}
+        for rows in row_counts:
+            for db in databases:
+                for record, result_keys in self.run_benchmark(
+                        model, fields, required_fields, rows, db, queries,
+                        options['repeat'], options['seed']):
+                    results.append(record)
+                    keys[(rows, record['query'], db)] = result_keys
+                    self.write_record(record)
+
+        for record in results:
+            record['overlap'] = self.get_overlap(record, databases, keys)
+
+        if len(databases) > 1:
+            self.stdout.write('')
+            for record in results:
+                if record['database'] != databases[0]:
+                    msg = '{rows:>8} {database:<10} {query:<24} overlap={overlap:.3f}'
+                    self.stdout.write(msg.format(**record))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def generate_rows(self, model, fields, required_fields, related_keys,
+                            rows, seed):
+        rng = random.Random(seed)
+        for i in six.moves.range(rows):
+            obj = model()
+            for field in fields:
+                size = rng.randint(3, 20 if isinstance(field, CharField) else 80)
+                words = [rng.choice(VOCABULARY) for _ in six.moves.range(size)]
+                if rng.random() < 0.1:
+                    position = rng.randint(0, size - 1)
+                    words[position:position + 1] = PHRASE
+
+                text = ' '.join(words)
+                if field.max_length:
+                    text = text[:field.max_length].rsplit(' ', 1)[0]
+
+                setattr(obj, field.attname, text)
+
+            for field in required_fields:
+                if field.remote_field is not None:
+                    value = related_keys[field.name]
+                else:
+                    value = self.generate_value(field, i, rng)
+
+                setattr(obj, field.attname, value)
+
+            yield obj
+
+    def generate_value(self, field, index, rng):
+        """
+        Returns a value for a required field that is not filled with words.
+        Unique fields receive the row index, so that they do not collide.
+        """
+        if field.choices:
+            return rng.choice([key for key, _ in field.flatchoices])
+        elif isinstance(field, BooleanField):
+            return (rng.random() < 0.5)
+        elif isinstance(field, EmailField):
+            return 'benchmark{0}@example.com'.format(index)
+        elif isinstance(field, (CharField, TextField)):
+            return six.text_type(index)
+        elif isinstance(field, IntegerField):
+            return index if field.unique else rng.randint(0, 100)
+        elif isinstance(field, DecimalField):
+            return Decimal(index if field.unique else rng.randint(0, 100))
+        elif isinstance(field, FloatField):
+            return float(index if field.unique else rng.randint(0, 100))
+        elif isinstance(field, DateTimeField):
+            return timezone.now()
+        elif isinstance(field, DateField):
+            return date.today()
+        elif isinstance(field, TimeField):
+            return time()
+        elif isinstance(field, UUIDField):
+            return uuid.UUID(int=rng.getrandbits(128))
+        else:
+            msg = "Cannot generate values for field '{0}'."
+            raise CommandError(msg.format(field.name))
+
+    def get_overlap(self, record, databases, keys):
+        """
+        Returns the Jaccard index of the results of the query in the
+        database of the record and in the first database.
+        """
+        reference = keys[(record['rows'], record['query'], databases[0])]
+        current = keys[(record['rows'], record['query'], record['database'])]
+        if not reference and not current:
+            return 1.0
+        else:
+            return len(reference & current) / len(reference | current)
+
+    def get_queries(self):
+        stop_words = sorted(registry['core:STOP_WORDS'])[:3]
+        return [
+            ('single term', 'corazón'),
+            ('accented term', 'economie'),
+            ('phrase', '"{0}"'.format(' '.join(PHRASE))),
+            ('required', '+python guide'),
+            ('excluded', 'python -guide'),
+            ('stop words only', ' '.join(stop_words)),
+        ]
+
+    def get_text_fields(self, model):
+        return [
+            f
+            for f
+            in model._meta.concrete_fields
+            if isinstance(f, (CharField, TextField))
+            and not f.primary_key
+            and not f.choices
+            and not f.unique
+        ]
+
+    def get_related_keys(self, required_fields, db):
+        """
+        Returns a dict that maps the required foreign keys to the primary key
+        of an existing related object, which is assigned to all rows.
+        """
+        keys = {}
+        for field in required_fields:
+            if field.remote_field is None:
+                continue
+
+            if field.unique:
+                msg = "Cannot generate values for field '{0}'."
+                raise CommandError(msg.format(field.name))
+
+            related_model = field.remote_field.model
+            manager = related_model._base_manager.db_manager(db)
+            key = manager.values_list(
+                field.remote_field.field_name,
+                flat=True,
+            ).first()
+            if key is None:
+                msg = ("Field '{0}' is required but there is no {1} object "
+                       "in '{2}' database.")
+                raise CommandError(msg.format(
+                    field.name,
+                    related_model.__name__,
+                    db,
+                ))
+
+            keys[field.name] = key
+
+        return keys
+
+    def get_required_fields(self, model, text_fields):
+        """
+        Returns the fields that must be filled with generated values, apart
+        from the text fields, because they do not accept nulls, do not have
+        a default value and either are unique or do not accept empty strings.
+        """
+        return [
+            f
+            for f
+            in model._meta.concrete_fields
+            if f not in text_fields
+            and not isinstance(f, AutoField)
+            and not f.null
+            and not f.has_default()
+            and not getattr(f, 'auto_now', False)
+            and not getattr(f, 'auto_now_add', False)
+            and (f.unique or not f.empty_strings_allowed)
+        ]
+
+    def run_benchmark(self, model, fields, required_fields, rows, db, queries,
+                            repeat, seed):
+        with transaction.atomic(using=db):
+            manager = model._default_manager.db_manager(db)
+            related_keys = self.get_related_keys(required_fields, db)
+            start = default_timer()
+            batch = []
+            for obj in self.generate_rows(model, fields, required_fields,
+                                          related_keys, rows, seed):
+                batch.append(obj)
+                if len(batch) == 1000:
+                    manager.bulk_create(batch)
+                    batch = []
+            if batch:
+                manager.bulk_create(batch)
+
+            insert_time = default_timer() - start
+            if self.verbosity >= 2:
+                msg = '{0} rows generated in {1} database in {2:.2f} seconds'
+                self.stdout.write(msg.format(rows, db, insert_time))
+
+            for name, query in queries:
+                record = {
+                    'database': db,
+                    'query': name,
+                    'rows': rows,
+                }
+                query_time = None
+                total_time = None
+                for _ in six.moves.range(repeat):
+                    qs = manager.get_queryset().search(query)
+                    gc.collect()
+                    start = default_timer()
+                    list(QuerySet.iterator(qs._clone()))
+                    elapsed = default_timer() - start
+                    if query_time is None or elapsed < query_time:
+                        query_time = elapsed
+
+                    if tracemalloc is not None:
+                        tracemalloc.start()
+
+                    start = default_timer()
+                    results = list(qs)
+                    elapsed = default_timer() - start
+                    if total_time is None or elapsed < total_time:
+                        total_time = elapsed
+
+                    if tracemalloc is not None:
+                        record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                    else:
+                        record['peak_memory'] = None
+
+                record['count'] = len(results)
+                record['query_time'] = query_time
+                record['scoring_time'] = max(total_time - query_time, 0)
+                result_keys = set(
+                    tuple(f.value_to_string(obj) for f in fields)
+                    for obj
+                    in results
+                )
+                yield record, result_keys
+
+            transaction.set_rollback(True, using=db)
+
+    def write_record(self, record):
+        memory = record['peak_memory']
+        self.stdout.write(' '.join((
+            '{rows:>8} {database:<10} {query:<24}',
+            'count={count:<6}',
+            'query={query_time:.4f}s',
+            'scoring={scoring_time:.4f}s',
+            'memory={memory}',
+        )).format(
+            memory='{0:.1f}KiB'.format(memory / 1024) if memory is not None else '-',
+            **record
+        ))
@@ -2,24 +2,39 @@
 
 from __future__ import unicode_literals
 
-from operator import ior, iand
+from bisect import bisect_left, insort
+import heapq
+from itertools import groupby
+import logging
+from operator import ior, iand, itemgetter
 import re
 from string import punctuation
+import threading
+from time import time
 
 from django.db import connections
 from django.db.models import Manager, Model, Q
 from django.db.models.fields import CharField, TextField
 from django.db.models.manager import ManagerDescriptor
 from django.db.models.query import QuerySet
+from django.db.models.signals import post_delete, post_save
 from django.utils import six
 from django.utils.encoding import force_text
 from django.utils.module_loading import import_string
 from django.utils.six.moves import reduce, zip
+from django.utils.synch import RWLock
 
 from yepes.apps import apps
 from yepes.conf import settings
 from yepes.contrib.registry import registry
 from yepes.types import Undefined
+from yepes.utils.unidecode import unidecode
+
+logger = logging.getLogger('yepes.managers')
+
+# Global in-memory store of suggestion indexes. Keyed by model label, so
+# that all the managers of a model share the same index.
+SUGGESTION_INDEXES = {}
 
 
 def search_fields_to_dict(fields):
@@ -104,6 +119,228 @@ class SearchableHelper(object):
         return vowel
 
 
+class SuggestionTable(object):
+    """
+    Words of a ``SuggestionIndex``.
+
+    Keys are normalized words (lowercase and without accents) kept in a
+    sorted list, so that all the words starting with a prefix can be found
+    with a binary search. Each key is mapped to a spelling of the word and
+    to the number of times that it appears. The keys found in each object
+    are also stored, so that they can be discounted when the object changes.
+
+    """
+    def __init__(self):
+        self.counts = {}
+        self.keys = []
+        self.objects = {}
+        self.spellings = {}
+
+    def remove(self, pk):
+        words = self.objects.pop(pk, None)
+        if not words:
+            return
+
+        for key, count in six.iteritems(words):
+            count = self.counts[key] - count
+            if count > 0:
+                self.counts[key] = count
+            else:
+                del self.counts[key]
+                del self.spellings[key]
+                del self.keys[bisect_left(self.keys, key)]
+
+    def set(self, pk, words, spellings):
+        self.remove(pk)
+        if not words:
+            return
+
+        self.objects[pk] = words
+        for key, count in six.iteritems(words):
+            if key in self.counts:
+                self.counts[key] += count
+            else:
+                self.counts[key] = count
+                self.spellings[key] = spellings[key]
+                insort(self.keys, key)
+
+    def suggest(self, prefix, limit):
+        start = bisect_left(self.keys, prefix)
+        stop = bisect_left(self.keys, prefix + '\uffff', start)
+        keys = heapq.nlargest(
+            limit,
+            self.keys[start:stop],
+            key=self.counts.__getitem__,
+        )
+        return [
+            (self.spellings[k], self.counts[k])
+            for k
+            in keys
+        ]
+
+
+class SuggestionIndex(object):
+    """
+    In-memory prefix index of the words contained in the search fields of
+    a model. Fields may span relations.
+
+    The index is built the first time that it is used and it is kept up to
+    date with the saved and deleted objects. Every
+    ``SEARCH_SUGGESTION_SECONDS``, it is rebuilt in a background thread to
+    take in the changes of related objects. Meanwhile, suggestions are
+    served from the previous words.
+
+    """
+    words_re = re.compile(r'\w+', re.UNICODE)
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = list(fields)
+        self._expire_time = 0
+        self._lock = RWLock()
+        self._pending = None
+        self._populate_lock = threading.Lock()
+        self._table = None
+        # Receivers are weakly referenced, so they are disconnected when the
+        # index is discarded.
+        post_save.connect(self._object_saved, sender=model)
+        post_delete.connect(self._object_deleted, sender=model)
+
+    def _get_queryset(self):
+        qs = self.model._default_manager.get_queryset()
+        return qs.order_by('pk').values_list('pk', *self.fields)
+
+    def _get_words(self, values):
+        words = {}
+        spellings = {}
+        for value in values:
+            if not value or not isinstance(value, six.string_types):
+                continue
+
+            for word in self.words_re.findall(force_text(value)):
+                if len(word) < settings.SEARCH_MIN_WORD_LEN:
+                    continue
+
+                word = word.lower()
+                if word in registry['core:STOP_WORDS']:
+                    continue
+
+                key = self.normalize(word)
+                words[key] = words.get(key, 0) + 1
+                spellings.setdefault(key, word)
+
+        return words, spellings
+
+    def _object_deleted(self, sender, instance, **kwargs):
+        self._update(instance.pk, ())
+
+    def _object_saved(self, sender, instance, **kwargs):
+        if self._table is None and self._pending is None:
+            return  # The words will be read when the index is populated.
+
+        if not self.fields:
+            values = ()
+        else:
+            qs = self._get_queryset().filter(pk=instance.pk)
+            values = [
+                value
+                for row
+                in qs
+                for value
+                in row[1:]
+            ]
+        self._update(instance.pk, values)
+
+    def _populate(self):
+        with self._lock.writer():
+            self._pending = {}
+
+        try:
+            table = SuggestionTable()
+            if self.fields:
+                rows = self._get_queryset().iterator()
+                for pk, group in groupby(rows, key=itemgetter(0)):
+                    values = [
+                        value
+                        for row
+                        in group
+                        for value
+                        in row[1:]
+                    ]
+                    table.set(pk, *self._get_words(values))
+        except Exception:
+            with self._lock.writer():
+                self._pending = None
+            raise
+
+        with self._lock.writer():
+            # Objects saved while the rows were read.
+            for pk, (words, spellings) in six.iteritems(self._pending):
+                table.set(pk, words, spellings)
+
+            self._pending = None
+            self._table = table
+            self._expire_time = time() + settings.SEARCH_SUGGESTION_SECONDS
+
+    def _refresh(self):
+        if not self._populate_lock.acquire(False):
+            return  # The index is already being rebuilt.
+
+        def run():
+            try:
+                self._populate()
+            except Exception:
+                logger.exception('Suggestion index could not be rebuilt.')
+            finally:
+                self._populate_lock.release()
+                for connection in connections.all():
+                    connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def _update(self, pk, values):
+        words, spellings = self._get_words(values)
+        with self._lock.writer():
+            if self._table is not None:
+                self._table.set(pk, words, spellings)
+            if self._pending is not None:
+                self._pending[pk] = (words, spellings)
+
+    @staticmethod
+    def normalize(word):
+        return unidecode(word).lower()
+
+    def populate(self):
+        """
+        Reads all the words from the database. The lock is only held to
+        replace the previous words, not while the rows are read.
+        """
+        with self._populate_lock:
+            self._populate()
+
+    def suggest(self, prefix, limit=10):
+        """
+        Returns a list of, at most, ``limit`` tuples with the words that begin
+        with the given ``prefix`` and the number of times that they appear.
+        Most common words come first.
+        """
+        prefix = self.normalize(' '.join(force_text(prefix).split()))
+        if not prefix:
+            return []
+
+        if self._table is None:
+            with self._populate_lock:
+                if self._table is None:
+                    self._populate()
+        elif time() >= self._expire_time:
+            self._refresh()
+
+        with self._lock.reader():
+            return self._table.suggest(prefix, limit)
+
+
 class SearchableQuerySet(QuerySet):
     """
     QuerySet providing main search functionality for ``SearchableManager``.
@@ -476,3 +713,56 @@ class SearchableManager(Manager):
 
         return sorted(results, key=lambda r: r.search_score, reverse=True)
 
+    def get_suggestion_index(self, model=None):
+        """
+        Returns the prefix index of the words that are contained in the
+        search fields of the manager's model. Indexes are shared between
+        managers, so they are built only once per process.
+        """
+        if model is None:
+            model = self.model
+
+        label = '.'.join((model._meta.app_label, model._meta.model_name))
+        index = SUGGESTION_INDEXES.get(label)
+        if index is None:
+            if model is self.model:
+                fields = self.get_search_fields()
+            else:
+                fields = search_fields_to_dict(
+                    getattr(model, 'search_fields', None)
+                    or self.get_search_fields()
+                )
+
+            index = SuggestionIndex(model, fields)
+            index = SUGGESTION_INDEXES.setdefault(label, index)
+
+        return index
+
+    def suggest(self, prefix, limit=10):
+        """
+        Returns a list of, at most, ``limit`` words that begin with the given
+        ``prefix`` and are contained in the search fields. Words are ordered
+        by the number of times that they appear.
+
+        Unlike ``search()``, this method does not query the database but an
+        in-memory index, so it is suitable for as-you-type suggestions.
+        """
+        if getattr(self.model._meta, 'abstract', False):
+            models = [
+                m
+                for m
+                in apps.get_models()
+                if issubclass(m, self.model)
+                and not m._meta.proxy
+            ]
+        else:
+            models = [self.model]
+
+        counts = {}
+        for model in models:
+            index = self.get_suggestion_index(model)
+            for word, count in index.suggest(prefix, limit):
+                counts[word] = counts.get(word, 0) + count
+
+        return heapq.nlargest(limit, counts, key=counts.__getitem__)
+
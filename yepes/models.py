@@ -95,4 +95,10 @@ statements = Statements()
 statements.register('truncate', 'TRUNCATE "{table}" RESTART IDENTITY;', 'postgresql')
 statements.register('truncate', 'TRUNCATE `{table}`;', 'mysql')
 statements.register('truncate', 'DELETE FROM "{table}";')
+statements.register('upsert', ('INSERT INTO {table} ({columns}) VALUES {values}'
+                               ' ON DUPLICATE KEY UPDATE {assignments};'), 'mysql')
+statements.register('upsert', ('INSERT INTO {table} ({columns}) VALUES {values}'
+                               ' ON CONFLICT ({key}) DO UPDATE SET {assignments};'))
+statements.register('upsert_assignment', '{column} = VALUES({column})', 'mysql')
+statements.register('upsert_assignment', '{column} = EXCLUDED.{column}')
 
@@ -15,6 +15,7 @@ SEARCH_MAX_QUERY_LEN = 100
 SEARCH_MIN_QUERY_LEN = 3
 SEARCH_MIN_WORD_LEN = 3
 SEARCH_RESULT_LIMIT = 1000
+SEARCH_SUGGESTION_SECONDS = 3600
 
 
 # Minifier #####################################################################
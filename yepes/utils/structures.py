@@ -7,6 +7,52 @@ from collections import OrderedDict
 from django.utils import six
 
 
+class LRUDict(OrderedDict):
+    """
+    Dictionary that keeps at most ``max_size`` items, discarding the least
+    recently used ones. If ``max_size`` is None, the dictionary is not
+    limited.
+
+    Keys are used when they are set or read with ``get()``.
+    """
+    def __init__(self, max_size=None):
+        super(LRUDict, self).__init__()
+        self.max_size = max_size
+
+    def get(self, key, default=None):
+        """
+        Returns the value of the key, or ``default`` if the key is not in
+        the dictionary, and marks the key as the most recently used one.
+        """
+        if key not in self:
+            return default
+
+        self.touch(key)
+        return super(LRUDict, self).__getitem__(key)
+
+    def touch(self, key):
+        """
+        Moves the key to the end, so it is the last one to be discarded.
+
+        Indexing does not move the keys because ``OrderedDict`` indexes
+        itself while iterating in Python 2.
+        """
+        if six.PY3:
+            self.move_to_end(key)
+        else:
+            value = super(LRUDict, self).pop(key)
+            super(LRUDict, self).__setitem__(key, value)
+
+    def __setitem__(self, key, value):
+        if key in self:
+            super(LRUDict, self).__delitem__(key)
+
+        super(LRUDict, self).__setitem__(key, value)
+        if self.max_size is not None:
+            while len(self) > self.max_size:
+                self.popitem(last=False)
+
+
 class OrderedDictWhichIteratesOverValues(OrderedDict):
 
     def __iter__(self):
@@ -3,18 +3,29 @@
 from __future__ import division, unicode_literals
 
 from collections import Iterable, OrderedDict
+import hashlib
 
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import Count, F, IntegerField, Value
+from django.db.models.query import QuerySet
+from django.db.models.sql import EmptyResultSet
 from django.http import HttpResponse
-from django.utils.encoding import force_text, python_2_unicode_compatible
+from django.utils.encoding import (
+    force_bytes,
+    force_text,
+    python_2_unicode_compatible,
+)
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext as _
+from django.views.generic import View
 
 from yepes.types import Undefined
 from yepes.utils.http import urlquote_plus
 from yepes.utils.properties import cached_property
 from yepes.utils.structures import OrderedDictWhichIteratesOverValues
+from yepes.view_mixins import JsonMixin, ModelMixin
 from yepes.views.list import (
     Ordering, Page, PageSize,
     AvailablePages, VisiblePages,
@@ -25,6 +36,7 @@ from yepes.views.list import (
 @python_2_unicode_compatible
 class Facet(object):
 
+    field = Undefined
     name = Undefined
     is_multiple = False
     verbose_name = Undefined
@@ -63,6 +75,18 @@ class Facet(object):
     def _constraints(self):
         return self._query._facets.get(self.name) or ()
 
+    @cached_property
+    def counts(self):
+        """
+        Returns a dict that maps the values of ``Facet.field`` to the number
+        of objects that have them.
+
+        Counts of all facets are computed by the query the first time that
+        any of them is accessed. If the facet has no field, an empty dict is
+        returned and subclasses must compute the counts by themselves.
+        """
+        return self._query.facet_counts.get(self.name, {})
+
     @cached_property
     def available_constraints(self):
         return OrderedDictWhichIteratesOverValues([
@@ -385,6 +409,117 @@ class FacetedSearchQuery(SearchQuery):
 
         return '&'.join(params)
 
+    def count_facets(self, object_list, facets):
+        """
+        Counts the values of the fields of the given ``facets`` among the
+        objects of ``object_list``.
+
+        Each facet is counted by its own grouped query, so the number of rows
+        is bounded by the number of distinct values of each field and not by
+        their product, but all of them are joined with ``UNION ALL`` and sent
+        to the database at once. Returns a dict that maps the facet names to
+        dicts of values and counts.
+        """
+        counts = {
+            facet.name: {}
+            for facet
+            in facets
+        }
+        if not facets:
+            return counts
+
+        if not isinstance(object_list, QuerySet):
+            for obj in object_list:
+                for facet in facets:
+                    value = getattr(obj, facet.field, None)
+                    facet_counts = counts[facet.name]
+                    facet_counts[value] = facet_counts.get(value, 0) + 1
+
+            return counts
+
+        connection = connections[object_list.db]
+        manager = object_list.model._base_manager.using(object_list.db)
+        keys = object_list.order_by().values('pk')
+        columns = [
+            'facet_{0}'.format(i)
+            for i
+            in range(len(facets))
+        ]
+        output_fields = [
+            manager.annotate(
+                facet_value=F(facet.field),
+            ).query.annotations['facet_value'].output_field
+            for facet
+            in facets
+        ]
+        queries = []
+        params = []
+        converters = []
+        for i, facet in enumerate(facets):
+            queryset = manager.filter(pk__in=keys).annotate(
+                facet_index=Value(i, output_field=IntegerField()),
+            )
+            # Each facet fills its own column and leaves the others empty,
+            # so the columns of all queries have compatible types. Columns
+            # are annotated one by one to keep them in the same order.
+            for j, column in enumerate(columns):
+                if j == i:
+                    expression = F(facet.field)
+                else:
+                    expression = Value(None, output_field=output_fields[j])
+                queryset = queryset.annotate(**{column: expression})
+
+            queryset = queryset.order_by().values(
+                'facet_index',
+                *columns
+            ).annotate(
+                facet_count=Count('pk', distinct=True),
+            )
+            compiler = queryset.query.get_compiler(connection=connection)
+            try:
+                sql, query_params = compiler.as_sql()
+            except EmptyResultSet:
+                return counts
+
+            aliases = [alias for _, _, alias in compiler.select]
+            index_position = aliases.index('facet_index')
+            count_position = aliases.index('facet_count')
+            value_position = aliases.index(columns[i])
+            value_expression = compiler.select[value_position][0]
+            converters.append((
+                compiler,
+                value_position,
+                compiler.get_converters([value_expression]),
+            ))
+            queries.append(sql)
+            params.extend(query_params)
+
+        with connection.cursor() as cursor:
+            cursor.execute(' UNION ALL '.join(queries), params)
+            rows = cursor.fetchall()
+
+        for row in rows:
+            i = row[index_position]
+            compiler, value_position, value_converters = converters[i]
+            value = compiler.apply_converters(
+                [row[value_position]],
+                value_converters,
+            )[0]
+            counts[facets[i].name][value] = row[count_position]
+
+        return counts
+
+    def get_facet_counts_cache_key(self):
+        query = self.get_query_string(ordering=None, page=None, page_size=None)
+        hash = hashlib.md5(force_bytes('?'.join((
+            self._view.request.path,
+            query,
+        ))))
+        return 'yepes.views.{0}.facet_counts.{1}'.format(
+            self._view.__class__.__name__,
+            hash.hexdigest(),
+        )
+
     @cached_property
     def _facets(self):
         return self._view.get_selected_facets()
@@ -402,6 +537,25 @@ class FacetedSearchQuery(SearchQuery):
 
         return facets
 
+    @cached_property
+    def facet_counts(self):
+        facets = [
+            facet
+            for facet
+            in self.available_facets
+            if facet.field is not Undefined
+        ]
+        if not self._view.get_cache_facet_counts():
+            return self.count_facets(self.object_list, facets)
+
+        key = self.get_facet_counts_cache_key()
+        counts = self._view._cache.get(key)
+        if counts is None:
+            counts = self.count_facets(self.object_list, facets)
+            self._view._cache.set(key, counts)
+
+        return counts
+
     @cached_property
     def facets(self):
         selected_facets = OrderedDictWhichIteratesOverValues()
@@ -415,11 +569,20 @@ class FacetedSearchQuery(SearchQuery):
 
 class FacetedSearchView(SearchView):
 
+    cache_facet_counts = False
     facets = None
     _facets = Undefined
     facets_kwarg = 'filters'
     query_class = FacetedSearchQuery
 
+    def get_cache_facet_counts(self):
+        """
+        Returns ``True`` if the facet counts should be stored in the view
+        cache, so that further requests with the same query and filters do
+        not need to count the objects again.
+        """
+        return self.cache_facet_counts and self.get_use_cache(self.request)
+
     def get_facets(self):
         """
         Returns a list containing all available facets.
@@ -458,3 +621,53 @@ class FacetedSearchView(SearchView):
 
         return facets
 
+
+class SearchSuggestionView(JsonMixin, ModelMixin, View):
+    """
+    Returns, as JSON, the words of the search fields of the model that begin
+    with the prefix entered by the user.
+
+    Suggestions are taken from the in-memory index of ``SearchableManager``,
+    so the database is not queried on each keystroke.
+    """
+
+    force_json_response = True
+    limit = 10
+    model = None
+    user_query_kwarg = 'query'
+
+    def get(self, request, *args, **kwargs):
+        user_query = self.get_user_query() or ''
+        data = self.get_json_data(**{
+            'query': user_query,
+            'suggestions': self.get_suggestions(user_query),
+        })
+        return self.serialize_to_response(data)
+
+    def get_limit(self):
+        """
+        Returns the maximum number of suggestions.
+        """
+        return self.limit
+
+    def get_suggestions(self, user_query):
+        """
+        Returns a list of words that begin with the last word of the query.
+        """
+        model = self.get_model()
+        if model is None:
+            msg = ('{cls} is missing a model. Define {cls}.model, or override '
+                   '{cls}.get_suggestions().')
+            raise ImproperlyConfigured(msg.format(cls=self.__class__.__name__))
+
+        words = user_query.split()
+        if not words:
+            return []
+
+        return model._default_manager.suggest(words[-1], self.get_limit())
+
+    def get_user_query(self):
+        """
+        Returns the query entered by the user.
+        """
+        return self.request.GET.get(self.user_query_kwarg)